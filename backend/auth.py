@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from .database import AsyncSessionLocal, DBUser
+from .models import UserCreate, UserOut
+
+# Auth configuration
+SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-for-dev-only")
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 # 1 day
+# How long a verified token or a loaded user is trusted without checking again
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+# Put the user's id and name in issued tokens, so requests authenticate from the token alone
+AUTH_EMBED_CLAIMS = os.getenv("AUTH_EMBED_CLAIMS", "1") == "1"
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+
+class TTLCache:
+    """Thread-safe LRU map whose entries expire after a per-entry TTL."""
+
+    def __init__(self, capacity: int = AUTH_CACHE_SIZE):
+        self.capacity = max(1, capacity)
+        self.entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[1]
+
+    def put(self, key: str, value: Any, ttl_seconds: float):
+        if ttl_seconds <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl_seconds, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]):
+        with self.lock:
+            for key in [key for key, (_, value) in self.entries.items() if predicate(value)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.counters, "size": len(self.entries), "capacity": self.capacity}
+
+# Verified tokens and loaded users; both hold UserOut records
+token_cache = TTLCache()
+user_cache = TTLCache()
+# Tokens issued before a user was invalidated no longer carry trusted claims
+stale_before: Dict[str, float] = {}
+
+def invalidate_user(email: str):
+    """Drops everything cached about a user; call after changing or removing the account."""
+    stale_before[email] = int(time.time())
+    user_cache.invalidate(email)
+    token_cache.invalidate_where(lambda user: user.email == email)
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    to_encode = data.copy()
+    if expires_delta:
+        expire = datetime.utcnow() + expires_delta
+    else:
+        expire = datetime.utcnow() + timedelta(minutes=15)
+    to_encode.update({"exp": expire, "iat": int(time.time())})
+    # Imported on first use: jose pulls in cryptography, which slows every process start
+    from jose import jwt
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+def create_user_token(user: DBUser) -> str:
+    claims = {"sub": user.email}
+    if AUTH_EMBED_CLAIMS:
+        claims.update({"uid": user.id, "name": user.full_name})
+    return create_access_token(claims, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+
+async def find_user(email: str) -> Optional[DBUser]:
+    async with AsyncSessionLocal() as session:
+        return await session.scalar(select(DBUser).where(DBUser.email == email))
+
+async def create_user(user_in: UserCreate, hashed_password: str) -> DBUser:
+    async with AsyncSessionLocal() as session:
+        db_user = DBUser(email=user_in.email, full_name=user_in.full_name, hashed_password=hashed_password)
+        session.add(db_user)
+        try:
+            await session.commit()
+        except IntegrityError:
+            # Registered concurrently since the caller checked
+            raise HTTPException(status_code=400, detail="Email already registered")
+        return db_user
+
+async def update_password_hash(user_id: int, hashed_password: str):
+    async with AsyncSessionLocal() as session:
+        await session.execute(update(DBUser).where(DBUser.id == user_id).values(hashed_password=hashed_password))
+        await session.commit()
+
+async def load_user(email: str) -> Optional[UserOut]:
+    user = user_cache.get(email)
+    if user is not None:
+        return user
+    async with AsyncSessionLocal() as session:
+        db_user = await session.scalar(select(DBUser).where(DBUser.email == email))
+        if db_user is None:
+            return None
+        user = UserOut.model_validate(db_user)
+    user_cache.put(email, user, AUTH_CACHE_TTL_SECONDS)
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserOut:
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    from jose import JWTError, jwt
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        email: str = payload.get("sub") # type: ignore
+        if email is None:
+            raise credentials_exception
+    except JWTError:
+        raise credentials_exception
+
+    embedded = "uid" in payload and "name" in payload
+    if embedded and payload.get("iat", 0) > stale_before.get(email, 0):
+        user = UserOut(id=payload["uid"], email=email, full_name=payload["name"])
+    else:
+        user = await load_user(email)
+        if user is None:
+            raise credentials_exception
+    # Never trust a cached token past its own expiry
+    token_cache.put(token, user, min(AUTH_CACHE_TTL_SECONDS, payload["exp"] - time.time()))
+    return user
@@ -0,0 +1,154 @@
+import hashlib
+import json
+from typing import Optional, Tuple
+from .executor import ExecutionEngine, engine
+from .transpiler import TranspileError
+from .models import BatchRequest, BatchResult, CaseResult, ExecutionResult
+
+# Harnesses load the candidate's code once, call the solution function for every case
+# with its printed output captured, and finally print the case results as JSON after a
+# token line, so results and the program's own top-level output stay apart.
+PYTHON_HARNESS = r'''
+import contextlib, io, json, sys, time, traceback
+CODE, FUNCTION, CASES, STOP_ON_FAILURE, TOKEN = json.loads(__PAYLOAD__)
+
+def user_traceback(e):
+    # Hide the harness frames, like the worker does for plain runs
+    tb = e.__traceback__
+    while tb is not None and tb.tb_frame.f_code.co_filename != "solution.py":
+        tb = tb.tb_next
+    return "".join(traceback.format_exception(type(e), e, tb))
+
+namespace = {"__name__": "__solution__"}
+try:
+    exec(compile(CODE, "solution.py", "exec"), namespace)
+except Exception as e:
+    sys.stderr.write(user_traceback(e))
+    sys.exit(1)
+solution = namespace.get(FUNCTION)
+if not callable(solution):
+    sys.stderr.write("No function named %r was defined\n" % FUNCTION)
+    sys.exit(1)
+
+results = []
+for case in CASES:
+    captured = io.StringIO()
+    actual = error = None
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(captured):
+            actual = json.loads(json.dumps(solution(*case["args"]), default=repr))
+        passed = actual == case["expected"]
+    except Exception as e:
+        error = user_traceback(e)
+        passed = False
+    results.append({
+        "passed": passed,
+        "actual": actual,
+        "output": captured.getvalue(),
+        "error": error,
+        "executionTime": (time.perf_counter() - start) * 1000,
+    })
+    if STOP_ON_FAILURE and not passed:
+        break
+sys.stdout.write("\n" + TOKEN + "\n" + json.dumps(results) + "\n")
+'''
+
+JAVASCRIPT_HARNESS = r'''
+const util = require('util');
+const [CODE, FUNCTION, CASES, STOP_ON_FAILURE, TOKEN] = JSON.parse(__PAYLOAD__);
+
+const load = new Function('module', 'exports', 'require',
+  CODE + '\n;return typeof ' + FUNCTION + " !== 'undefined' ? " + FUNCTION + ' : module.exports.' + FUNCTION + ';');
+let solution;
+try {
+  const module = { exports: {} };
+  solution = load(module, module.exports, require);
+} catch (e) {
+  console.error(e && e.stack || String(e));
+  process.exit(1);
+}
+if (typeof solution !== 'function') {
+  console.error('No function named ' + JSON.stringify(FUNCTION) + ' was defined');
+  process.exit(1);
+}
+
+(async () => {
+  const results = [];
+  const { log, error: logError } = console;
+  for (const testCase of CASES) {
+    const captured = [];
+    console.log = console.error = (...args) => captured.push(util.format(...args) + '\n');
+    let actual = null;
+    let error = null;
+    let passed = false;
+    const start = process.hrtime.bigint();
+    try {
+      const value = await solution(...testCase.args);
+      actual = value === undefined ? null : JSON.parse(JSON.stringify(value));
+      passed = util.isDeepStrictEqual(actual, testCase.expected);
+    } catch (e) {
+      error = e && e.stack || String(e);
+    } finally {
+      console.log = log;
+      console.error = logError;
+    }
+    results.push({
+      passed,
+      actual,
+      output: captured.join(''),
+      error,
+      executionTime: Number(process.hrtime.bigint() - start) / 1e6,
+    });
+    if (STOP_ON_FAILURE && !passed) break;
+  }
+  process.stdout.write('\n' + TOKEN + '\n' + JSON.stringify(results) + '\n');
+})();
+'''
+
+def build_harness(request: BatchRequest, code: str) -> Tuple[str, str]:
+    cases = [case.model_dump() for case in request.cases]
+    payload = [code, request.functionName, cases, request.stopOnFailure]
+    # Derived from the payload so identical batches can be served by the result cache
+    token = hashlib.sha256(json.dumps(payload).encode()).hexdigest()
+    payload = json.dumps(json.dumps(payload + [token]))
+    template = PYTHON_HARNESS if request.language == "python" else JAVASCRIPT_HARNESS
+    return template.replace("__PAYLOAD__", payload), token
+
+def parse_results(request: BatchRequest, run: ExecutionResult, token: str) -> BatchResult:
+    head, marker, tail = run.output.partition("\n" + token + "\n")
+    cases = [CaseResult(**case) for case in json.loads(tail)] if marker and run.success else []
+    passed = sum(1 for case in cases if case.passed)
+    error: Optional[str] = None
+    if not marker or not run.success:
+        error = run.error or "The batch did not finish"
+    return BatchResult(
+        success=error is None and passed == len(request.cases),
+        passed=passed,
+        failed=len(cases) - passed,
+        skipped=len(request.cases) - len(cases),
+        results=cases,
+        output=head,
+        error=error,
+        executionTime=run.executionTime,
+        queueTime=run.queueTime,
+        violation=run.violation,
+        cached=run.cached
+    )
+
+async def _run_batch(runner: ExecutionEngine, request: BatchRequest, use_cache: bool) -> BatchResult:
+    code, language = request.code, request.language
+    if language == "typescript":
+        # The harness is JavaScript, so only the candidate's code needs transpiling
+        try:
+            code = await runner.transpiler.transpile(code)
+        except TranspileError as e:
+            return BatchResult(success=False, skipped=len(request.cases), error=str(e), executionTime=0)
+        language = "javascript"
+    harness, token = build_harness(request, code)
+    run = await runner._run(harness, language, use_cache=use_cache)
+    return parse_results(request, run, token)
+
+async def execute_batch(request: BatchRequest, use_cache: bool = True, runner: ExecutionEngine = engine) -> BatchResult:
+    """Runs every case of a batch in one sandboxed process. Raises QueueFull like execute()."""
+    return await runner.submit(_run_batch(runner, request, use_cache))
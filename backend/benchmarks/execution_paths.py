@@ -0,0 +1,114 @@
+"""Cold and warm latency of the two places Python can run: a server worker and Pyodide.
+
+    python -m backend.benchmarks.execution_paths [--runs 20] [--pyodide-dir DIR] [--json]
+
+Server runs are timed in process, so add a network round trip when comparing them
+with Pyodide. Pyodide runs need Node and an unpacked Pyodide distribution, the same
+files the frontend loads from the CDN; without --pyodide-dir that path is skipped.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from ..executor import ExecutionEngine
+
+WORKLOADS = {
+    "trivial": "print('hello')",
+    "loop": "print(sum(i * i for i in range(200_000)))",
+}
+
+# Mirrors getPyodide() and executeCode() in frontend/src/utils/codeExecutor.ts
+PYODIDE_SCRIPT = r"""
+const { pathToFileURL } = require("url");
+const [dir, runs, code] = [process.argv[1], Number(process.argv[2]), process.argv[3]];
+(async () => {
+  const { loadPyodide } = await import(pathToFileURL(dir + "/pyodide.mjs").href);
+  let start = performance.now();
+  const pyodide = await loadPyodide({ indexURL: dir + "/" });
+  const load = performance.now() - start;
+  const run = async () => {
+    const began = performance.now();
+    pyodide.runPython("import sys, io\nsys.stdout = io.StringIO()\nsys.stderr = io.StringIO()");
+    await pyodide.runPythonAsync(code);
+    pyodide.runPython("sys.stdout.getvalue()");
+    return performance.now() - began;
+  };
+  const first = await run();
+  const warm = [];
+  for (let i = 0; i < runs; i++) warm.push(await run());
+  console.log(JSON.stringify({ cold: load + first, load, warm }));
+})();
+"""
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "median_ms": round(statistics.median(ordered), 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+    }
+
+def timed(engine: ExecutionEngine, code: str, use_cache: bool) -> float:
+    start = time.perf_counter()
+    result = engine.call(engine._run(code, "python", use_cache=use_cache))
+    elapsed = (time.perf_counter() - start) * 1000
+    if not result.success:
+        raise RuntimeError(result.error)
+    return elapsed
+
+def bench_server(code: str, runs: int) -> dict:
+    # A fresh engine has no idle workers, so its first run pays interpreter startup
+    engine = ExecutionEngine(cache_size=runs + 1)
+    try:
+        cold = timed(engine, code, use_cache=False)
+        warm = [timed(engine, code, use_cache=False) for _ in range(runs)]
+        timed(engine, code, use_cache=True)
+        cached = [timed(engine, code, use_cache=True) for _ in range(runs)]
+    finally:
+        engine.close()
+    return {"cold_ms": round(cold, 2), "warm": summarize(warm), "cached": summarize(cached)}
+
+def bench_pyodide(code: str, runs: int, pyodide_dir: Optional[str]) -> Optional[dict]:
+    if not pyodide_dir:
+        return None
+    completed = subprocess.run(
+        ["node", "-e", PYODIDE_SCRIPT, str(Path(pyodide_dir).resolve()), str(runs), code],
+        capture_output=True, text=True, check=True,
+    )
+    measured = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {
+        "cold_ms": round(measured["cold"], 2),
+        "load_ms": round(measured["load"], 2),
+        "warm": summarize(measured["warm"]),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=20, help="warm runs per workload and path")
+    parser.add_argument("--pyodide-dir", help="unpacked Pyodide distribution to benchmark in Node")
+    parser.add_argument("--json", action="store_true", help="print the raw results as JSON")
+    args = parser.parse_args(argv)
+
+    results = {
+        name: {"server": bench_server(code, args.runs), "pyodide": bench_pyodide(code, args.runs, args.pyodide_dir)}
+        for name, code in WORKLOADS.items()
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'workload':<10} {'path':<8} {'cold ms':>10} {'warm median':>12} {'warm p95':>10} {'cached median':>14}")
+    for name, paths in results.items():
+        for path, measured in paths.items():
+            if measured is None:
+                print(f"{name:<10} {path:<8} {'skipped (no --pyodide-dir)':>48}")
+                continue
+            cached = measured["cached"]["median_ms"] if "cached" in measured else "-"
+            print(
+                f"{name:<10} {path:<8} {measured['cold_ms']:>10} {measured['warm']['median_ms']:>12} "
+                f"{measured['warm']['p95_ms']:>10} {cached:>14}"
+            )
+
+if __name__ == "__main__":
+    main()
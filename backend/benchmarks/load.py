@@ -0,0 +1,241 @@
+"""Load test for the HTTP API: throughput, latency percentiles and errors per endpoint.
+
+    python -m backend.benchmarks.load [--url URL] [--concurrency 16] [--requests 200]
+        [--scenarios sessions_get,execute_python] [--output results.json]
+        [--baseline backend/benchmarks/baseline.json] [--threshold 0.25] [--save-baseline PATH]
+
+Without --url a server is started on a free port with a throwaway database. With
+--baseline the run exits with status 1 when any scenario regressed past --threshold,
+so it can gate a change.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterator, List
+import httpx
+
+BASELINE = Path(__file__).with_name("baseline.json")
+PACKAGE_ROOT = Path(__file__).resolve().parents[2]
+# Distinct sessions the session scenarios spread over
+SESSION_COUNT = 50
+PASSWORD = "benchmark-password"
+
+Scenario = Callable[[httpx.AsyncClient, int, dict], Awaitable[httpx.Response]]
+
+def execute(language: str, code: str) -> Scenario:
+    def request(client: httpx.AsyncClient, i: int, context: dict):
+        # Every request runs; a result cache hit would measure the cache, not the executor
+        return client.post("/execute", json={"code": code, "language": language, "bypassCache": True})
+    return request
+
+def signup(client: httpx.AsyncClient, i: int, context: dict):
+    email = f"bench-{context['run']}-{i}@example.com"
+    return client.post("/auth/signup", json={"email": email, "full_name": "Bench", "password": PASSWORD})
+
+SCENARIOS: Dict[str, Scenario] = {
+    "sessions_get": lambda client, i, context: client.get(f"/sessions/bench-{i % SESSION_COUNT}"),
+    "sessions_post": lambda client, i, context: client.post(
+        f"/sessions/bench-{i % SESSION_COUNT}", json={"code": f"print({i})\n", "language": "python"}
+    ),
+    "execute_python": execute("python", "print(sum(range(1000)))"),
+    "execute_javascript": execute("javascript", "console.log([...Array(1000).keys()].reduce((a, b) => a + b))"),
+    "execute_typescript": execute("typescript", "const n: number = 1000;\nconsole.log(n * (n - 1) / 2);"),
+    "auth_signup": signup,
+    "auth_login": lambda client, i, context: client.post("/auth/login", json={"email": context["email"], "password": PASSWORD}),
+    "auth_me": lambda client, i, context: client.get("/auth/me", headers={"Authorization": f"Bearer {context['token']}"}),
+}
+
+async def prepare(client: httpx.AsyncClient) -> dict:
+    """One account for the login and /auth/me scenarios; names are unique per run."""
+    run = uuid.uuid4().hex[:8]
+    email = f"bench-{run}@example.com"
+    response = await client.post("/auth/signup", json={"email": email, "full_name": "Bench", "password": PASSWORD})
+    response.raise_for_status()
+    response = await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+    response.raise_for_status()
+    return {"run": run, "email": email, "token": response.json()["access_token"]}
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def drive(client: httpx.AsyncClient, scenario: Scenario, context: dict, requests: int, concurrency: int, warmup: int = 0) -> dict:
+    """Sends `requests` requests from `concurrency` concurrent clients and summarizes them."""
+    for i in range(warmup):
+        await scenario(client, requests + i, context)
+
+    latencies: List[float] = []
+    errors: Counter = Counter()
+    indices = itertools.count()
+
+    async def worker():
+        while (i := next(indices)) < requests:
+            start = time.perf_counter()
+            try:
+                response = await scenario(client, i, context)
+                if response.status_code >= 400:
+                    errors[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": sum(errors.values()),
+        "error_rate": round(sum(errors.values()) / requests, 4) if requests else 0.0,
+        "errors_by_kind": dict(errors),
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 0.50), 2),
+            "p90": round(percentile(latencies, 0.90), 2),
+            "p99": round(percentile(latencies, 0.99), 2),
+            "max": round(latencies[-1], 2) if latencies else 0.0,
+        },
+    }
+
+async def run_suite(client: httpx.AsyncClient, scenarios: List[str], requests: int, concurrency: int, warmup: int) -> dict:
+    context = await prepare(client)
+    results = {}
+    for name in scenarios:
+        results[name] = await drive(client, SCENARIOS[name], context, requests, concurrency, warmup)
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Regressions of `results` against `baseline`, both as written by this module.
+
+    A scenario regresses when its p99 latency grows, or its throughput drops, by more
+    than `threshold` (a fraction), or when it fails more often than in the baseline.
+    """
+    regressions = []
+    for name, base in baseline["scenarios"].items():
+        current = results["scenarios"].get(name)
+        if current is None:
+            continue
+        p99, base_p99 = current["latency_ms"]["p99"], base["latency_ms"]["p99"]
+        if p99 > base_p99 * (1 + threshold):
+            regressions.append(f"{name}: p99 {p99}ms vs {base_p99}ms")
+        throughput, base_throughput = current["throughput_rps"], base["throughput_rps"]
+        if throughput < base_throughput * (1 - threshold):
+            regressions.append(f"{name}: throughput {throughput}/s vs {base_throughput}/s")
+        # Allows one stray error per hundred requests
+        if current["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{name}: error rate {current['error_rate']} vs {base['error_rate']}")
+    return regressions
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@contextmanager
+def local_server() -> Iterator[str]:
+    """Runs the API in a subprocess against a throwaway database and yields its URL."""
+    port = free_port()
+    with tempfile.TemporaryDirectory(prefix="live-code-studio-bench-") as directory:
+        # The session scenarios open many sessions from one address
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'bench.db')}", "SESSION_CREATE_PER_MINUTE": "0"}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=PACKAGE_ROOT, env=env, stdout=subprocess.DEVNULL,
+        )
+        url = f"http://127.0.0.1:{port}"
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    if httpx.get(f"{url}/health").status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("The benchmark server did not start")
+                time.sleep(0.1)
+            yield url
+        finally:
+            server.terminate()
+            server.wait(10)
+
+def print_table(results: dict):
+    print(f"{'scenario':<20} {'req/s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'errors':>7}")
+    for name, stats in results["scenarios"].items():
+        latency = stats["latency_ms"]
+        print(
+            f"{name:<20} {stats['throughput_rps']:>9} {latency['p50']:>9} {latency['p90']:>9} "
+            f"{latency['p99']:>9} {latency['max']:>9} {stats['errors']:>7}"
+        )
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--url", help="server to load; by default one is started locally")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients per scenario")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests sent first per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help=f"compare against this results file, e.g. {BASELINE.relative_to(PACKAGE_ROOT)}")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed p99 growth / throughput drop, as a fraction")
+    parser.add_argument("--save-baseline", help="write the results to this file as the new baseline")
+    args = parser.parse_args(argv)
+
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    async def measure(url: str) -> dict:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+            return await run_suite(client, scenarios, args.requests, args.concurrency, args.warmup)
+
+    if args.url:
+        measured = asyncio.run(measure(args.url))
+    else:
+        with local_server() as url:
+            measured = asyncio.run(measure(url))
+
+    results = {
+        "meta": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "scenarios": measured,
+    }
+
+    status = 0
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.threshold)
+        results["regressions"] = regressions
+        status = 1 if regressions else 0
+    print_table(results)
+    for regression in results.get("regressions", []):
+        print(f"REGRESSION {regression}")
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        Path(path).write_text(json.dumps(results, indent=2) + "\n")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
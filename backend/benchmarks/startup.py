@@ -0,0 +1,124 @@
+"""Startup cost of the API: time to import backend.main and to the first healthy /health.
+
+    python -m backend.benchmarks.startup [--runs 5] [--import-budget-ms 2000]
+        [--healthy-budget-ms 3000] [--output results.json]
+
+Every run is a fresh interpreter, so nothing is warm but the OS file cache; the
+medians are reported. The run exits with status 1 when a median is over its budget,
+or when importing the app loads a module that should only load on first use.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+import httpx
+from .load import PACKAGE_ROOT, free_port
+
+# Loaded on first use (a login, a hash, a Postgres upsert, the process pool), never on import
+LAZY_MODULES = ("jose", "bcrypt", "sqlalchemy.dialects.postgresql", "multiprocessing")
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import backend.main
+print(json.dumps({"seconds": time.perf_counter() - started, "loaded": [name for name in sys.argv[1:] if name in sys.modules]}))
+"""
+
+def measure_import(env: Dict[str, str]) -> dict:
+    """Imports the app in a new interpreter; returns the seconds it took and which LAZY_MODULES it loaded."""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT, *LAZY_MODULES], cwd=PACKAGE_ROOT, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+def measure_healthy(env: Dict[str, str], timeout: float = 30) -> float:
+    """Seconds from starting a server process to its first 200 from /health."""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    # One client made up front: building one per poll costs CPU the starting server would otherwise get
+    client = httpx.Client(timeout=1)
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=PACKAGE_ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                if client.get(url).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.HTTPError:
+                pass
+            if server.poll() is not None or time.perf_counter() - started > timeout:
+                raise RuntimeError("The benchmark server did not start")
+            time.sleep(0.01)
+    finally:
+        client.close()
+        server.terminate()
+        server.wait(10)
+
+def summarize(seconds: List[float]) -> dict:
+    milliseconds = sorted(value * 1000 for value in seconds)
+    return {"median_ms": round(statistics.median(milliseconds), 1), "min_ms": round(milliseconds[0], 1), "max_ms": round(milliseconds[-1], 1)}
+
+def run(runs: int) -> dict:
+    imports, healthy, loaded = [], [], set()
+    for _ in range(runs):
+        # A new database each run, so creating the tables is part of every measured startup
+        with tempfile.TemporaryDirectory(prefix="live-code-studio-startup-") as directory:
+            env = {**os.environ, "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'startup.db')}"}
+            measured = measure_import(env)
+            imports.append(measured["seconds"])
+            loaded.update(measured["loaded"])
+            healthy.append(measure_healthy(env))
+    return {"import": summarize(imports), "first_healthy": summarize(healthy), "eagerly_loaded": sorted(loaded)}
+
+def over_budget(results: dict, import_budget_ms: float, healthy_budget_ms: float) -> List[str]:
+    problems = []
+    for name, budget in (("import", import_budget_ms), ("first_healthy", healthy_budget_ms)):
+        if budget and results[name]["median_ms"] > budget:
+            problems.append(f"{name}: median {results[name]['median_ms']} ms over the {budget:g} ms budget")
+    for module in results["eagerly_loaded"]:
+        problems.append(f"import: {module} is loaded by importing the app")
+    return problems
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--import-budget-ms", type=float, default=2000, help="allowed median import time; 0 disables the check")
+    parser.add_argument("--healthy-budget-ms", type=float, default=3000, help="allowed median time to the first healthy response; 0 disables the check")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {
+            "runs": args.runs,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        **run(max(1, args.runs)),
+    }
+    results["over_budget"] = over_budget(results, args.import_budget_ms, args.healthy_budget_ms)
+
+    print(f"{'measurement':<16} {'median ms':>10} {'min ms':>9} {'max ms':>9}")
+    for name in ("import", "first_healthy"):
+        stats = results[name]
+        print(f"{name:<16} {stats['median_ms']:>10} {stats['min_ms']:>9} {stats['max_ms']:>9}")
+    for problem in results["over_budget"]:
+        print(f"OVER BUDGET {problem}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + "\n")
+    return 1 if results["over_budget"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,414 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .database import AsyncDatabase, Database, async_db, db
+from .history import SESSION_HISTORY, RevisionLog
+from .models import SessionState, SupportedLanguage, TextEdit
+from .patches import apply_patch, diff_edit
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "1000"))
+# Durability window: the longest an accepted write may live only in memory.
+# 0 makes the cache write-through.
+SESSION_CACHE_FLUSH_SECONDS = float(os.getenv("SESSION_CACHE_FLUSH_SECONDS", "1.0"))
+# Reads of a cached session update its last activity at most this often
+SESSION_TOUCH_SECONDS = float(os.getenv("SESSION_TOUCH_SECONDS", "60"))
+
+class CacheEntry:
+    __slots__ = ("state", "dirty", "touched_at")
+
+    def __init__(self, state: SessionState, dirty: bool = False):
+        self.state = state
+        self.dirty = dirty
+        self.touched_at = time.monotonic()
+
+class SessionCache:
+    """LRU write-back cache in front of Database.
+
+    Reads are served from memory; writes update memory and are merged until the
+    next flush, which happens every `flush_seconds`, on eviction and on close().
+    Every operation has an `_async` variant that reaches the database through
+    `async_database` instead; the periodic flush always uses the sync one.
+    With `revisions`, every version is also logged and written with the flushes.
+    """
+
+    def __init__(self, database: Database, capacity: int = SESSION_CACHE_SIZE, flush_seconds: float = SESSION_CACHE_FLUSH_SECONDS, async_database: Optional[AsyncDatabase] = None, revisions: Optional[RevisionLog] = None):
+        self.database = database
+        self.async_database = async_database
+        self.revisions = revisions
+        self.capacity = max(1, capacity)
+        self.flush_seconds = flush_seconds
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        # Dirty states evicted where they could not be written straight away
+        self.pending: Dict[str, SessionState] = {}
+        # Sessions read since the last flush, whose last activity the flush records
+        self.touched: Set[str] = set()
+        self.lock = threading.RLock()
+        self.counters = {"hits": 0, "misses": 0, "writes": 0, "flushes": 0, "flushed_sessions": 0, "evictions": 0, "touches": 0}
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def _store(self, session_id: str, state: SessionState, dirty: bool):
+        # Caller holds the lock; returns dirty entries evicted to make room
+        self.entries[session_id] = CacheEntry(state, dirty)
+        self.entries.move_to_end(session_id)
+        evicted = {}
+        while len(self.entries) > self.capacity:
+            evicted_id, entry = self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+            if entry.dirty:
+                evicted[evicted_id] = entry.state
+        return evicted
+
+    def _write(self, states: Dict[str, SessionState], flushing: bool = False):
+        # Logged revisions ride along with state writes, or go out on their own at a flush
+        if not states and not flushing:
+            return
+        batch = self.revisions.take() if self.revisions is not None else []
+        touched = self._take_touched(states) if flushing else []
+        if not states and not batch and not touched:
+            return
+        try:
+            self.database.save_sessions(states, self.revisions.rows(batch) if batch else [], touched)
+        except Exception:
+            if batch:
+                self.revisions.restore(batch)
+            self._restore_touched(touched)
+            raise
+        self._count_flush(states)
+
+    async def _write_async(self, states: Dict[str, SessionState], flushing: bool = False):
+        if not states and not flushing:
+            return
+        batch = self.revisions.take() if self.revisions is not None else []
+        touched = self._take_touched(states) if flushing else []
+        if not states and not batch and not touched:
+            return
+        try:
+            await self.async_database.save_sessions(states, self.revisions.rows(batch) if batch else [], touched)
+        except Exception:
+            if batch:
+                self.revisions.restore(batch)
+            self._restore_touched(touched)
+            raise
+        self._count_flush(states)
+
+    def _take_touched(self, states: Dict[str, SessionState]) -> List[str]:
+        # Sessions written anyway get their last activity from the write
+        with self.lock:
+            touched = [session_id for session_id in self.touched if session_id not in states]
+            self.touched = set()
+            return touched
+
+    def _restore_touched(self, touched: List[str]):
+        with self.lock:
+            self.touched.update(touched)
+
+    def _touch(self, session_id: str, entry: Optional[CacheEntry]):
+        # Caller holds the lock
+        now = time.monotonic()
+        if entry is not None:
+            if now - entry.touched_at < SESSION_TOUCH_SECONDS:
+                return
+            entry.touched_at = now
+        if session_id not in self.touched:
+            self.touched.add(session_id)
+            self.counters["touches"] += 1
+
+    def _record(self, session_id: str, previous: Optional[SessionState], state: SessionState):
+        if self.revisions is not None:
+            self.revisions.record(session_id, state.version, state.language, previous.code if previous else None, state.code)
+
+    def _count_flush(self, states: Dict[str, SessionState]):
+        with self.lock:
+            self.counters["flushes"] += 1
+            self.counters["flushed_sessions"] += len(states)
+
+    def _after_write(self, evicted: Dict[str, SessionState]):
+        if self.flush_seconds <= 0:
+            self.flush()
+        else:
+            self._write(evicted)
+            self._ensure_flusher()
+
+    async def _after_write_async(self, evicted: Dict[str, SessionState]):
+        if self.flush_seconds <= 0:
+            await self.flush_async()
+        else:
+            await self._write_async(evicted)
+            self._ensure_flusher()
+
+    def _lookup(self, session_id: str) -> Optional[SessionState]:
+        with self.lock:
+            entry = self.entries.get(session_id)
+            if entry is not None:
+                self.entries.move_to_end(session_id)
+                self.counters["hits"] += 1
+                self._touch(session_id, entry)
+                state = entry.state
+            else:
+                self.counters["misses"] += 1
+                return None
+        if self.touched and self.flush_seconds > 0:
+            self._ensure_flusher()
+        return state
+
+    def _fill(self, session_id: str, state: SessionState) -> Tuple[SessionState, Dict[str, SessionState]]:
+        with self.lock:
+            # A concurrent write may have filled the entry meanwhile; keep the newer one
+            entry = self.entries.get(session_id)
+            if entry is not None:
+                return entry.state, {}
+            self._touch(session_id, None)
+            return state, self._store(session_id, state, dirty=False)
+
+    def _update(self, session_id: str, loaded: SessionState, code: Optional[str], language: Optional[SupportedLanguage]) -> Tuple[SessionState, Optional[Dict[str, SessionState]]]:
+        # Returns the new state and the evicted sessions, or None for them if nothing changed
+        with self.lock:
+            entry = self.entries.get(session_id)
+            current = entry.state if entry is not None else loaded
+            edit = diff_edit(current.code, code) if code is not None else None
+            if edit is None and (language is None or language == current.language):
+                return current, None
+
+            update = {}
+            if edit is not None:
+                update["code"] = code
+                update["version"] = current.version + 1
+                self.database.history.record(session_id, current.version + 1, [edit])
+            if language is not None:
+                update["language"] = language
+            state = current.model_copy(update=update)
+            if edit is not None:
+                self._record(session_id, current, state)
+            self.counters["writes"] += 1
+            return state, self._store(session_id, state, dirty=True)
+
+    def _patch(self, session_id: str, loaded: SessionState, base_version: int, edits: List[TextEdit]) -> Tuple[SessionState, Optional[Dict[str, SessionState]]]:
+        with self.lock:
+            entry = self.entries.get(session_id)
+            current = entry.state if entry is not None else loaded
+            new_code = apply_patch(self.database.history, session_id, current.code, current.version, base_version, edits)
+            if new_code == current.code:
+                return current, None
+            state = current.model_copy(update={"code": new_code, "version": current.version + 1})
+            self._record(session_id, current, state)
+            self.counters["writes"] += 1
+            return state, self._store(session_id, state, dirty=True)
+
+    def get_session(self, session_id: str) -> Optional[SessionState]:
+        state = self._lookup(session_id)
+        if state is not None:
+            return state
+        state = self.database.get_session(session_id)
+        if state is None:
+            return None
+        state, evicted = self._fill(session_id, state)
+        self._write(evicted)
+        return state
+
+    async def get_session_async(self, session_id: str) -> Optional[SessionState]:
+        state = self._lookup(session_id)
+        if state is not None:
+            return state
+        state = await self.async_database.get_session(session_id)
+        if state is None:
+            return None
+        state, evicted = self._fill(session_id, state)
+        await self._write_async(evicted)
+        return state
+
+    def create_session(self, session_id: str, default_code: str, language: SupportedLanguage = 'javascript') -> SessionState:
+        # Creation is written through so the row exists for other readers. If the
+        # session already exists, the cached copy (possibly newer) is returned.
+        state = self.database.create_session(session_id, default_code=default_code, language=language)
+        recorded = state.version == 0 and self.revisions is not None
+        if recorded:
+            self._record(session_id, None, state)
+        state, evicted = self._fill(session_id, state)
+        if recorded:
+            # Also schedules the flush that writes the first revision
+            self._after_write(evicted)
+        else:
+            self._write(evicted)
+        return state
+
+    async def create_session_async(self, session_id: str, default_code: str, language: SupportedLanguage = 'javascript') -> SessionState:
+        state = await self.async_database.create_session(session_id, default_code=default_code, language=language)
+        recorded = state.version == 0 and self.revisions is not None
+        if recorded:
+            self._record(session_id, None, state)
+        state, evicted = self._fill(session_id, state)
+        if recorded:
+            await self._after_write_async(evicted)
+        else:
+            await self._write_async(evicted)
+        return state
+
+    def update_session(self, session_id: str, code: Optional[str] = None, language: Optional[SupportedLanguage] = None) -> Optional[SessionState]:
+        loaded = self.get_session(session_id)
+        if loaded is None:
+            return None
+        state, evicted = self._update(session_id, loaded, code, language)
+        if evicted is not None:
+            self._after_write(evicted)
+        return state
+
+    async def update_session_async(self, session_id: str, code: Optional[str] = None, language: Optional[SupportedLanguage] = None) -> Optional[SessionState]:
+        loaded = await self.get_session_async(session_id)
+        if loaded is None:
+            return None
+        state, evicted = self._update(session_id, loaded, code, language)
+        if evicted is not None:
+            await self._after_write_async(evicted)
+        return state
+
+    def apply_patch(self, session_id: str, base_version: int, edits: List[TextEdit]) -> Optional[SessionState]:
+        loaded = self.get_session(session_id)
+        if loaded is None:
+            return None
+        state, evicted = self._patch(session_id, loaded, base_version, edits)
+        if evicted is not None:
+            self._after_write(evicted)
+        return state
+
+    async def apply_patch_async(self, session_id: str, base_version: int, edits: List[TextEdit]) -> Optional[SessionState]:
+        loaded = await self.get_session_async(session_id)
+        if loaded is None:
+            return None
+        state, evicted = self._patch(session_id, loaded, base_version, edits)
+        if evicted is not None:
+            await self._after_write_async(evicted)
+        return state
+
+    def delete_session(self, session_id: str) -> bool:
+        with self.lock:
+            self.entries.pop(session_id, None)
+        return self.database.delete_session(session_id)
+
+    async def delete_session_async(self, session_id: str) -> bool:
+        with self.lock:
+            self.entries.pop(session_id, None)
+        return await self.async_database.delete_session(session_id)
+
+    def adopt(self, session_id: str, state: SessionState):
+        """Takes a state written by another server process, unless ours is newer.
+
+        The writing process persists it, so the entry is stored clean. Edits made
+        concurrently on two processes resolve last-writer-wins.
+        """
+        with self.lock:
+            entry = self.entries.get(session_id)
+            if entry is not None and entry.state.version > state.version:
+                return
+            # Runs on the event loop, so evicted edits wait for the flusher instead
+            self.pending.update(self._store(session_id, state, dirty=False))
+        if self.pending and self.flush_seconds > 0:
+            self._ensure_flusher()
+
+    def has_unsaved(self, session_id: str) -> bool:
+        """Whether the session has writes or reads the database has not seen yet."""
+        with self.lock:
+            entry = self.entries.get(session_id)
+            return (entry is not None and entry.dirty) or session_id in self.pending or session_id in self.touched
+
+    def forget(self, session_ids: Iterable[str]):
+        """Drops clean entries for sessions removed from the database behind the cache."""
+        with self.lock:
+            for session_id in session_ids:
+                entry = self.entries.get(session_id)
+                if entry is not None and not entry.dirty:
+                    del self.entries[session_id]
+
+    def _take_dirty(self) -> Dict[str, SessionState]:
+        with self.lock:
+            dirty = {session_id: entry.state for session_id, entry in self.entries.items() if entry.dirty}
+            for session_id in dirty:
+                self.entries[session_id].dirty = False
+            dirty = {**self.pending, **dirty}
+            self.pending = {}
+            return dirty
+
+    def _restore_dirty(self, dirty: Dict[str, SessionState]):
+        # Re-mark unless a newer write already did
+        with self.lock:
+            for session_id, state in dirty.items():
+                entry = self.entries.get(session_id)
+                if entry is None:
+                    self.pending.setdefault(session_id, state)
+                elif entry.state is state:
+                    entry.dirty = True
+
+    def flush(self):
+        """Writes every dirty session to the database in one transaction."""
+        dirty = self._take_dirty()
+        try:
+            self._write(dirty, flushing=True)
+        except Exception:
+            self._restore_dirty(dirty)
+            raise
+
+    async def flush_async(self):
+        dirty = self._take_dirty()
+        try:
+            await self._write_async(dirty, flushing=True)
+        except Exception:
+            self._restore_dirty(dirty)
+            raise
+
+    def _ensure_flusher(self):
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self.lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._stop.clear()
+            self._flusher = threading.Thread(target=self._flush_loop, name="session-cache-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+                if self.revisions is not None:
+                    self.revisions.maybe_prune()
+            except Exception:
+                logger.exception("Session cache flush failed")
+
+    def close(self):
+        """Stops the periodic flush and writes out everything still dirty."""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+
+    def clear(self):
+        """Drops all entries without flushing them."""
+        with self.lock:
+            self.entries.clear()
+            self.pending.clear()
+            self.touched.clear()
+        if self.revisions is not None:
+            self.revisions.take()
+
+    def stats(self) -> dict:
+        with self.lock:
+            dirty = sum(1 for entry in self.entries.values() if entry.dirty)
+            return {
+                **self.counters,
+                "size": len(self.entries),
+                "dirty": dirty,
+                "capacity": self.capacity,
+                "flush_seconds": self.flush_seconds,
+            }
+
+# Singleton instance
+session_cache = SessionCache(db, async_database=async_db, revisions=RevisionLog() if SESSION_HISTORY else None)
+atexit.register(session_cache.close)
@@ -0,0 +1,28 @@
+import os
+import pytest
+import shutil
+import tempfile
+
+# Point the app at a throwaway database before any backend module is imported
+_test_db_dir = tempfile.mkdtemp(prefix="live-code-studio-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_test_db_dir, 'test.db')}"
+# Cheapest bcrypt cost, so signups and logins don't dominate the suite
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+# Tests open many sessions from one client; the rate limit's own tests enable it
+os.environ.setdefault("SESSION_CREATE_PER_MINUTE", "0")
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_test_db_dir, ignore_errors=True)
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    # The app creates its tables at startup, which TestClient without `with` skips
+    from .database import init_database
+    init_database()
+
+@pytest.fixture(autouse=True)
+def reset_session_cache():
+    yield
+    # Tests drop tables between runs, so cached sessions must not outlive a test
+    from .cache import session_cache
+    session_cache.clear()
@@ -1,9 +1,17 @@
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 import os
-from sqlalchemy import create_engine, Column, String, Integer, Text, BigInteger
+import time
+import zlib
+from sqlalchemy import create_engine, delete, event, inspect, select, text, update, Column, String, Integer, Text, BigInteger, Float, LargeBinary
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from .models import SessionState, SupportedLanguage
+from .models import SessionState, SupportedLanguage, TextEdit
+from .observability import instrument_engine
+from .patches import PatchHistory, apply_patch, diff_edit
 
 # Database Setup
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sql_app.db")
@@ -12,8 +20,101 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sql_app.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
+# Connection pool (ignored for in-memory SQLite, which keeps one connection per thread)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+# Compiled SQL kept per engine, so repeated queries skip statement compilation
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+
+# SQLite pragmas applied to every new connection. WAL lets readers proceed while a
+# session update commits; NORMAL sync is durable in WAL mode except on power loss.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+def _engine_options(url: str) -> dict:
+    options = {"query_cache_size": DB_STATEMENT_CACHE_SIZE, "pool_pre_ping": DB_POOL_PRE_PING}
+    path = url.split("?")[0].split("://", 1)[-1]
+    in_memory = url.startswith("sqlite") and (path in ("", "/:memory:") or "mode=memory" in url)
+    if not in_memory:
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return options
+
+def _set_sqlite_pragmas(target: Engine):
+    @event.listens_for(target, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.close()
+
+def build_engine(url: str) -> Engine:
+    options = _engine_options(url)
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+    elif url.startswith("postgresql"):
+        # Batch executemany() into multi-row statements (psycopg2)
+        options["executemany_mode"] = "values_plus_batch"
+        options["connect_args"] = {"application_name": "live-code-studio"}
+
+    new_engine = create_engine(url, **options)
+    if url.startswith("sqlite"):
+        _set_sqlite_pragmas(new_engine)
+    instrument_engine(new_engine, "sync")
+    return new_engine
+
+def async_url(url: str) -> str:
+    """The same database addressed through an asyncio driver (aiosqlite / asyncpg)."""
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+def build_async_engine(url: str) -> AsyncEngine:
+    """Asyncio counterpart of build_engine(), with the same pool settings and pragmas."""
+    url = async_url(url)
+    options = _engine_options(url)
+    if url.startswith("postgresql+asyncpg"):
+        options["connect_args"] = {"server_settings": {"application_name": "live-code-studio"}}
+
+    new_engine = create_async_engine(url, **options)
+    if url.startswith("sqlite"):
+        _set_sqlite_pragmas(new_engine.sync_engine)
+    instrument_engine(new_engine.sync_engine, "async")
+    return new_engine
+
+def check_database(target: Optional[Engine] = None) -> Dict[str, object]:
+    """Connects once and reports the settings actually in effect."""
+    target = target or engine
+    settings: Dict[str, object] = {"dialect": target.dialect.name, "pool": type(target.pool).__name__}
+    if isinstance(target.pool, QueuePool):
+        settings.update(pool_size=target.pool.size(), max_overflow=target.pool._max_overflow)
+    with target.connect() as conn:
+        if target.dialect.name == "sqlite":
+            for pragma in ("journal_mode", "synchronous", "busy_timeout", "mmap_size"):
+                settings[pragma] = conn.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+            settings["synchronous"] = ["OFF", "NORMAL", "FULL", "EXTRA"][settings["synchronous"]]
+        elif target.dialect.name == "postgresql":
+            settings["server_version"] = conn.exec_driver_sql("SHOW server_version").scalar()
+    return settings
+
+engine = build_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Used by the request handlers, so database waits never hold a threadpool thread
+async_engine = build_async_engine(DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -25,6 +126,33 @@ class DBSession(Base):
     code = Column(Text, default="")
     language = Column(String, default="javascript")
     connected_users = Column(Integer, default=0)
+    version = Column(Integer, default=0, nullable=False, server_default="0")
+    # Unix time of the last write or (batched) read; the reaper finds idle sessions by it
+    last_active = Column(Float, nullable=False, server_default="0", index=True)
+
+class DBArchivedSession(Base):
+    """A session the reaper moved out of `sessions` after it sat idle; reading it restores it."""
+    __tablename__ = "session_archive"
+
+    id = Column(String, primary_key=True)
+    # zlib-compressed code
+    data = Column(LargeBinary, nullable=False)
+    language = Column(String, nullable=False)
+    version = Column(Integer, nullable=False)
+    last_active = Column(Float, nullable=False)
+    archived_at = Column(Float, nullable=False, index=True)
+
+class DBRevision(Base):
+    """One version of a session: a full snapshot, or the edits from the previous version."""
+    __tablename__ = "session_revisions"
+
+    session_id = Column(String, primary_key=True)
+    version = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # "snapshot" or "delta"
+    language = Column(String, nullable=False)
+    # zlib-compressed code (snapshot) or JSON list of TextEdits (delta)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(Float, nullable=False, index=True)
 
 class DBUser(Base):
     __tablename__ = "users"
@@ -34,11 +162,124 @@ class DBUser(Base):
     full_name = Column(String)
     hashed_password = Column(String)
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+def add_missing_columns(target: Engine) -> List[Tuple[str, str]]:
+    """Adds columns and indexes introduced after a table was created; create_all never
+    alters existing tables. Returns the (table, column) pairs it added."""
+    inspector = inspect(target)
+    added = []
+    with target.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(target.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" NOT NULL DEFAULT {column.server_default.arg}"
+                conn.execute(text(ddl))
+                added.append((table.name, column.name))
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+    return added
+
+def init_database(target: Optional[Engine] = None):
+    """Creates missing tables, columns and indexes. Called at startup rather than on
+    import, so importing the app never touches the database."""
+    target = target or engine
+    Base.metadata.create_all(bind=target)
+    if ("sessions", "last_active") in add_missing_columns(target):
+        # Rows from before activity was tracked count as active now, not as idle since 1970
+        with target.begin() as conn:
+            conn.execute(update(DBSession).values(last_active=time.time()))
+
+def to_state(db_session: DBSession) -> SessionState:
+    return SessionState(
+        code=db_session.code,
+        language=db_session.language, # type: ignore
+        connectedUsers=db_session.connected_users,
+        version=db_session.version or 0
+    )
+
+# Columns every write returns, so no write needs a follow-up SELECT
+RETURNED = (DBSession.code, DBSession.language, DBSession.connected_users, DBSession.version)
+
+def _insert(dialect: str, model=DBSession):
+    if dialect == "postgresql":
+        # Only loaded when Postgres is in use
+        from sqlalchemy.dialects import postgresql
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+def create_statement(dialect: str, session_id: str, code: str, language: str, version: int = 0):
+    """INSERT that returns the existing row instead of failing when the id is taken."""
+    stmt = _insert(dialect).values(id=session_id, code=code, language=language, connected_users=0, version=version, last_active=time.time())
+    # A no-op update rather than DO NOTHING, which would return no row
+    return stmt.on_conflict_do_update(index_elements=[DBSession.id], set_={"version": DBSession.version}).returning(*RETURNED)
+
+def save_statement(dialect: str, states: Dict[str, SessionState]):
+    """One multi-row upsert writing full session states."""
+    now = time.time()
+    stmt = _insert(dialect).values([
+        {"id": session_id, "code": state.code, "language": state.language, "version": state.version, "connected_users": 0, "last_active": now}
+        for session_id, state in states.items()
+    ])
+    return stmt.on_conflict_do_update(
+        index_elements=[DBSession.id],
+        set_={"code": stmt.excluded.code, "language": stmt.excluded.language, "version": stmt.excluded.version, "last_active": stmt.excluded.last_active},
+    )
+
+def touch_statement(session_ids: List[str], now: float):
+    """Records reads: sessions that were only viewed are not idle either."""
+    return update(DBSession).where(DBSession.id.in_(session_ids), DBSession.last_active < now).values(last_active=now)
+
+def chunked(rows: List[dict], size: int = 1000) -> List[List[dict]]:
+    # Keeps multi-row statements under SQLite's bound-parameter limit
+    return [rows[i:i + size] for i in range(0, len(rows), size)]
+
+def revisions_statement(dialect: str, revisions: List[dict]):
+    """Inserts revision rows, replacing any left over under the same version."""
+    stmt = _insert(dialect, DBRevision).values(revisions)
+    return stmt.on_conflict_do_update(
+        index_elements=[DBRevision.session_id, DBRevision.version],
+        set_={column: stmt.excluded[column] for column in ("kind", "language", "data", "created_at")},
+    )
+
+def read_statement(session_id: str):
+    return select(*RETURNED).where(DBSession.id == session_id)
+
+def write_statement(session_id: str, read_version: Optional[int], values: dict):
+    """UPDATE that only applies if nobody wrote since `read_version` was read; returns no row otherwise."""
+    return update(DBSession).where(DBSession.id == session_id, DBSession.version == read_version).values(**values, last_active=time.time()).returning(*RETURNED)
+
+def archived_statement(session_id: str):
+    return select(DBArchivedSession).where(DBArchivedSession.id == session_id)
+
+def restore_revision(archived: DBArchivedSession) -> dict:
+    # History before archiving is gone; a snapshot lets later versions be rebuilt
+    return {"session_id": archived.id, "version": archived.version, "kind": "snapshot", "language": archived.language, "data": archived.data, "created_at": time.time()}
+
+def restore_statement(dialect: str, archived: DBArchivedSession):
+    return create_statement(dialect, archived.id, zlib.decompress(archived.data).decode("utf-8"), archived.language, archived.version)
+
+def updated_values(row, code: Optional[str], language: Optional[SupportedLanguage]) -> Tuple[Optional[TextEdit], dict]:
+    edit = diff_edit(row.code or "", code) if code is not None else None
+    values = {}
+    if edit is not None:
+        values.update(code=code, version=(row.version or 0) + 1)
+    if language is not None and language != row.language:
+        values["language"] = language
+    return edit, values
 
 # Database Interface
 class Database:
+    def __init__(self, history: Optional[PatchHistory] = None):
+        # Recent edits per session, used to rebase patches sent against an older version
+        self.history = history or PatchHistory()
+
     def get_db(self):
         db = SessionLocal()
         try:
@@ -49,71 +290,216 @@ class Database:
     def get_session(self, session_id: str) -> Optional[SessionState]:
         db = SessionLocal()
         try:
-            db_session = db.query(DBSession).filter(DBSession.id == session_id).first()
-            if db_session:
-                return SessionState(
-                    code=db_session.code,
-                    language=db_session.language, # type: ignore
-                    connectedUsers=db_session.connected_users
-                )
-            return None
+            row = db.execute(read_statement(session_id)).first()
+            if row is None:
+                row = self._restore(db, session_id)
+            return to_state(row) if row else None
         finally:
             db.close()
 
+    def _restore(self, db, session_id: str):
+        """Moves an archived session back into `sessions`; returns its row, or None."""
+        archived = db.execute(archived_statement(session_id)).scalar_one_or_none()
+        if archived is None:
+            return None
+        dialect = db.get_bind().dialect.name
+        row = db.execute(restore_statement(dialect, archived)).one()
+        db.execute(revisions_statement(dialect, [restore_revision(archived)]))
+        db.execute(delete(DBArchivedSession).where(DBArchivedSession.id == session_id))
+        db.commit()
+        self.history.forget(session_id)
+        return row
+
     def create_session(self, session_id: str, default_code: str, language: SupportedLanguage = 'javascript') -> SessionState:
+        """Creates the session, or returns it as stored if it already exists."""
         db = SessionLocal()
         try:
-            db_session = DBSession(
-                id=session_id,
-                code=default_code,
-                language=language,
-                connected_users=0
-            )
-            db.add(db_session)
+            row = db.execute(create_statement(db.get_bind().dialect.name, session_id, default_code, language)).one()
             db.commit()
-            db.refresh(db_session)
-            return SessionState(
-                code=db_session.code,
-                language=db_session.language, # type: ignore
-                connectedUsers=db_session.connected_users
-            )
+            if row.version == 0:
+                self.history.forget(session_id)
+            return to_state(row)
         finally:
             db.close()
 
     def update_session(self, session_id: str, code: Optional[str] = None, language: Optional[SupportedLanguage] = None) -> Optional[SessionState]:
         db = SessionLocal()
         try:
-            db_session = db.query(DBSession).filter(DBSession.id == session_id).first()
-            if not db_session:
-                return None
-            
-            if code is not None:
-                db_session.code = code
-            if language is not None:
-                db_session.language = language
-            
+            while True:
+                row = db.execute(read_statement(session_id)).first()
+                if not row:
+                    return None
+                # The edit is diffed against the stored code for patch rebasing, so this
+                # one read stays; the write is conditional on it instead of locking
+                edit, values = updated_values(row, code, language)
+                if not values:
+                    return to_state(row)
+                updated = db.execute(write_statement(session_id, row.version, values)).first()
+                db.commit()
+                if updated is None:
+                    continue
+                if edit is not None:
+                    self.history.record(session_id, updated.version, [edit])
+                return to_state(updated)
+        finally:
+            db.close()
+
+    def apply_patch(self, session_id: str, base_version: int, edits: List[TextEdit]) -> Optional[SessionState]:
+        """Applies edits made against `base_version`, rebasing them over newer versions if needed.
+
+        Raises PatchConflict if the intervening edits are no longer known, and ValueError
+        if an edit falls outside the document.
+        """
+        db = SessionLocal()
+        try:
+            while True:
+                row = db.execute(read_statement(session_id)).first()
+                if not row:
+                    return None
+
+                current_version = row.version or 0
+                new_code = apply_patch(self.history, session_id, row.code or "", current_version, base_version, edits)
+                if new_code == row.code:
+                    return to_state(row)
+
+                updated = db.execute(write_statement(session_id, row.version, {"code": new_code, "version": current_version + 1})).first()
+                db.commit()
+                if updated is not None:
+                    return to_state(updated)
+        finally:
+            db.close()
+
+    def save_sessions(self, states: Dict[str, SessionState], revisions: List[dict] = (), touched: Iterable[str] = ()):
+        """Writes full session states in one statement, creating rows that do not exist,
+        plus any DBRevision rows and the last activity of sessions that were only read,
+        in one transaction."""
+        touched = list(touched)
+        if not states and not revisions and not touched:
+            return
+        db = SessionLocal()
+        try:
+            dialect = db.get_bind().dialect.name
+            if states:
+                db.execute(save_statement(dialect, states))
+            for chunk in chunked(list(revisions)):
+                db.execute(revisions_statement(dialect, chunk))
+            now = time.time()
+            for chunk in chunked(touched):
+                db.execute(touch_statement(chunk, now))
             db.commit()
-            db.refresh(db_session)
-            
-            return SessionState(
-                code=db_session.code,
-                language=db_session.language, # type: ignore
-                connectedUsers=db_session.connected_users
-            )
         finally:
             db.close()
 
     def delete_session(self, session_id: str) -> bool:
         db = SessionLocal()
         try:
-            db_session = db.query(DBSession).filter(DBSession.id == session_id).first()
-            if db_session:
-                db.delete(db_session)
-                db.commit()
-                return True
-            return False
+            deleted = db.execute(delete(DBSession).where(DBSession.id == session_id)).rowcount
+            db.execute(delete(DBRevision).where(DBRevision.session_id == session_id))
+            db.commit()
+            self.history.forget(session_id)
+            return deleted > 0
         finally:
             db.close()
 
-# Singleton instance
+class AsyncDatabase:
+    """Database on the asyncio engine, for request handlers.
+
+    Mirrors Database method for method; pass the sync instance's history so
+    patches rebase the same way whichever interface wrote the previous edit.
+    """
+
+    def __init__(self, history: Optional[PatchHistory] = None, session_factory: async_sessionmaker = AsyncSessionLocal):
+        self.history = history or PatchHistory()
+        self.session_factory = session_factory
+
+    async def get_session(self, session_id: str) -> Optional[SessionState]:
+        async with self.session_factory() as db:
+            row = (await db.execute(read_statement(session_id))).first()
+            if row is None:
+                row = await self._restore(db, session_id)
+            return to_state(row) if row else None
+
+    async def _restore(self, db, session_id: str):
+        """See Database._restore()."""
+        archived = (await db.execute(archived_statement(session_id))).scalar_one_or_none()
+        if archived is None:
+            return None
+        dialect = db.bind.dialect.name
+        row = (await db.execute(restore_statement(dialect, archived))).one()
+        await db.execute(revisions_statement(dialect, [restore_revision(archived)]))
+        await db.execute(delete(DBArchivedSession).where(DBArchivedSession.id == session_id))
+        await db.commit()
+        self.history.forget(session_id)
+        return row
+
+    async def create_session(self, session_id: str, default_code: str, language: SupportedLanguage = 'javascript') -> SessionState:
+        """Creates the session, or returns it as stored if it already exists."""
+        async with self.session_factory() as db:
+            row = (await db.execute(create_statement(db.bind.dialect.name, session_id, default_code, language))).one()
+            await db.commit()
+            if row.version == 0:
+                self.history.forget(session_id)
+            return to_state(row)
+
+    async def update_session(self, session_id: str, code: Optional[str] = None, language: Optional[SupportedLanguage] = None) -> Optional[SessionState]:
+        async with self.session_factory() as db:
+            while True:
+                row = (await db.execute(read_statement(session_id))).first()
+                if not row:
+                    return None
+                edit, values = updated_values(row, code, language)
+                if not values:
+                    return to_state(row)
+                updated = (await db.execute(write_statement(session_id, row.version, values))).first()
+                await db.commit()
+                if updated is None:
+                    continue
+                if edit is not None:
+                    self.history.record(session_id, updated.version, [edit])
+                return to_state(updated)
+
+    async def apply_patch(self, session_id: str, base_version: int, edits: List[TextEdit]) -> Optional[SessionState]:
+        """See Database.apply_patch()."""
+        async with self.session_factory() as db:
+            while True:
+                row = (await db.execute(read_statement(session_id))).first()
+                if not row:
+                    return None
+
+                current_version = row.version or 0
+                new_code = apply_patch(self.history, session_id, row.code or "", current_version, base_version, edits)
+                if new_code == row.code:
+                    return to_state(row)
+
+                updated = (await db.execute(write_statement(session_id, row.version, {"code": new_code, "version": current_version + 1}))).first()
+                await db.commit()
+                if updated is not None:
+                    return to_state(updated)
+
+    async def save_sessions(self, states: Dict[str, SessionState], revisions: List[dict] = (), touched: Iterable[str] = ()):
+        """See Database.save_sessions()."""
+        touched = list(touched)
+        if not states and not revisions and not touched:
+            return
+        async with self.session_factory() as db:
+            dialect = db.bind.dialect.name
+            if states:
+                await db.execute(save_statement(dialect, states))
+            for chunk in chunked(list(revisions)):
+                await db.execute(revisions_statement(dialect, chunk))
+            now = time.time()
+            for chunk in chunked(touched):
+                await db.execute(touch_statement(chunk, now))
+            await db.commit()
+
+    async def delete_session(self, session_id: str) -> bool:
+        async with self.session_factory() as db:
+            deleted = (await db.execute(delete(DBSession).where(DBSession.id == session_id))).rowcount
+            await db.execute(delete(DBRevision).where(DBRevision.session_id == session_id))
+            await db.commit()
+            self.history.forget(session_id)
+            return deleted > 0
+
+# Singleton instances, sharing one patch history
 db = Database()
+async_db = AsyncDatabase(db.history)
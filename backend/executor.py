@@ -1,11 +1,57 @@
+import asyncio
+import atexit
+import codecs
+import math
 import subprocess
 import sys
 import tempfile
 import os
+import json
+import logging
+import shutil
+import signal
+import threading
 import uuid
 import time
+from collections import OrderedDict, deque
+from contextlib import nullcontext
 from pathlib import Path
-from .models import ExecutionResult
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple, Union
+from .models import ExecutionCapabilities, ExecutionResult, LanguageCapability
+from .observability import record_execution, record_spawn
+from .result_cache import EXECUTION_CACHE_SIZE, EXECUTION_CACHE_TTL_SECONDS, ResultCache, result_key
+from .transpiler import EXECUTOR_TYPESCRIPT_MODULE, TranspileError, Transpiler
+from .sandbox import PROFILES, ExecutionProfile, apply_rlimits, classify_violation
+
+logger = logging.getLogger(__name__)
+
+# Worker pool configuration
+EXECUTOR_POOL_SIZE = int(os.getenv("EXECUTOR_POOL_SIZE", "2"))
+# Python workers fork a fresh child per job, so one warm interpreter can serve many jobs
+EXECUTOR_MAX_JOBS_PER_WORKER = int(os.getenv("EXECUTOR_MAX_JOBS_PER_WORKER", "100"))
+EXECUTOR_PREWARM = [lang for lang in os.getenv("EXECUTOR_PREWARM", "python,javascript").split(",") if lang]
+
+# Concurrency configuration: runs beyond the limits wait in a bounded queue,
+# and requests beyond the queue are rejected straight away
+EXECUTOR_MAX_CONCURRENCY = int(os.getenv("EXECUTOR_MAX_CONCURRENCY", str(os.cpu_count() or 2)))
+EXECUTOR_MAX_CONCURRENCY_PER_LANGUAGE = int(os.getenv("EXECUTOR_MAX_CONCURRENCY_PER_LANGUAGE", str(EXECUTOR_MAX_CONCURRENCY)))
+EXECUTOR_MAX_QUEUE = int(os.getenv("EXECUTOR_MAX_QUEUE", "32"))
+# Weight of the newest run in each language's moving latency average, reported as a cost hint
+EXECUTOR_LATENCY_SMOOTHING = 0.2
+# Session sandboxes: interpreters kept per session so runs share state; 0 disables them
+EXECUTOR_SESSION_SANDBOXES = int(os.getenv("EXECUTOR_SESSION_SANDBOXES", "8"))
+EXECUTOR_SESSION_SANDBOX_IDLE_SECONDS = float(os.getenv("EXECUTOR_SESSION_SANDBOX_IDLE_SECONDS", "900"))
+# Languages with session sandboxes; a Node process cannot tell when a run's timers are done
+SANDBOX_LANGUAGES = ("python",)
+
+TIMEOUTS = {
+    "python": 5,
+    "javascript": 5,
+    "typescript": 5,
+}
+
+# TypeScript is transpiled up front and then runs on the JavaScript workers
+WORKER_LANGUAGE = {"typescript": "javascript"}
 
 def run_command(command, error_msg="Error detected", timeout=5):
     try:
@@ -14,74 +60,923 @@ def run_command(command, error_msg="Error detected", timeout=5):
             capture_output=True,
             text=True,
             timeout=timeout,
-            shell=True 
+            shell=True
         )
         return result
     except subprocess.TimeoutExpired:
         raise TimeoutError("Execution timed out (5s limit)")
 
-def execute_code(code: str, language: str) -> ExecutionResult:
-    start_time = time.time()
-    
-    # Create a unique temporary directory for this execution
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-        output = ""
-        success = False
-        error = None
+# Python worker: reads framed jobs from stdin and forks a child per job, so every
+# run gets a clean interpreter without paying for startup. The child applies the
+# job's rlimits before running user code. After each job the worker writes a
+# per-job boundary to stdout and stderr: "\n<boundary>:<exit code>:<peak RSS KB>:<CPU ms>\n".
+PYTHON_WORKER = r'''
+import os, sys, json, runpy, traceback, resource
+import collections, functools, itertools, math, re, heapq, bisect, typing
+
+def apply_rlimits(limits):
+    for name, (soft, hard) in limits.items():
+        which = getattr(resource, name)
+        _, current_hard = resource.getrlimit(which)
+        if current_hard != resource.RLIM_INFINITY:
+            soft, hard = min(soft, current_hard), min(hard, current_hard)
+        resource.setrlimit(which, (soft, hard))
+
+def run_job(job, source):
+    os.chdir(job["dir"])
+    path = os.path.join(job["dir"], "script.py")
+    with open(path, "wb") as f:
+        f.write(source)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    sys.argv = [path]
+    sys.path[0] = job["dir"]
+    code = 0
+    try:
+        apply_rlimits(job["limits"])
+        runpy.run_path(path, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException as e:
+        # Hide the worker and runpy frames from the user's traceback
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != path:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb)
+        code = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(code)
+
+for _ in range(int(sys.argv[1])):
+    header = sys.stdin.buffer.readline()
+    if not header:
+        break
+    job = json.loads(header)
+    source = sys.stdin.buffer.read(job["size"])
+    pid = os.fork()
+    if pid == 0:
+        run_job(job, source)
+    _, status, usage = os.wait4(pid, 0)
+    cpu_ms = round((usage.ru_utime + usage.ru_stime) * 1000)
+    marker = "\n%s:%d:%d:%d\n" % (job["boundary"], os.waitstatus_to_exitcode(status), usage.ru_maxrss, cpu_ms)
+    sys.stdout.write(marker)
+    sys.stdout.flush()
+    sys.stderr.write(marker)
+    sys.stderr.flush()
+'''
+
+# Session sandbox: one interpreter that runs every job in the same namespace, so
+# variables, functions and imports carry over between runs. A trailing expression is
+# echoed like in the interactive interpreter. Limits other than CPU are applied at
+# spawn; the CPU limit is moved up before each job so every run gets its own budget.
+# Jobs and boundaries are framed like PYTHON_WORKER's; the job pipe is moved off fd 0.
+REPL_WORKER = r'''
+import ast, os, sys, json, resource, traceback
+import collections, functools, itertools, math, re, heapq, bisect, typing
+
+jobs = os.fdopen(os.dup(0), "rb")
+devnull = os.open(os.devnull, os.O_RDONLY)
+os.dup2(devnull, 0)
+stdout, stderr = sys.stdout, sys.stderr
+namespace = {"__name__": "__main__", "__builtins__": __builtins__}
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def run_job(job, source, path):
+    with open(path, "wb") as f:
+        f.write(source)
+    try:
+        tree = ast.parse(source, path)
+        echo = None
+        if tree.body and isinstance(tree.body[-1], ast.Expr):
+            echo = ast.Expression(tree.body.pop().value)
+        exec(compile(tree, path, "exec"), namespace)
+        if echo is not None:
+            value = eval(compile(echo, path, "eval"), namespace)
+            if value is not None:
+                namespace["_"] = value
+                print(repr(value))
+        return 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException as e:
+        # Hide the worker's own frames from the user's traceback
+        tb = e.__traceback__
+        while tb is not None and not os.path.basename(tb.tb_frame.f_code.co_filename).startswith("cell-"):
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb)
+        return 1
+
+count = 0
+while True:
+    header = jobs.readline()
+    if not header:
+        break
+    job = json.loads(header)
+    source = jobs.read(job["size"])
+    count += 1
+    if count == 1:
+        os.chdir(job["dir"])
+        sys.path[0] = job["dir"]
+    limit = job["limits"].get("RLIMIT_CPU")
+    if limit:
+        # Only the soft limit: it can be moved up again for the next job
+        resource.setrlimit(resource.RLIMIT_CPU, (int(cpu_seconds()) + limit[0], resource.getrlimit(resource.RLIMIT_CPU)[1]))
+    before = cpu_seconds()
+    code = run_job(job, source, os.path.join(job["dir"], "cell-%d.py" % count))
+    # A run may have swapped the streams out
+    sys.stdout, sys.stderr = stdout, stderr
+    sys.stdout.flush()
+    sys.stderr.flush()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_ms = round((cpu_seconds() - before) * 1000)
+    marker = ("\n%s:%d:%d:%d\n" % (job["boundary"], code, usage.ru_maxrss, cpu_ms)).encode()
+    os.write(1, marker)
+    os.write(2, marker)
+'''
+
+# Node worker: single job, then exits. A shared Node process cannot tell when one
+# job's timers and promises are done, so JS/TS workers are never reused. Its rlimits
+# are set when it is spawned; on exit it writes the same boundary as the Python worker.
+NODE_WORKER = r'''
+const fs = require('fs');
+const path = require('path');
+const chunks = [];
+let job = null;
+process.on('exit', (code) => {
+  if (!job) return;
+  const usage = process.resourceUsage();
+  const cpu = Math.round((usage.userCPUTime + usage.systemCPUTime) / 1000);
+  const marker = '\n' + job.boundary + ':' + code + ':' + usage.maxRSS + ':' + cpu + '\n';
+  fs.writeSync(1, marker);
+  fs.writeSync(2, marker);
+});
+process.stdin.on('data', (chunk) => chunks.push(chunk));
+process.stdin.on('end', () => {
+  const input = Buffer.concat(chunks);
+  const newline = input.indexOf(10);
+  job = JSON.parse(input.subarray(0, newline).toString());
+  const file = path.join(job.dir, 'script.' + job.ext);
+  fs.writeFileSync(file, input.subarray(newline + 1, newline + 1 + job.size));
+  process.chdir(job.dir);
+  process.argv[1] = file;
+  require(file);
+});
+'''
+
+class QueueFull(Exception):
+    """Raised when the execution wait queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Execution queue is full")
+        self.retry_after = retry_after
 
+class Worker:
+    def __init__(self, language: str, process: asyncio.subprocess.Process, reusable: bool):
+        self.language = language
+        self.process = process
+        self.reusable = reusable
+        self.jobs = 0
+
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    async def kill(self):
+        # Workers lead their own process group, so this also takes down forked jobs
         try:
-            # Write code to a temporary file
-            file_extension = {
-                "python": "py",
-                "javascript": "js",
-                "typescript": "ts",
-            }.get(language, "txt")
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        await self.process.wait()
+
+class WorkerPool:
+    """Keeps pre-spawned interpreters per language so runs skip interpreter startup.
+
+    Only used from the engine's event loop.
+    """
+
+    def __init__(
+        self,
+        size: int = EXECUTOR_POOL_SIZE,
+        max_jobs: int = EXECUTOR_MAX_JOBS_PER_WORKER,
+        profiles: Dict[str, ExecutionProfile] = PROFILES
+    ):
+        self.size = size
+        self.max_jobs = max(1, max_jobs)
+        self.profiles = profiles
+        self.idle: Dict[str, Deque[Worker]] = {}
+        self.workdir = Path(tempfile.mkdtemp(prefix="live-code-studio-workers-"))
+        (self.workdir / "node_worker.js").write_text(NODE_WORKER)
+        self.counters = {"spawned": 0, "warm_starts": 0, "cold_starts": 0, "recycled": 0}
+
+    def _command(self, language: str, sandbox: bool = False):
+        if sandbox:
+            return [sys.executable, "-c", REPL_WORKER]
+        if language == "python":
+            return [sys.executable, "-c", PYTHON_WORKER, str(self.max_jobs)]
+        if language == "javascript":
+            memory_mb = self.profiles[language].memory_mb
+            heap = [f"--max-old-space-size={memory_mb}"] if memory_mb else []
+            return ["node", *heap, str(self.workdir / "node_worker.js")]
+        return None
+
+    async def spawn(self, language: str, sandbox: bool = False) -> Worker:
+        # Python workers apply limits per forked job; single-use Node workers get them at spawn
+        limits = self.profiles[language].rlimits(address_space=False) if language != "python" else {}
+        if sandbox:
+            # Sandboxes apply their CPU limit per job themselves
+            limits = {name: limit for name, limit in self.profiles[language].rlimits().items() if name != "RLIMIT_CPU"}
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            *self._command(language, sandbox),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=self.workdir,
+            start_new_session=True,
+            preexec_fn=(lambda: apply_rlimits(limits)) if limits else None
+        )
+        self.counters["spawned"] += 1
+        record_spawn(language, time.perf_counter() - started)
+        return Worker(language, process, reusable=language == "python" or sandbox)
+
+    async def _refill(self, language: str):
+        idle = self.idle.setdefault(language, deque())
+        while len(idle) < self.size:
+            idle.append(await self.spawn(language))
+
+    async def prewarm(self, languages=EXECUTOR_PREWARM):
+        for language in languages:
+            if self._command(language):
+                await self._refill(language)
+
+    async def acquire(self, language: str) -> Worker:
+        worker = None
+        idle = self.idle.setdefault(language, deque())
+        while idle:
+            candidate = idle.popleft()
+            if candidate.alive():
+                worker = candidate
+                break
+        if worker is None:
+            worker = await self.spawn(language)
+            self.counters["cold_starts"] += 1
+        else:
+            self.counters["warm_starts"] += 1
+        # Single-use workers are replaced right away; spawning returns as soon as the
+        # process exists, so topping up never waits on interpreter startup
+        if not worker.reusable:
+            await self._refill(language)
+        return worker
+
+    async def release(self, worker: Worker, healthy: bool):
+        worker.jobs += 1
+        if healthy and worker.reusable and worker.jobs < self.max_jobs and worker.alive():
+            idle = self.idle.setdefault(worker.language, deque())
+            if len(idle) < self.size:
+                idle.appendleft(worker)
+                self.counters["recycled"] += 1
+                return
+        await worker.kill()
+        await self._refill(worker.language)
+
+    async def shutdown(self):
+        workers = [worker for idle in self.idle.values() for worker in idle]
+        self.idle.clear()
+        for worker in workers:
+            await worker.kill()
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "idle": {language: len(idle) for language, idle in self.idle.items()},
+            "size": self.size,
+            "max_jobs_per_worker": self.max_jobs,
+        }
+
+class SessionSandbox:
+    """A live interpreter and working directory bound to one session."""
+
+    def __init__(self, session_id: str, worker: Worker, directory: str):
+        self.session_id = session_id
+        self.worker = worker
+        self.directory = directory
+        # One run at a time; the namespace is shared
+        self.lock = asyncio.Lock()
+        self.runs = 0
+        self.last_used = time.monotonic()
+
+    def alive(self) -> bool:
+        return self.worker.alive()
+
+    async def close(self):
+        await self.worker.kill()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+class SandboxPool:
+    """Session sandboxes keyed by session id, so successive runs in a room keep their
+    interpreter state. At most `capacity` live at once, evicting the least recently
+    used idle one; a sandbox unused for `idle_seconds` is stopped.
+
+    Only used from the engine's event loop.
+    """
+
+    def __init__(self, pool: WorkerPool, capacity: int = EXECUTOR_SESSION_SANDBOXES, idle_seconds: float = EXECUTOR_SESSION_SANDBOX_IDLE_SECONDS):
+        self.pool = pool
+        self.capacity = max(0, capacity)
+        self.idle_seconds = idle_seconds
+        self.sandboxes: "OrderedDict[str, SessionSandbox]" = OrderedDict()
+        self.counters = {"created": 0, "reused": 0, "evicted": 0, "expired": 0, "reset": 0, "failed": 0}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    async def _remove(self, session_id: str, counter: str):
+        sandbox = self.sandboxes.pop(session_id, None)
+        if sandbox is not None:
+            self.counters[counter] += 1
+            await sandbox.close()
+
+    async def acquire(self, session_id: str, language: str) -> SessionSandbox:
+        """The session's sandbox, started if needed and locked for one run; pass it to
+        release() afterwards. Raises QueueFull when every sandbox is busy and none can
+        be evicted."""
+        while True:
+            sandbox = await self._get(session_id, language)
+            await sandbox.lock.acquire()
+            # It may have been stopped while this run waited for the previous one
+            if sandbox.alive() and self.sandboxes.get(session_id) is sandbox:
+                return sandbox
+            sandbox.lock.release()
+
+    async def release(self, sandbox: SessionSandbox, healthy: bool):
+        sandbox.last_used = time.monotonic()
+        # A run that timed out or died leaves nothing worth keeping
+        if not healthy or not sandbox.alive():
+            if self.sandboxes.get(sandbox.session_id) is sandbox:
+                await self._remove(sandbox.session_id, "failed")
+            else:
+                await sandbox.close()
+        sandbox.lock.release()
+
+    async def _get(self, session_id: str, language: str) -> SessionSandbox:
+        await self.expire()
+        sandbox = self.sandboxes.get(session_id)
+        if sandbox is not None and sandbox.alive():
+            self.sandboxes.move_to_end(session_id)
+            self.counters["reused"] += 1
+            return sandbox
+        await self._remove(session_id, "failed")
+
+        while len(self.sandboxes) >= self.capacity:
+            victim = next((item for item in self.sandboxes.values() if not item.lock.locked()), None)
+            if victim is None:
+                raise QueueFull(1)
+            await self._remove(victim.session_id, "evicted")
+
+        worker = await self.pool.spawn(language, sandbox=True)
+        sandbox = SessionSandbox(session_id, worker, tempfile.mkdtemp(prefix="live-code-studio-session-"))
+        self.sandboxes[session_id] = sandbox
+        self.counters["created"] += 1
+        if self.idle_seconds > 0 and (self._sweeper is None or self._sweeper.done()):
+            self._sweeper = asyncio.create_task(self._sweep())
+        return sandbox
+
+    async def discard(self, session_id: str, counter: str = "failed"):
+        """Stops the session's sandbox, e.g. after a run that timed out; the next run starts fresh."""
+        await self._remove(session_id, counter)
+
+    async def expire(self, now: Optional[float] = None):
+        if self.idle_seconds <= 0:
+            return
+        cutoff = (now or time.monotonic()) - self.idle_seconds
+        expired = [sandbox.session_id for sandbox in self.sandboxes.values() if sandbox.last_used < cutoff and not sandbox.lock.locked()]
+        for session_id in expired:
+            await self._remove(session_id, "expired")
+
+    async def _sweep(self):
+        # Stops sandboxes that went idle, while there are any
+        while self.sandboxes:
+            await asyncio.sleep(min(60.0, self.idle_seconds / 2))
+            await self.expire()
+
+    async def shutdown(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        for session_id in list(self.sandboxes):
+            await self._remove(session_id, "reset")
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "live": len(self.sandboxes),
+            "capacity": self.capacity,
+            "idle_seconds": self.idle_seconds,
+        }
+
+class OutputLimitExceeded(Exception):
+    """Raised when a run writes more than its output byte cap."""
+
+class OutputSink:
+    """Collects a run's stdout/stderr under a shared byte cap, forwarding chunks as they arrive."""
+
+    def __init__(self, limit: int, on_output: Optional[Callable[[str, bytes], None]] = None):
+        self.limit = limit
+        self.on_output = on_output
+        self.total = 0
+        self.truncated = False
+        self.buffers = {"stdout": bytearray(), "stderr": bytearray()}
 
-            file_path = temp_path / f"script.{file_extension}"
-            file_path.write_text(code)
+    def write(self, name: str, data: bytes):
+        if not data:
+            return
+        room = self.limit - self.total
+        if len(data) > room:
+            data = data[:room]
+            self.truncated = True
+        self.total += len(data)
+        self.buffers[name] += data
+        if data and self.on_output is not None:
+            self.on_output(name, bytes(data))
+        if self.truncated:
+            raise OutputLimitExceeded()
 
-            result = None
+    def text(self, name: str) -> str:
+        return self.buffers[name].decode(errors="replace")
+
+async def _read_stream(stream: asyncio.StreamReader, name: str, boundary: bytes, sink: OutputSink) -> Optional[bytes]:
+    """Forwards output to the sink until the job boundary or EOF.
+
+    Returns the boundary line's status fields, or None if the worker died without one.
+    """
+    pending = bytearray()
+    # Long enough to hold back any partial boundary line
+    keep = len(boundary) + 64
+    while True:
+        data = await stream.read(65536)
+        if not data:
+            sink.write(name, pending)
+            return None
+        pending += data
+        marker = pending.find(b"\n" + boundary + b":")
+        if marker == -1:
+            cut = max(0, len(pending) - keep)
+        elif pending.endswith(b"\n") and pending.count(b"\n", marker + 1) == 1:
+            sink.write(name, pending[:marker])
+            return bytes(pending[marker + len(boundary) + 2:-1])
+        else:
+            cut = marker
+        sink.write(name, pending[:cut])
+        del pending[:cut]
+
+class RunStatus:
+    __slots__ = ("exit_code", "peak_rss_kb", "cpu_time")
+
+    def __init__(self, exit_code: int, peak_rss_kb: Optional[int] = None, cpu_time: Optional[float] = None):
+        self.exit_code = exit_code
+        self.peak_rss_kb = peak_rss_kb
+        self.cpu_time = cpu_time
+
+async def _collect(worker: Worker, boundary: bytes, sink: OutputSink) -> RunStatus:
+    """Streams the job just sent to the worker into the sink and returns how it ended."""
+    status, _ = await asyncio.gather(
+        _read_stream(worker.process.stdout, "stdout", boundary, sink),
+        _read_stream(worker.process.stderr, "stderr", boundary, sink)
+    )
+    if status is None:
+        # Killed before it could report (e.g. by a signal); no usage figures
+        return RunStatus(await worker.process.wait())
+    exit_code, peak_rss_kb, cpu_ms = (int(field) for field in status.split(b":"))
+    return RunStatus(exit_code, peak_rss_kb, cpu_ms)
+
+class ExecutionEngine:
+    """Runs code on asyncio subprocesses with bounded concurrency and a bounded wait queue.
+
+    The engine owns a private event loop thread, so waiting runs hold neither a
+    request thread nor the server's event loop, whichever loop the caller is on.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = EXECUTOR_MAX_CONCURRENCY,
+        max_per_language: int = EXECUTOR_MAX_CONCURRENCY_PER_LANGUAGE,
+        max_queue: int = EXECUTOR_MAX_QUEUE,
+        profiles: Optional[Dict[str, ExecutionProfile]] = None,
+        cache_size: int = EXECUTION_CACHE_SIZE,
+        cache_ttl_seconds: float = EXECUTION_CACHE_TTL_SECONDS,
+        typescript_module: str = EXECUTOR_TYPESCRIPT_MODULE,
+        sandboxes: int = EXECUTOR_SESSION_SANDBOXES
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_per_language = max(1, min(max_per_language, self.max_concurrency))
+        self.max_queue = max(0, max_queue)
+        self.profiles = {**PROFILES, **(profiles or {})}
+        self.results = ResultCache(cache_size, cache_ttl_seconds) if cache_size > 0 else None
+        self.runtimes: Dict[str, str] = {}
+        self.typescript_module = typescript_module
+        self.transpiler = Transpiler(typescript_module)
+        self.pool = WorkerPool(profiles=self.profiles)
+        self.sandboxes = SandboxPool(self.pool, sandboxes)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.start_lock = threading.Lock()
+        self.global_slots: Optional[asyncio.Semaphore] = None
+        self.language_slots: Dict[str, asyncio.Semaphore] = {}
+        self.queued = 0
+        self.running: Dict[str, int] = {}
+        # Moving average of queue plus run time per language, uncached runs only
+        self.latency: Dict[str, float] = {}
+        self.counters = {"executions": 0, "queued_total": 0, "rejected": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0, "run_ms_total": 0.0}
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        with self.start_lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                self.thread = threading.Thread(target=loop.run_forever, name="execution-engine", daemon=True)
+                self.thread.start()
+                self.loop = loop
+                self.global_slots = asyncio.Semaphore(self.max_concurrency)
+                self.language_slots = {}
+                # The compiler process belongs to the loop that started it
+                self.transpiler = Transpiler(self.typescript_module)
+            return self.loop
+
+    def submit(self, coro) -> "asyncio.Future":
+        """Schedules a coroutine on the engine loop; await the result from any loop."""
+        return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.start()))
+
+    def call(self, coro):
+        """Blocking variant of submit() for sync callers."""
+        return asyncio.run_coroutine_threadsafe(coro, self.start()).result()
+
+    def _retry_after(self) -> int:
+        # Rough time for the queue ahead to drain, at least a second
+        executions = self.counters["executions"]
+        avg_run = (self.counters["run_ms_total"] / executions / 1000) if executions else 1.0
+        return max(1, math.ceil(avg_run * (self.queued + 1) / self.max_concurrency))
+
+    async def _acquire_slot(self, language: str) -> float:
+        language_slots = self.language_slots.setdefault(language, asyncio.Semaphore(self.max_per_language))
+        must_wait = language_slots.locked() or self.global_slots.locked()
+        if must_wait and self.queued >= self.max_queue:
+            self.counters["rejected"] += 1
+            raise QueueFull(self._retry_after())
+
+        start = time.monotonic()
+        if must_wait:
+            self.queued += 1
+            self.counters["queued_total"] += 1
+        try:
+            await language_slots.acquire()
+            try:
+                await self.global_slots.acquire()
+            except BaseException:
+                language_slots.release()
+                raise
+        finally:
+            if must_wait:
+                self.queued -= 1
+        wait_ms = (time.monotonic() - start) * 1000
+        self.counters["wait_ms_total"] += wait_ms
+        self.counters["wait_ms_max"] = max(self.counters["wait_ms_max"], wait_ms)
+        self.running[language] = self.running.get(language, 0) + 1
+        return wait_ms
+
+    def _release_slot(self, language: str):
+        self.running[language] -= 1
+        self.language_slots[language].release()
+        self.global_slots.release()
+
+    async def _runtime_version(self, language: str) -> str:
+        # Part of the result cache key, so upgrading a runtime never serves stale results
+        version = self.runtimes.get(language)
+        if version is None:
             if language == "python":
-                # Run python code
-                cmd = [sys.executable, str(file_path)]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-            elif language == "javascript":
-                # Run node.js
-                cmd = ["node", str(file_path)]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-            elif language == "typescript":
-                # Run ts-node
-                cmd = ["npx", "ts-node", str(file_path)]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+                version = sys.version
             else:
-                return ExecutionResult(
-                    success=False,
-                    output="",
-                    error=f"Language {language} is not supported for backend execution.",
-                    executionTime=0
-                )
-
-            execution_time = (time.time() - start_time) * 1000
-            return ExecutionResult(
-                success=result.returncode == 0,
-                output=result.stdout,
-                error=result.stderr if result.returncode != 0 else None,
-                executionTime=execution_time
-            )
+                try:
+                    process = await asyncio.create_subprocess_exec(
+                        "node", "--version", stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+                    )
+                    stdout, _ = await process.communicate()
+                    version = "node " + stdout.decode().strip()
+                except OSError:
+                    version = "unknown"
+                if language == "typescript":
+                    try:
+                        version += " typescript " + await self.transpiler.compiler_version()
+                    except TranspileError:
+                        version += " typescript unavailable"
+            self.runtimes[language] = version
+        return version
 
-        except subprocess.TimeoutExpired:
+    async def _run(
+        self,
+        code: str,
+        language: str,
+        on_output: Optional[Callable[[str, bytes], None]] = None,
+        on_start: Optional[Callable[[], None]] = None,
+        use_cache: bool = True,
+        session_id: Optional[str] = None
+    ) -> ExecutionResult:
+        if language not in TIMEOUTS:
             return ExecutionResult(
                 success=False,
                 output="",
-                error="Execution timed out (5s limit)",
-                executionTime=5000
-            )
-        except Exception as e:
-            return ExecutionResult(
-                success=False,
-                output="",
-                error=str(e),
-                executionTime=(time.time() - start_time) * 1000
+                error=f"Language {language} is not supported for backend execution.",
+                executionTime=0
             )
 
+        if session_id is not None and (not self.sandboxes.enabled or language not in SANDBOX_LANGUAGES):
+            session_id = None
+        key = None
+        # A session run depends on everything run before it, so it is never cached
+        if self.results is not None and use_cache and session_id is None:
+            key = result_key(language, await self._runtime_version(language), code)
+            cached = self.results.get(key)
+            if cached is not None:
+                if on_start is not None:
+                    on_start()
+                if on_output is not None:
+                    on_output("stdout", cached.output.encode())
+                    if cached.error:
+                        on_output("stderr", cached.error.encode())
+                hit = cached.model_copy(update={"cached": True, "queueTime": 0})
+                record_execution(language, hit)
+                return hit
+
+        started = time.perf_counter()
+        result = await self._execute(code, language, on_output, on_start, session_id)
+        record_execution(language, result, time.perf_counter() - started)
+        if key is not None:
+            self.results.put(key, result)
+        return result
+
+    async def _execute(
+        self,
+        code: str,
+        language: str,
+        on_output: Optional[Callable[[str, bytes], None]],
+        on_start: Optional[Callable[[], None]],
+        session_id: Optional[str] = None
+    ) -> ExecutionResult:
+        start_time = time.time()
+        sandbox = await self.sandboxes.acquire(session_id, language) if session_id is not None else None
+        try:
+            await self._acquire_slot(language)
+        except BaseException:
+            if sandbox is not None:
+                await self.sandboxes.release(sandbox, healthy=True)
+            raise
+        if on_start is not None:
+            on_start()
+        try:
+            # A unique temporary directory for this execution, or the sandbox's own
+            with nullcontext(sandbox.directory) if sandbox is not None else tempfile.TemporaryDirectory() as temp_dir:
+                worker = None
+                healthy = False
+                queue_time = 0.0
+                run_start = time.time()
+                profile = self.profiles[language]
+                sink = OutputSink(profile.output_bytes, on_output)
+                try:
+                    if language == "typescript":
+                        code = await self.transpiler.transpile(code)
+                    if sandbox is not None:
+                        worker = sandbox.worker
+                        sandbox.runs += 1
+                    else:
+                        worker = await self.pool.acquire(WORKER_LANGUAGE.get(language, language))
+                    source = code.encode()
+                    boundary = uuid.uuid4().hex.encode()
+                    job = {
+                        "dir": temp_dir,
+                        "size": len(source),
+                        "ext": "py" if language == "python" else "js",
+                        "boundary": boundary.decode(),
+                        "limits": profile.rlimits(),
+                    }
+                    queue_time = (time.time() - start_time) * 1000
+
+                    run_start = time.time()
+                    worker.process.stdin.write(json.dumps(job).encode() + b"\n" + source)
+                    await worker.process.stdin.drain()
+                    if not worker.reusable:
+                        worker.process.stdin.close()
+                    run = await asyncio.wait_for(_collect(worker, boundary, sink), TIMEOUTS[language])
+                    healthy = True
+
+                    stderr = sink.text("stderr")
+                    return ExecutionResult(
+                        success=run.exit_code == 0,
+                        output=sink.text("stdout"),
+                        error=stderr if run.exit_code != 0 else None,
+                        executionTime=(time.time() - run_start) * 1000,
+                        queueTime=queue_time,
+                        exitCode=run.exit_code,
+                        violation=classify_violation(run.exit_code, stderr, run.cpu_time, profile),
+                        peakRssKb=run.peak_rss_kb,
+                        cpuTime=run.cpu_time,
+                        sandboxRun=sandbox.runs if sandbox is not None else None
+                    )
+
+                except asyncio.TimeoutError:
+                    limit = TIMEOUTS[language]
+                    return ExecutionResult(
+                        success=False,
+                        output=sink.text("stdout"),
+                        error=f"Execution timed out ({limit}s limit)",
+                        executionTime=limit * 1000,
+                        queueTime=queue_time,
+                        violation="timeout"
+                    )
+                except OutputLimitExceeded:
+                    return ExecutionResult(
+                        success=False,
+                        output=sink.text("stdout"),
+                        error=f"Output limit exceeded ({profile.output_bytes} bytes)",
+                        executionTime=(time.time() - run_start) * 1000,
+                        queueTime=queue_time,
+                        truncated=True,
+                        violation="output-exceeded"
+                    )
+                except Exception as e:
+                    return ExecutionResult(
+                        success=False,
+                        output=sink.text("stdout"),
+                        error=str(e),
+                        executionTime=(time.time() - run_start) * 1000,
+                        queueTime=queue_time
+                    )
+                finally:
+                    if sandbox is not None:
+                        await self.sandboxes.release(sandbox, healthy)
+                    elif worker is not None:
+                        await self.pool.release(worker, healthy)
+                    self.counters["executions"] += 1
+                    self.counters["run_ms_total"] += (time.time() - run_start) * 1000
+                    self._observe(language, (time.time() - start_time) * 1000)
+        finally:
+            self._release_slot(language)
+
+    def _observe(self, language: str, elapsed_ms: float):
+        previous = self.latency.get(language)
+        self.latency[language] = elapsed_ms if previous is None else previous + EXECUTOR_LATENCY_SMOOTHING * (elapsed_ms - previous)
+
+    async def execute(self, code: str, language: str, use_cache: bool = True, session_id: Optional[str] = None) -> ExecutionResult:
+        """Runs code from any event loop. Raises QueueFull when the wait queue is full.
+
+        With `session_id`, Python runs in that session's sandbox and sees the state
+        its earlier runs left behind.
+        """
+        return await self.submit(self._run(code, language, use_cache=use_cache, session_id=session_id))
+
+    async def stream(self, code: str, language: str, use_cache: bool = True, session_id: Optional[str] = None) -> AsyncIterator[Tuple[str, Union[str, ExecutionResult]]]:
+        """Runs code from any event loop as an async iterator of events.
+
+        Yields ("start", "") once the run is admitted, ("stdout"|"stderr", text) chunks as
+        they are produced and finally ("exit", result). Raises QueueFull instead of "start".
+        """
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        decoders = {name: codecs.getincrementaldecoder("utf-8")(errors="replace") for name in ("stdout", "stderr")}
+
+        def on_output(name: str, data: bytes):
+            # Called on the engine loop; hand the chunk over to the caller's loop
+            loop.call_soon_threadsafe(chunks.put_nowait, (name, data))
+
+        def on_start():
+            loop.call_soon_threadsafe(chunks.put_nowait, ("start", b""))
+
+        future = self.submit(self._run(code, language, on_output, on_start, use_cache, session_id))
+        # Chunks are queued before the result, so the sentinel always arrives last
+        future.add_done_callback(lambda _: chunks.put_nowait(None))
+        try:
+            while True:
+                item = await chunks.get()
+                if item is None:
+                    break
+                name, data = item
+                if name == "start":
+                    yield name, ""
+                    continue
+                text = decoders[name].decode(data)
+                if text:
+                    yield name, text
+            for name, decoder in decoders.items():
+                text = decoder.decode(b"", final=True)
+                if text:
+                    yield name, text
+            yield "exit", await future
+        finally:
+            # Client went away: stop the run and free its worker
+            if not future.done():
+                future.cancel()
+
+    async def _stats(self) -> dict:
+        executions = self.counters["executions"]
+        return {
+            **self.counters,
+            "wait_ms_avg": self.counters["wait_ms_total"] / executions if executions else 0.0,
+            "queue_depth": self.queued,
+            "max_queue": self.max_queue,
+            "running": dict(self.running),
+            "max_concurrency": self.max_concurrency,
+            "max_concurrency_per_language": self.max_per_language,
+            "pool": self.pool.stats(),
+            "sandboxes": self.sandboxes.stats(),
+            "result_cache": self.results.stats() if self.results is not None else None,
+            "transpiler": self.transpiler.stats(),
+        }
+
+    async def stats(self) -> dict:
+        return await self.submit(self._stats())
+
+    async def _capabilities(self) -> ExecutionCapabilities:
+        # Once every slot is taken, a new run also waits for the queue ahead of it to drain
+        busy = sum(self.running.values()) >= self.max_concurrency
+        wait_ms = self._retry_after() * 1000 if busy else 0
+        has_node = shutil.which("node") is not None
+        languages = []
+        for language in TIMEOUTS:
+            worker_language = WORKER_LANGUAGE.get(language, language)
+            latency = self.latency.get(language)
+            languages.append(LanguageCapability(
+                language=language,
+                available=language == "python" or has_node,
+                warmWorkers=sum(1 for worker in self.pool.idle.get(worker_language, ()) if worker.alive()),
+                estimatedMs=latency + wait_ms if latency is not None else None,
+            ))
+        return ExecutionCapabilities(
+            languages=languages,
+            queueDepth=self.queued,
+            resultCache=self.results is not None,
+            resultCacheTtlSeconds=self.results.ttl_seconds if self.results is not None else None,
+        )
+
+    async def capabilities(self) -> ExecutionCapabilities:
+        """What this server can run and roughly what a run costs right now, for clients
+        that can also run code themselves and pick the cheaper side."""
+        return await self.submit(self._capabilities())
+
+    async def _prewarm(self, languages):
+        await self.pool.prewarm(languages)
+        if "typescript" in languages:
+            try:
+                await self.transpiler.start()
+            except TranspileError as e:
+                logger.warning("TypeScript prewarm failed", extra={"fields": {"error": str(e)}})
+
+    def prewarm(self, languages=EXECUTOR_PREWARM):
+        self.call(self._prewarm(languages))
+
+    async def typecheck(self, code: str) -> List[str]:
+        """Type-checks TypeScript from any event loop; returns the diagnostics (empty when clean)."""
+        return await self.submit(self.transpiler.check(code))
+
+    async def reset_sandbox(self, session_id: str) -> bool:
+        """Stops the session's sandbox, so its next run starts from an empty namespace."""
+        async def reset():
+            live = session_id in self.sandboxes.sandboxes
+            await self.sandboxes.discard(session_id, "reset")
+            return live
+        return await self.submit(reset())
+
+    def shutdown(self):
+        """Stops idle workers, session sandboxes and the compiler; the engine restarts them on demand."""
+        if self.loop is not None:
+            self.call(self.sandboxes.shutdown())
+            self.call(self.pool.shutdown())
+            self.call(self.transpiler.close())
+
+    def close(self):
+        self.shutdown()
+        shutil.rmtree(self.pool.workdir, ignore_errors=True)
+        with self.start_lock:
+            if self.loop is not None:
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self.thread.join()
+                self.loop = None
+
+# Singleton instance
+engine = ExecutionEngine()
+atexit.register(engine.close)
+
+async def execute_code_async(code: str, language: str, use_cache: bool = True, session_id: Optional[str] = None) -> ExecutionResult:
+    return await engine.execute(code, language, use_cache, session_id)
+
+def execute_code(code: str, language: str, use_cache: bool = True) -> ExecutionResult:
+    return engine.call(engine._run(code, language, use_cache=use_cache))
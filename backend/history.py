@@ -0,0 +1,202 @@
+import json
+import os
+import threading
+import time
+import zlib
+from typing import AsyncIterator, List, Optional, Tuple
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import aliased
+from .database import AsyncSessionLocal, DBRevision, SessionLocal
+from .models import HistorySummary, SessionRevision, TextEdit
+from .patches import apply_edits, diff_edit
+
+# Keep a versioned log of every session for playback
+SESSION_HISTORY = os.getenv("SESSION_HISTORY", "1") == "1"
+# Every Nth version is stored in full, so rebuilding any version applies fewer than N deltas
+HISTORY_SNAPSHOT_INTERVAL = int(os.getenv("HISTORY_SNAPSHOT_INTERVAL", "50"))
+# Retention; 0 keeps everything. Pruning always keeps the snapshot the oldest kept version needs.
+HISTORY_MAX_VERSIONS = int(os.getenv("HISTORY_MAX_VERSIONS", "0"))
+HISTORY_RETENTION_DAYS = float(os.getenv("HISTORY_RETENTION_DAYS", "0"))
+HISTORY_PRUNE_SECONDS = float(os.getenv("HISTORY_PRUNE_SECONDS", "3600"))
+# Revisions read per query while streaming a replay
+REPLAY_PAGE_SIZE = 500
+
+# session_id, version, language, previous code (None for the first version), code, time
+Pending = Tuple[str, int, str, Optional[str], str, float]
+
+class HistoryUnavailable(Exception):
+    """Raised for versions that were never logged or have been pruned."""
+
+def encode_revision(entry: Pending, snapshot_interval: int = HISTORY_SNAPSHOT_INTERVAL) -> dict:
+    session_id, version, language, previous, code, created_at = entry
+    kind, payload = "snapshot", code
+    if previous is not None and version % snapshot_interval:
+        edit = diff_edit(previous, code)
+        delta = json.dumps([edit.model_dump()] if edit else [], separators=(",", ":"))
+        # Short documents and large pastes are no bigger stored in full
+        if len(delta) < len(code):
+            kind, payload = "delta", delta
+    return {
+        "session_id": session_id,
+        "version": version,
+        "kind": kind,
+        "language": language,
+        "data": zlib.compress(payload.encode("utf-8")),
+        "created_at": created_at,
+    }
+
+def apply_revision(row: DBRevision, code: str) -> str:
+    payload = zlib.decompress(row.data).decode("utf-8")
+    if row.kind == "snapshot":
+        return payload
+    return apply_edits(code, [TextEdit(**edit) for edit in json.loads(payload)])
+
+def replay_step(row: DBRevision) -> dict:
+    """A replay line: the edits from the previous version, or the full code at a snapshot."""
+    payload = zlib.decompress(row.data).decode("utf-8")
+    step = {"version": row.version, "language": row.language, "createdAt": row.created_at}
+    if row.kind == "snapshot":
+        step["code"] = payload
+    else:
+        step["edits"] = json.loads(payload)
+    return step
+
+class RevisionLog:
+    """Versions recorded by the session cache, waiting to be written with its next flush."""
+
+    def __init__(self, snapshot_interval: int = HISTORY_SNAPSHOT_INTERVAL):
+        self.snapshot_interval = max(1, snapshot_interval)
+        self.pending: List[Pending] = []
+        self.lock = threading.Lock()
+        self.pruned_at = time.monotonic()
+
+    def record(self, session_id: str, version: int, language: str, previous: Optional[str], code: str):
+        with self.lock:
+            self.pending.append((session_id, version, language, previous, code, time.time()))
+
+    def take(self) -> List[Pending]:
+        with self.lock:
+            batch, self.pending = self.pending, []
+            return batch
+
+    def restore(self, batch: List[Pending]):
+        """Puts back a batch whose write failed, ahead of anything recorded since."""
+        with self.lock:
+            self.pending = batch + self.pending
+
+    def rows(self, batch: List[Pending]) -> List[dict]:
+        return [encode_revision(entry, self.snapshot_interval) for entry in batch]
+
+    def maybe_prune(self):
+        """Applies the retention policy, at most once per HISTORY_PRUNE_SECONDS."""
+        if not (HISTORY_MAX_VERSIONS or HISTORY_RETENTION_DAYS):
+            return
+        if time.monotonic() - self.pruned_at < HISTORY_PRUNE_SECONDS:
+            return
+        self.pruned_at = time.monotonic()
+        prune()
+
+def prune(max_versions: int = HISTORY_MAX_VERSIONS, retention_days: float = HISTORY_RETENTION_DAYS, now: Optional[float] = None) -> int:
+    """Deletes revisions outside the retention policy and returns how many.
+
+    Everything before the newest snapshot that falls outside the policy goes, so
+    every version still inside it can be rebuilt.
+    """
+    snapshot = aliased(DBRevision)
+    latest = aliased(DBRevision)
+    limits = []
+    if retention_days:
+        cutoff = (now or time.time()) - retention_days * 86400
+        limits.append(snapshot.created_at < cutoff)
+    if max_versions:
+        newest = select(func.max(latest.version)).where(latest.session_id == snapshot.session_id).scalar_subquery()
+        limits.append(snapshot.version <= newest - max_versions)
+    deleted = 0
+    session = SessionLocal()
+    try:
+        for limit in limits:
+            base = select(func.max(snapshot.version)).where(
+                snapshot.session_id == DBRevision.session_id, snapshot.kind == "snapshot", limit
+            ).scalar_subquery()
+            deleted += session.execute(delete(DBRevision).where(DBRevision.version < base)).rowcount
+        session.commit()
+    finally:
+        session.close()
+    return deleted
+
+async def state_at(session_id: str, version: int) -> SessionRevision:
+    """Rebuilds a version from its nearest snapshot. Raises HistoryUnavailable."""
+    async with AsyncSessionLocal() as session:
+        base = await session.scalar(
+            select(DBRevision)
+            .where(DBRevision.session_id == session_id, DBRevision.kind == "snapshot", DBRevision.version <= version)
+            .order_by(DBRevision.version.desc())
+            .limit(1)
+        )
+        if base is None:
+            raise HistoryUnavailable(f"Version {version} is not in the history")
+        rows = (await session.scalars(
+            select(DBRevision)
+            .where(DBRevision.session_id == session_id, DBRevision.version > base.version, DBRevision.version <= version)
+            .order_by(DBRevision.version)
+        )).all()
+
+    code, last = apply_revision(base, ""), base
+    for row in rows:
+        if row.version != last.version + 1:
+            break
+        code, last = apply_revision(row, code), row
+    if last.version != version:
+        raise HistoryUnavailable(f"Version {version} is not in the history")
+    return SessionRevision(version=version, code=code, language=last.language, createdAt=last.created_at)
+
+async def replay(session_id: str, start: int, end: int) -> AsyncIterator[dict]:
+    """The full state at `start`, then one step per version up to `end`.
+
+    Raises HistoryUnavailable before the first step if `start` cannot be rebuilt;
+    stops with an {"error": ...} step if a later version is missing.
+    """
+    first = await state_at(session_id, start)
+    yield first.model_dump()
+    cursor = start
+    while cursor < end:
+        async with AsyncSessionLocal() as session:
+            rows = (await session.scalars(
+                select(DBRevision)
+                .where(DBRevision.session_id == session_id, DBRevision.version > cursor, DBRevision.version <= end)
+                .order_by(DBRevision.version)
+                .limit(REPLAY_PAGE_SIZE)
+            )).all()
+        for row in rows:
+            if row.version != cursor + 1:
+                break
+            yield replay_step(row)
+            cursor = row.version
+        if cursor < end and (not rows or rows[-1].version != cursor):
+            yield {"error": f"Version {cursor + 1} is not in the history"}
+            return
+
+async def summary(session_id: str) -> Optional[HistorySummary]:
+    async with AsyncSessionLocal() as session:
+        row = (await session.execute(
+            select(
+                func.min(DBRevision.version),
+                func.max(DBRevision.version),
+                func.count(),
+                func.count().filter(DBRevision.kind == "snapshot"),
+                func.sum(func.length(DBRevision.data)),
+                func.min(DBRevision.created_at),
+                func.max(DBRevision.created_at),
+            ).where(DBRevision.session_id == session_id)
+        )).one()
+    if not row[2]:
+        return None
+    return HistorySummary(
+        firstVersion=row[0],
+        lastVersion=row[1],
+        revisions=row[2],
+        snapshots=row[3],
+        storedBytes=row[4] or 0,
+        firstAt=row[5],
+        lastAt=row[6],
+    )
@@ -1,119 +1,100 @@
+import asyncio
 import os
-from typing import Optional, List, Dict, Any
-from fastapi import FastAPI, HTTPException, status, Depends
+import json
+import logging
+from typing import Optional, List, Dict, Any, Awaitable, Callable
+from fastapi import FastAPI, HTTPException, status, Depends, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from .executor import execute_code
-from .database import db, SessionLocal, DBUser
-from .models import SessionState, ExecutionRequest, ExecutionResult, UserCreate, UserLogin, UserOut, Token
-from datetime import datetime, timedelta
-from jose import JWTError, jwt
-import bcrypt
-from fastapi.security import OAuth2PasswordBearer
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+from .executor import engine, execute_code_async, QueueFull
+from .transpiler import TranspileError
+from .batch import execute_batch
+from .realtime import manager
+from .patches import PatchConflict
+from .database import db, check_database, init_database, async_engine, engine as database_engine
+from .cache import session_cache
+from .history import HistoryUnavailable, replay, state_at, summary
+from .models import SessionState, SessionUpdate, SessionPatch, SessionRevision, HistorySummary, ExecutionRequest, ExecutionResult, ExecutionCapabilities, BatchRequest, BatchResult, TypeCheckRequest, TypeCheckResult, UserCreate, UserLogin, UserOut, Token
+from .auth import create_user, create_user_token, find_user, get_current_user, update_password_hash, token_cache, user_cache
+from .passwords import password_hasher
+from .static import STATIC_DIR, Frontend
+from .ratelimit import session_creation_limiter
+from .reaper import SessionReaper, table_stats
+from .observability import METRICS_ENABLED, RequestMetricsMiddleware, configure_logging, registry
+from contextlib import asynccontextmanager
 from sqlalchemy.orm import Session
-from fastapi import Depends
-
-# Auth configuration
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-for-dev-only")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 # 1 day
-
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
-
-def verify_password(plain_password, hashed_password):
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
-
-def get_password_hash(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub") # type: ignore
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    session = SessionLocal()
-    try:
-        user = session.query(DBUser).filter(DBUser.email == email).first()
-        if user is None:
-            raise credentials_exception
-        return user
-    finally:
-        session.close()
 
-app = FastAPI(title="Live Code Studio API", version="1.0.0")
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Sessions in use here or with edits not yet written are never reaped
+reaper = SessionReaper(
+    cache=session_cache,
+    is_active=lambda session_id: manager.presence(session_id) > 0 or session_cache.has_unsaved(session_id),
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fail fast on a bad database and record what settings are actually in effect
+    await run_in_threadpool(init_database)
+    settings = await run_in_threadpool(check_database)
+    logger.info("Database ready", extra={"fields": settings})
+    # Start interpreters before the first run needs them, without holding up startup
+    prewarm = asyncio.create_task(run_in_threadpool(engine.prewarm))
+    # Join the other server processes for session pushes and presence
+    await manager.start()
+    reaper.start()
+    yield
+    await run_in_threadpool(reaper.close)
+    await manager.close()
+    await prewarm
+    await run_in_threadpool(engine.shutdown)
+    # Write out session edits still held in memory
+    await run_in_threadpool(session_cache.close)
+    await run_in_threadpool(password_hasher.close)
+    await async_engine.dispose()
+
+app = FastAPI(title="Live Code Studio API", version="1.0.0", lifespan=lifespan)
+
+# Sessions changed by another server process replace this process's cached copy
+manager.on_remote_state = session_cache.adopt
 
 # Auth Endpoints
 @app.post("/auth/signup", response_model=UserOut)
-def signup(user_in: UserCreate):
-    session = SessionLocal()
-    try:
-        # Check if user exists
-        existing_user = session.query(DBUser).filter(DBUser.email == user_in.email).first()
-        if existing_user:
-            raise HTTPException(status_code=400, detail="Email already registered")
-        
-        # Create new user
-        db_user = DBUser(
-            email=user_in.email,
-            full_name=user_in.full_name,
-            hashed_password=get_password_hash(user_in.password)
-        )
-        session.add(db_user)
-        session.commit()
-        session.refresh(db_user)
-        return db_user
-    finally:
-        session.close()
+async def signup(user_in: UserCreate):
+    # Check first so duplicate signups cost no hashing
+    if await find_user(user_in.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+    hashed_password = await password_hasher.hash(user_in.password)
+    return await create_user(user_in, hashed_password)
 
 @app.post("/auth/login", response_model=Token)
-def login(user_in: UserLogin):
-    session = SessionLocal()
-    try:
-        user = session.query(DBUser).filter(DBUser.email == user_in.email).first()
-        if not user or not verify_password(user_in.password, user.hashed_password):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect email or password",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user.email}, expires_delta=access_token_expires
+async def login(user_in: UserLogin):
+    user = await find_user(user_in.email)
+    authenticated = user is not None and await password_hasher.verify(user_in.password, user.hashed_password)
+    password_hasher.record_login(authenticated)
+    if not authenticated:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+            headers={"WWW-Authenticate": "Bearer"},
         )
-        return {"access_token": access_token, "token_type": "bearer"}
-    finally:
-        session.close()
+
+    # Move the stored hash to the configured cost while we have the plain password
+    if password_hasher.needs_rehash(user.hashed_password):
+        hashed_password = await password_hasher.hash(user_in.password)
+        await update_password_hash(user.id, hashed_password)
+        password_hasher.counters["rehashes"] += 1
+
+    access_token = create_user_token(user)
+    return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/auth/me", response_model=UserOut)
-def read_users_me(current_user: DBUser = Depends(get_current_user)):
+async def read_users_me(current_user: UserOut = Depends(get_current_user)):
     return current_user
 
-@app.middleware("http")
-async def log_requests(request, call_next):
-    print(f"Incoming request: {request.method} {request.url}")
-    response = await call_next(request)
-    print(f"Response status: {response.status_code}")
-    return response
-
 # Setup CORS
 app.add_middleware(
     CORSMiddleware,
@@ -122,6 +103,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so requests answered by the CORS middleware are counted too
+app.add_middleware(RequestMetricsMiddleware)
 
 # Default code templates
 DEFAULT_CODE = {
@@ -129,62 +112,307 @@ DEFAULT_CODE = {
   'python': "# Welcome to your coding interview!\n# Write your solution below\n\ndef solution(input):\n    # Your code here\n    return input\n\n# Test your solution\nprint(solution(\"Hello, World!\"))\n",
 }
 
-@app.get("/sessions/{session_id}", response_model=SessionState)
-def get_session(session_id: str):
-    session = db.get_session(session_id)
+def limit_creation(client: Optional[str]):
+    """Charges a session creation to the client, so random ids cannot grow the table unbounded."""
+    retry_after = session_creation_limiter.acquire(client or "unknown")
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many new sessions, try again later",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+
+async def load_session(session_id: str, client: Optional[str] = None) -> SessionState:
+    session = await session_cache.get_session_async(session_id)
     if not session:
+        limit_creation(client)
         # Auto-create for demo purposes, matching frontend expectation
-        session = db.create_session(
+        session = await session_cache.create_session_async(
             session_id, 
             default_code=DEFAULT_CODE.get('javascript', ''),
             language='javascript'
         )
-    return session
+    return manager.with_presence(session_id, session)
 
-@app.post("/sessions/{session_id}", response_model=SessionState)
-def update_session(session_id: str, update: dict):
+async def apply_update(session_id: str, update: SessionUpdate, client: Optional[str] = None) -> SessionState:
     # Try to update existing session
-    session = db.update_session(
+    session = await session_cache.update_session_async(
         session_id, 
-        code=update.get('code'), 
-        language=update.get('language')
+        code=update.code, 
+        language=update.language
     )
     
     # If not found, create it (upsert behavior)
     if not session:
+        limit_creation(client)
         # Determine language to set default code/language
-        lang = update.get('language', 'javascript')
-        code = update.get('code', DEFAULT_CODE.get(lang, ''))
-        session = db.create_session(session_id, default_code=code, language=lang)
-        
+        lang = update.language or 'javascript'
+        code = update.code if update.code is not None else DEFAULT_CODE.get(lang, '')
+        session = await session_cache.create_session_async(session_id, default_code=code, language=lang)
+        # Someone else created it first; apply this update on top of theirs
+        if session.code != code or session.language != lang:
+            session = await session_cache.update_session_async(session_id, code=update.code, language=update.language)
+
+    return manager.with_presence(session_id, session)
+
+async def apply_patch(session_id: str, patch: SessionPatch, client: Optional[str] = None) -> SessionState:
+    # Patches never create sessions, so `client` is not charged
+    try:
+        session = await session_cache.apply_patch_async(session_id, patch.baseVersion, patch.edits)
+    except PatchConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": str(e), "version": e.current_version}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return manager.with_presence(session_id, session)
+
+async def apply_and_publish(session_id: str, apply: Callable[..., Awaitable[SessionState]], change, exclude: Optional[WebSocket] = None, client: Optional[str] = None) -> SessionState:
+    # Serialize per session so pushes go out in the same order as the writes
+    async with manager.lock(session_id):
+        session = await apply(session_id, change, client)
+        manager.publish(session_id, session, exclude=exclude)
     return session
 
+def client_address(connection) -> Optional[str]:
+    # Behind a proxy this is the proxy, unless uvicorn runs with --forwarded-allow-ips
+    return connection.client.host if connection.client else None
+
+@app.get("/sessions/{session_id}", response_model=SessionState)
+async def get_session(session_id: str, request: Request):
+    return await load_session(session_id, client_address(request))
+
+@app.post("/sessions/{session_id}", response_model=SessionState)
+async def update_session(session_id: str, update: SessionUpdate, request: Request):
+    return await apply_and_publish(session_id, apply_update, update, client=client_address(request))
+
+@app.patch("/sessions/{session_id}", response_model=SessionState)
+async def patch_session(session_id: str, patch: SessionPatch):
+    return await apply_and_publish(session_id, apply_patch, patch)
+
+@app.get("/sessions/{session_id}/history", response_model=HistorySummary)
+async def session_history(session_id: str):
+    # Edits still held in memory are logged with the next flush
+    await session_cache.flush_async()
+    history = await summary(session_id)
+    if history is None:
+        raise HTTPException(status_code=404, detail="No history for this session")
+    return history
+
+@app.get("/sessions/{session_id}/history/{version}", response_model=SessionRevision)
+async def session_version(session_id: str, version: int):
+    await session_cache.flush_async()
+    try:
+        return await state_at(session_id, version)
+    except HistoryUnavailable as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.get("/sessions/{session_id}/replay")
+async def session_replay(session_id: str, start: int = Query(0, alias="from", ge=0), end: Optional[int] = Query(None, alias="to", ge=0)):
+    """Streams newline-delimited JSON: the full state at `from`, then one line per
+    version up to `to` (default: latest) with its `edits`, or its `code` where the
+    log holds a snapshot."""
+    await session_cache.flush_async()
+    if end is None:
+        history = await summary(session_id)
+        end = history.lastVersion if history else start
+    if end < start:
+        raise HTTPException(status_code=422, detail="`to` must not be before `from`")
+    steps = replay(session_id, start, end)
+    try:
+        # Resolve the starting state first, so a missing version is still a plain 404
+        first = await steps.__anext__()
+    except HistoryUnavailable as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    async def body():
+        try:
+            yield json.dumps(first) + "\n"
+            async for step in steps:
+                yield json.dumps(step) + "\n"
+        finally:
+            await steps.aclose()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+def parse_socket_message(message: str):
+    data = json.loads(message)
+    if not isinstance(data, dict):
+        raise ValueError("Session updates must be JSON objects")
+    if "edits" in data:
+        return apply_patch, SessionPatch.model_validate(data)
+    return apply_update, SessionUpdate.model_validate(data)
+
+@app.websocket("/sessions/{session_id}/ws")
+async def session_socket(websocket: WebSocket, session_id: str):
+    await manager.connect(session_id, websocket)
+    client = client_address(websocket)
+    try:
+        try:
+            session = await load_session(session_id, client)
+        except HTTPException as e:
+            await websocket.send_json({"error": "Session unavailable", "status": e.status_code, "detail": e.detail})
+            await websocket.close(code=1013)
+            return
+        await websocket.send_json(session.model_dump())
+        # Existing subscribers only need the new presence count
+        manager.publish(session_id, session, exclude=websocket)
+
+        while True:
+            message = await websocket.receive_text()
+            # Reject bad frames with an error frame, keep the connection
+            try:
+                apply, change = parse_socket_message(message)
+            except ValidationError as e:
+                await websocket.send_json({"error": "Invalid session update", "detail": e.errors(include_url=False, include_context=False)})
+                continue
+            except ValueError as e:
+                await websocket.send_json({"error": "Invalid session update", "detail": str(e)})
+                continue
+
+            try:
+                session = await apply_and_publish(session_id, apply, change, exclude=websocket, client=client)
+            except HTTPException as e:
+                await websocket.send_json({"error": "Session update rejected", "status": e.status_code, "detail": e.detail})
+                if e.status_code == status.HTTP_409_CONFLICT:
+                    session = await load_session(session_id, client)
+                    await websocket.send_json(session.model_dump())
+                continue
+
+            # The sender already has its own edit; it only needs the new version,
+            # plus the merged code if the patch was rebased over someone else's changes
+            ack = {"ack": True, "version": session.version}
+            if isinstance(change, SessionPatch) and session.version != change.baseVersion + 1:
+                ack["code"] = session.code
+            await websocket.send_json(ack)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Runs even when the handler is cancelled, so it must not await
+        if manager.disconnect(session_id, websocket):
+            manager.publish_presence(session_id)
+
+def queue_full(e: QueueFull) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Execution queue is full, try again later",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
 @app.post("/execute", response_model=ExecutionResult)
-def execute_endpoint(request: ExecutionRequest):
-    return execute_code(request.code, request.language)
+async def execute_endpoint(request: ExecutionRequest):
+    try:
+        return await execute_code_async(request.code, request.language, not request.bypassCache, request.sessionId)
+    except QueueFull as e:
+        raise queue_full(e)
+
+@app.get("/execute/capabilities", response_model=ExecutionCapabilities)
+async def execute_capabilities():
+    """Per-language availability and cost hints; the frontend uses them to decide whether
+    a run is cheaper here or in the browser."""
+    return await engine.capabilities()
+
+@app.delete("/execute/sessions/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def reset_execution_session(session_id: str):
+    """Stops the session's sandbox; its next run starts with empty state."""
+    if not await engine.reset_sandbox(session_id):
+        raise HTTPException(status_code=404, detail="No sandbox for this session")
+
+@app.post("/execute/batch", response_model=BatchResult)
+async def execute_batch_endpoint(request: BatchRequest):
+    """Runs `functionName` from the code against every test case in one process."""
+    try:
+        return await execute_batch(request, not request.bypassCache)
+    except QueueFull as e:
+        raise queue_full(e)
+
+def format_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/execute/stream")
+async def execute_stream_endpoint(request: ExecutionRequest):
+    """Runs code and streams its output as Server-Sent Events.
+
+    Emits `stdout`/`stderr` events with {"data": text} as output arrives, then one
+    `exit` event with the result (minus the output already streamed).
+    """
+    events = engine.stream(request.code, request.language, not request.bypassCache, request.sessionId)
+    try:
+        # Wait for admission so a full queue is still a plain 429
+        first = await events.__anext__()
+    except QueueFull as e:
+        raise queue_full(e)
+
+    async def body():
+        try:
+            event, data = first
+            while True:
+                if event == "exit":
+                    yield format_event("exit", data.model_dump(exclude={"output"}))
+                    return
+                if event != "start":
+                    yield format_event(event, {"data": data})
+                event, data = await events.__anext__()
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.post("/execute/typecheck", response_model=TypeCheckResult)
+async def typecheck_endpoint(request: TypeCheckRequest):
+    """Type-checks TypeScript without running it; runs themselves skip type-checking."""
+    try:
+        diagnostics = await engine.typecheck(request.code)
+    except TranspileError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    return TypeCheckResult(success=not diagnostics, diagnostics=diagnostics)
+
+@app.get("/stats/executor")
+async def executor_stats():
+    return await engine.stats()
+
+@app.get("/stats/session-cache")
+async def session_cache_stats():
+    return session_cache.stats()
+
+@app.get("/stats/realtime")
+async def realtime_stats():
+    return manager.stats()
+
+@app.get("/stats/database")
+def database_stats():
+    return {
+        **check_database(),
+        "pool_status": database_engine.pool.status(),
+        "async_pool_status": async_engine.pool.status(),
+    }
+
+@app.get("/stats/sessions")
+def session_stats():
+    """Session table sizes, reaper throughput and the creation rate limit."""
+    return {"tables": table_stats(), "reaper": reaper.stats(), "creation_limit": session_creation_limiter.stats()}
+
+@app.get("/stats/auth")
+async def auth_stats():
+    return {"tokens": token_cache.stats(), "users": user_cache.stats(), "passwords": password_hasher.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Request, execution, sandbox and database metrics in the Prometheus text format."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(registry.expose(), media_type="text/plain; version=0.0.4")
 
 @app.get("/health")
-def health_check():
+async def health_check():
     return {"status": "ok", "message": "Live Code Studio Backend Running"}
 
-# Serve React App (Static Files)
-import os
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-
-# Check if running in Docker where /app/static exists
-if os.path.exists("/app/static"):
-    app.mount("/assets", StaticFiles(directory="/app/static/assets"), name="assets")
-    
-    # Catch-all for SPA client-side routing
-    @app.get("/{full_path:path}")
-    async def serve_spa(full_path: str = ""):
-        # Allow API calls to pass through
-        if full_path.startswith("api/") or full_path.startswith("sessions/") or full_path == "execute" or full_path == "health":
-            return {"error": "Not Found"}
-            
-        # Serve index.html for root and any other SPA route
-        return FileResponse("/app/static/index.html")
+# Serve the built React app when it is present (the Docker image)
+if os.path.exists(os.path.join(STATIC_DIR, "index.html")):
+    Frontend(STATIC_DIR).mount(app)
 else:
     # Local development feedback
     @app.get("/")
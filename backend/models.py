@@ -1,24 +1,138 @@
-from pydantic import BaseModel
-from typing import Optional, Literal
+from pydantic import BaseModel, Field
+from typing import Any, List, Optional, Literal
 
 SupportedLanguage = Literal[
     'javascript', 'typescript', 'python'
 ]
 
+# Why a run was stopped, when it hit a limit of its execution profile
+LimitViolation = Literal[
+    'timeout', 'cpu-exceeded', 'memory-exceeded', 'process-limit-exceeded', 'file-size-exceeded', 'output-exceeded'
+]
+
 class SessionState(BaseModel):
     code: str
     language: SupportedLanguage
     connectedUsers: int
+    version: int = 0
+
+class SessionRevision(BaseModel):
+    version: int
+    code: str
+    language: SupportedLanguage
+    createdAt: float
+
+class HistorySummary(BaseModel):
+    firstVersion: int
+    lastVersion: int
+    revisions: int
+    snapshots: int
+    # Compressed size of the stored revisions
+    storedBytes: int
+    firstAt: float
+    lastAt: float
+
+class SessionUpdate(BaseModel):
+    code: Optional[str] = None
+    language: Optional[SupportedLanguage] = None
+
+class TextEdit(BaseModel):
+    # Offsets and lengths count Unicode code points
+    offset: int = Field(ge=0)
+    delete: int = Field(default=0, ge=0)
+    insert: str = ""
+
+class SessionPatch(BaseModel):
+    baseVersion: int = Field(ge=0)
+    edits: List[TextEdit]
 
 class ExecutionRequest(BaseModel):
     code: str
     language: SupportedLanguage
+    # Skip the result cache, e.g. for code whose output is not deterministic
+    bypassCache: bool = False
+    # Run in this session's persistent sandbox, keeping variables and imports from its
+    # earlier runs (Python only; never cached)
+    sessionId: Optional[str] = Field(None, min_length=1, max_length=200)
 
 class ExecutionResult(BaseModel):
     success: bool
     output: str
     error: Optional[str] = None
+    # Run time only; time spent waiting for a worker is reported in queueTime
     executionTime: float
+    queueTime: float = 0
+    exitCode: Optional[int] = None
+    # Set when the run was stopped for exceeding its output byte cap
+    truncated: bool = False
+    # Served from the result cache without starting a process
+    cached: bool = False
+    violation: Optional[LimitViolation] = None
+    # Resources the run actually used, when the worker could report them
+    peakRssKb: Optional[int] = None
+    cpuTime: Optional[float] = None
+    # Runs served by the session sandbox so far, this one included; 1 means its state started empty
+    sandboxRun: Optional[int] = None
+
+class LanguageCapability(BaseModel):
+    language: SupportedLanguage
+    # Whether the runtime is installed on this server
+    available: bool
+    # Idle pre-started workers; with none, the next run also pays interpreter startup
+    warmWorkers: int
+    # Recent queue plus run time of uncached runs, including the current wait for a
+    # slot, in milliseconds; None until the language has run once
+    estimatedMs: Optional[float] = None
+
+class ExecutionCapabilities(BaseModel):
+    languages: List[LanguageCapability]
+    queueDepth: int
+    # Whether repeated identical runs are answered from the result cache, and for how long
+    resultCache: bool
+    resultCacheTtlSeconds: Optional[float] = None
+
+class TestCase(BaseModel):
+    # Positional arguments for the solution function and the value it should return
+    args: List[Any] = []
+    expected: Any = None
+
+class BatchRequest(BaseModel):
+    code: str
+    language: SupportedLanguage
+    cases: List[TestCase] = Field(min_length=1, max_length=200)
+    functionName: str = Field("solution", pattern=r"^[A-Za-z_$][A-Za-z0-9_$]*$")
+    stopOnFailure: bool = False
+    bypassCache: bool = False
+
+class CaseResult(BaseModel):
+    passed: bool
+    actual: Any = None
+    # What the case printed while it ran
+    output: str = ""
+    error: Optional[str] = None
+    executionTime: float
+
+class BatchResult(BaseModel):
+    success: bool
+    passed: int = 0
+    failed: int = 0
+    # Cases not run because of stopOnFailure or because the program failed to load
+    skipped: int = 0
+    results: List[CaseResult] = []
+    # Output printed while loading the program
+    output: str = ""
+    error: Optional[str] = None
+    executionTime: float
+    queueTime: float = 0
+    violation: Optional[LimitViolation] = None
+    cached: bool = False
+
+class TypeCheckRequest(BaseModel):
+    code: str
+
+class TypeCheckResult(BaseModel):
+    success: bool
+    diagnostics: List[str]
 
 # Auth Models
 class UserBase(BaseModel):
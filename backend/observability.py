@@ -0,0 +1,256 @@
+import atexit
+import bisect
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+
+# Metrics exposed on /metrics in the Prometheus text format
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Fraction of timings recorded in the latency histograms; counters and gauges are always exact
+METRICS_SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE", "1.0"))
+# "json" writes one object per line, "text" a plain line for reading in a terminal
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Fraction of requests logged; failed (5xx) and slow requests are always logged
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.01"))
+REQUEST_LOG_SLOW_MS = float(os.getenv("REQUEST_LOG_SLOW_MS", "1000"))
+
+# Seconds; request and sandbox timings, then the much shorter database queries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+logger = logging.getLogger(__package__)
+
+def sampled(rate: float = METRICS_SAMPLE_RATE) -> bool:
+    return rate >= 1 or random.random() < rate
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Sequence[str], values: Sequence[str], bound: Optional[str] = None) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if bound is not None:
+        pairs.append(f'le="{bound}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    """A named family of series, one per combination of label values. Thread-safe."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+
+    def expose(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self.lock:
+            return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in self.values.items()]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: a count per bucket (the last one is +Inf), then the sum
+        self.series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self.lock:
+            for key, (counts, total) in self.series.items():
+                cumulative = 0
+                for bound, count in zip((*self.buckets, "+Inf"), counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, str(bound))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total[0]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric):
+        self.metrics.append(metric)
+        return metric
+
+    def expose(self) -> str:
+        return "\n".join(line for metric in self.metrics for line in metric.expose()) + "\n"
+
+registry = Registry()
+
+http_requests = registry.register(Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")))
+http_duration = registry.register(Histogram("http_request_duration_seconds", "Time to the end of the response body, by route.", ("method", "route")))
+http_in_flight = registry.register(Gauge("http_requests_in_flight", "HTTP requests being handled.", ("method",)))
+executions = registry.register(Counter("executions_total", "Code runs by language and outcome.", ("language", "outcome")))
+execution_duration = registry.register(Histogram("execution_duration_seconds", "Queue plus run time of uncached runs.", ("language",)))
+sandbox_spawns = registry.register(Histogram("sandbox_spawn_seconds", "Time to start a worker process.", ("language",)))
+db_queries = registry.register(Histogram("db_query_duration_seconds", "Database statement time by statement type.", ("engine", "operation"), QUERY_BUCKETS))
+
+def record_execution(language: str, result, elapsed_seconds: Optional[float] = None):
+    """Counts a finished run; `elapsed_seconds` is given for runs that actually executed."""
+    if not METRICS_ENABLED:
+        return
+    if result.cached:
+        outcome = "cached"
+    elif result.violation:
+        outcome = result.violation
+    else:
+        outcome = "success" if result.success else "error"
+    executions.inc(language, outcome)
+    if elapsed_seconds is not None and sampled():
+        execution_duration.observe(elapsed_seconds, language)
+
+def record_spawn(language: str, elapsed_seconds: float):
+    if METRICS_ENABLED and sampled():
+        sandbox_spawns.observe(elapsed_seconds, language)
+
+def instrument_engine(target, name: str):
+    """Times every statement run on a SQLAlchemy engine (the sync engine of an async one)."""
+    if not METRICS_ENABLED:
+        return
+
+    @event.listens_for(target, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter() if sampled() else None
+
+    @event.listens_for(target, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is not None:
+            operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+            db_queries.observe(time.perf_counter() - started, name, operation)
+
+class RequestMetricsMiddleware:
+    """ASGI middleware counting and timing HTTP requests by route template, and logging a
+    sample of them. Plain ASGI rather than @app.middleware, so streamed responses are
+    timed to their last byte and nothing is buffered."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        method = scope["method"]
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        if METRICS_ENABLED:
+            http_in_flight.inc(method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            # The matched route's template keeps one series per endpoint, not per session id
+            route = getattr(scope.get("route"), "path", "unmatched")
+            if METRICS_ENABLED:
+                http_in_flight.dec(method)
+                http_requests.inc(method, route, str(status))
+                if sampled():
+                    http_duration.observe(elapsed, method, route)
+            elapsed_ms = elapsed * 1000
+            if status >= 500 or elapsed_ms >= REQUEST_LOG_SLOW_MS or sampled(REQUEST_LOG_SAMPLE_RATE):
+                logger.info("request", extra={"fields": {
+                    "method": method, "path": scope["path"], "route": route, "status": status, "duration_ms": round(elapsed_ms, 2),
+                }})
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{key}={value}" for key, value in getattr(record, "fields", {}).items())
+        return " ".join(filter(None, (super().format(record), fields)))
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def configure_logging(stream=None, log_format: str = LOG_FORMAT, level: str = LOG_LEVEL):
+    """Sends the backend's logs through a queue to a background thread, so request handlers
+    never wait on stderr. Safe to call again, e.g. to point the logs elsewhere."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+    logger.handlers = [logging.handlers.QueueHandler(records)]
+    logger.setLevel(level)
+    # The server's own loggers stay as they are
+    logger.propagate = False
+
+def flush_logs():
+    """Writes out queued records; the listener restarts so logging keeps working."""
+    if _listener is not None:
+        _listener.stop()
+        _listener.start()
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(stop_logging)
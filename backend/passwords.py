@@ -0,0 +1,109 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor
+from typing import Deque, Optional
+
+# bcrypt work factor for new hashes; stored hashes with another cost are rehashed at login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Processes dedicated to hashing; 0 hashes on the default threadpool instead
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "2"))
+# Window for the reported login rate
+LOGIN_RATE_WINDOW_SECONDS = 60
+
+# bcrypt and the process pool are imported on first use, keeping them off the startup path
+
+def _hash(password: bytes, rounds: int) -> bytes:
+    import bcrypt
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+def _check(password: bytes, hashed: bytes) -> bool:
+    import bcrypt
+    return bcrypt.checkpw(password, hashed)
+
+def hash_rounds(hashed: str) -> Optional[int]:
+    """Cost factor of a stored bcrypt hash ("$2b$12$..."), or None if it is not one."""
+    parts = hashed.split("$")
+    return int(parts[2]) if len(parts) > 3 and parts[2].isdigit() else None
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated process pool, so login bursts hold neither the
+    event loop nor the request threadpool, and keeps login metrics.
+    """
+
+    def __init__(self, rounds: int = BCRYPT_ROUNDS, workers: int = AUTH_HASH_WORKERS):
+        self.rounds = rounds
+        self.workers = workers
+        self.pool: Optional[Executor] = None
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.logins: Deque[float] = deque()
+        self.counters = {
+            "hashes": 0, "checks": 0, "rehashes": 0,
+            "logins": 0, "failed_logins": 0,
+            "hash_ms_total": 0.0, "hash_ms_max": 0.0,
+        }
+
+    def _executor(self) -> Optional[Executor]:
+        if self.workers <= 0:
+            return None
+        with self.lock:
+            if self.pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # Spawned, not forked: the server runs threads that fork must not copy
+                self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self.pool
+
+    async def _call(self, fn, *args):
+        start = time.monotonic()
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor(), fn, *args)
+        finally:
+            self.in_flight -= 1
+            elapsed = (time.monotonic() - start) * 1000
+            self.counters["hash_ms_total"] += elapsed
+            self.counters["hash_ms_max"] = max(self.counters["hash_ms_max"], elapsed)
+
+    async def hash(self, password: str) -> str:
+        self.counters["hashes"] += 1
+        return (await self._call(_hash, password.encode("utf-8"), self.rounds)).decode("utf-8")
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        self.counters["checks"] += 1
+        return await self._call(_check, password.encode("utf-8"), hashed.encode("utf-8"))
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return hash_rounds(hashed) != self.rounds
+
+    def record_login(self, success: bool):
+        now = time.monotonic()
+        self.logins.append(now)
+        while self.logins and self.logins[0] < now - LOGIN_RATE_WINDOW_SECONDS:
+            self.logins.popleft()
+        self.counters["logins" if success else "failed_logins"] += 1
+
+    def stats(self) -> dict:
+        operations = self.counters["hashes"] + self.counters["checks"]
+        now = time.monotonic()
+        recent = sum(1 for at in self.logins if at >= now - LOGIN_RATE_WINDOW_SECONDS)
+        return {
+            **self.counters,
+            "hash_ms_avg": self.counters["hash_ms_total"] / operations if operations else 0.0,
+            "in_flight": self.in_flight,
+            "logins_per_minute": recent * 60 / LOGIN_RATE_WINDOW_SECONDS,
+            "rounds": self.rounds,
+            "workers": self.workers,
+        }
+
+    def close(self):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+                self.pool = None
+
+# Singleton instance
+password_hasher = PasswordHasher()
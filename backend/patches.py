@@ -0,0 +1,129 @@
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Tuple
+from .models import TextEdit
+
+# How many past versions per session are kept for rebasing stale patches
+HISTORY_DEPTH = 200
+# How many sessions keep a history at all (least recently written are dropped)
+HISTORY_SESSIONS = 1000
+
+class PatchConflict(Exception):
+    """Raised when a patch targets a version that can no longer be rebased."""
+
+    def __init__(self, current_version: int):
+        super().__init__(f"Patch cannot be rebased onto version {current_version}")
+        self.current_version = current_version
+
+def apply_edits(text: str, edits: List[TextEdit]) -> str:
+    """Applies edits in order; each offset is relative to the text left by the previous edit."""
+    for edit in edits:
+        if edit.offset + edit.delete > len(text):
+            raise ValueError(f"Edit range {edit.offset}..{edit.offset + edit.delete} is outside the document (length {len(text)})")
+        text = text[:edit.offset] + edit.insert + text[edit.offset + edit.delete:]
+    return text
+
+def diff_edit(old: str, new: str) -> Optional[TextEdit]:
+    """Smallest single edit turning `old` into `new`, or None if they are equal."""
+    if old == new:
+        return None
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    return TextEdit(offset=prefix, delete=len(old) - prefix - suffix, insert=new[prefix:len(new) - suffix])
+
+def _map_start(pos: int, other: TextEdit) -> int:
+    end = other.offset + other.delete
+    if pos < other.offset or (pos == other.offset and other.delete == 0):
+        return pos
+    if pos <= end:
+        return other.offset + len(other.insert)
+    return pos - other.delete + len(other.insert)
+
+def _map_end(pos: int, other: TextEdit) -> int:
+    end = other.offset + other.delete
+    if pos <= other.offset:
+        return pos
+    if pos < end:
+        return other.offset
+    return pos - other.delete + len(other.insert)
+
+def _transform_one(edit: TextEdit, other: TextEdit) -> TextEdit:
+    start = _map_start(edit.offset, other)
+    end = _map_end(edit.offset + edit.delete, other)
+    return TextEdit(offset=start, delete=max(0, end - start), insert=edit.insert)
+
+def transform(edit: TextEdit, other: TextEdit) -> List[TextEdit]:
+    """Rewrites `edit` so it applies after `other`; both must target the same text.
+
+    A deletion spanning text the other edit inserted is split so that text survives.
+    """
+    other_end = other.offset + other.delete
+    edit_end = edit.offset + edit.delete
+    if other.insert and edit.offset < other.offset and edit_end > other_end:
+        # Delete up to the other insert, then from its end to where our range ended
+        before = TextEdit(offset=edit.offset, delete=other.offset - edit.offset)
+        after = TextEdit(offset=edit.offset + len(other.insert), delete=edit_end - other_end, insert=edit.insert)
+        return [before, after]
+    return [_transform_one(edit, other)]
+
+def rebase(edits: List[TextEdit], applied: List[TextEdit]) -> List[TextEdit]:
+    """Rebases a sequence of edits over a sequence already applied to the same base text."""
+    for other in applied:
+        rebased = []
+        for edit in edits:
+            pieces = transform(edit, other)
+            rebased.extend(pieces)
+            for piece in pieces:
+                other = _transform_one(other, piece)
+        edits = rebased
+    return edits
+
+class PatchHistory:
+    """Bounded per-session log of the edits that produced each version."""
+
+    def __init__(self, depth: int = HISTORY_DEPTH, max_sessions: int = HISTORY_SESSIONS):
+        self.depth = depth
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, Deque[Tuple[int, List[TextEdit]]]]" = OrderedDict()
+
+    def record(self, session_id: str, version: int, edits: List[TextEdit]):
+        log = self.sessions.get(session_id)
+        if log is None:
+            log = self.sessions[session_id] = deque(maxlen=self.depth)
+        self.sessions.move_to_end(session_id)
+        log.append((version, edits))
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+
+    def edits_since(self, session_id: str, base_version: int, current_version: int) -> Optional[List[TextEdit]]:
+        """Edits turning `base_version` into `current_version`, or None if not fully logged."""
+        log = self.sessions.get(session_id, ())
+        entries = [(version, edits) for version, edits in log if version > base_version]
+        if [version for version, _ in entries] != list(range(base_version + 1, current_version + 1)):
+            return None
+        return [edit for _, edits in entries for edit in edits]
+
+    def forget(self, session_id: str):
+        self.sessions.pop(session_id, None)
+
+def apply_patch(history: PatchHistory, session_id: str, code: str, current_version: int, base_version: int, edits: List[TextEdit]) -> str:
+    """Applies a patch made against `base_version` to `code` (at `current_version`).
+
+    Raises PatchConflict if the edits since `base_version` are not in the history,
+    and ValueError if an edit falls outside the document.
+    """
+    if base_version > current_version:
+        raise PatchConflict(current_version)
+    if base_version < current_version:
+        applied = history.edits_since(session_id, base_version, current_version)
+        if applied is None:
+            raise PatchConflict(current_version)
+        edits = rebase(edits, applied)
+    new_code = apply_edits(code, edits)
+    if new_code != code:
+        history.record(session_id, current_version + 1, edits)
+    return new_code
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# Which broker carries session events between server processes: "memory" keeps them
+# inside this process, "unix" reaches every process sharing SESSION_PUBSUB_DIR
+SESSION_PUBSUB = os.getenv("SESSION_PUBSUB", "memory")
+SESSION_PUBSUB_DIR = os.getenv("SESSION_PUBSUB_DIR", os.path.join(tempfile.gettempdir(), "live-code-studio-pubsub"))
+# Messages buffered per peer before new ones are dropped
+PUBSUB_QUEUE_SIZE = int(os.getenv("PUBSUB_QUEUE_SIZE", "1000"))
+
+Handler = Callable[[dict], None]
+
+class Broker:
+    """Carries session events between nodes (server processes).
+
+    `publish` never blocks and never echoes a message back to the node that sent it;
+    the handler runs on the event loop that called `start`.
+    """
+
+    def __init__(self):
+        self.node_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.handler: Optional[Handler] = None
+        self.counters = {"published": 0, "received": 0, "dropped": 0}
+
+    async def start(self, handler: Handler):
+        self.handler = handler
+
+    def publish(self, message: dict):
+        raise NotImplementedError
+
+    async def close(self):
+        self.handler = None
+
+    def _deliver(self, message: dict):
+        if self.handler is not None:
+            self.counters["received"] += 1
+            self.handler(message)
+
+    def stats(self) -> dict:
+        return {**self.counters, "backend": type(self).__name__, "node": self.node_id}
+
+class MemoryHub:
+    """Connects the MemoryBrokers of one process; tests use a hub per simulated cluster."""
+
+    def __init__(self):
+        self.brokers: List["MemoryBroker"] = []
+
+class MemoryBroker(Broker):
+    """In-process broker; with the default hub and a single server process it has no peers."""
+
+    def __init__(self, hub: Optional[MemoryHub] = None):
+        super().__init__()
+        self.hub = hub or default_hub
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self, handler: Handler):
+        await super().start(handler)
+        self.loop = asyncio.get_running_loop()
+        self.hub.brokers.append(self)
+
+    def publish(self, message: dict):
+        self.counters["published"] += 1
+        for broker in self.hub.brokers:
+            if broker is not self and broker.loop is not None:
+                broker.loop.call_soon_threadsafe(broker._deliver, message)
+
+    async def close(self):
+        if self in self.hub.brokers:
+            self.hub.brokers.remove(self)
+        self.loop = None
+        await super().close()
+
+default_hub = MemoryHub()
+
+def _alive(path: Path) -> bool:
+    # Socket names start with the owning process id
+    try:
+        os.kill(int(path.name.split("-")[0]), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class UnixSocketBroker(Broker):
+    """Broker for processes on one host. Each node listens on `<directory>/<node>.sock`
+    and streams newline-delimited JSON to every other socket found there, over one
+    long-lived connection per peer so messages arrive in publish order.
+    """
+
+    def __init__(self, directory: str = SESSION_PUBSUB_DIR, queue_size: int = PUBSUB_QUEUE_SIZE):
+        super().__init__()
+        self.directory = Path(directory)
+        self.queue_size = queue_size
+        self.path = self.directory / f"{self.node_id}.sock"
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.peers: Dict[Path, asyncio.Queue] = {}
+        self.senders: Dict[Path, asyncio.Task] = {}
+        self.readers: set = set()
+        self.scanned_at: Optional[int] = None
+
+    async def start(self, handler: Handler):
+        await super().start(handler)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Session states travel on one line each
+        self.server = await asyncio.start_unix_server(self._serve, path=str(self.path), limit=64 * 1024 * 1024)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.readers.add(writer)
+        try:
+            while line := await reader.readline():
+                self._deliver(json.loads(line))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.readers.discard(writer)
+            writer.close()
+
+    def _scan(self):
+        # A node joining or leaving changes the directory's mtime; rescan only then
+        try:
+            mtime = self.directory.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self.scanned_at:
+            return
+        self.scanned_at = mtime
+        for path in self.directory.glob("*.sock"):
+            if path != self.path and path not in self.peers:
+                self.peers[path] = asyncio.Queue(self.queue_size)
+                self.senders[path] = asyncio.get_running_loop().create_task(self._send_loop(path))
+
+    async def _send_loop(self, path: Path):
+        queue = self.peers[path]
+        try:
+            _, writer = await asyncio.open_unix_connection(str(path))
+        except (ConnectionRefusedError, FileNotFoundError):
+            # Either still starting up, or left behind by a node that died without cleaning up
+            if not _alive(path):
+                path.unlink(missing_ok=True)
+            self._forget(path)
+            return
+        try:
+            while True:
+                writer.write(await queue.get())
+                await writer.drain()
+        except ConnectionError:
+            # The peer shut down; a restarted node comes back under a new name
+            self._forget(path)
+        finally:
+            writer.close()
+
+    def _forget(self, path: Path):
+        self.peers.pop(path, None)
+        self.senders.pop(path, None)
+        self.scanned_at = None
+
+    def publish(self, message: dict):
+        if self.server is None:
+            return
+        self._scan()
+        self.counters["published"] += 1
+        data = json.dumps(message).encode() + b"\n"
+        for queue in self.peers.values():
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                self.counters["dropped"] += 1
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            self.path.unlink(missing_ok=True)
+            self.server = None
+        for task in list(self.senders.values()):
+            task.cancel()
+        await asyncio.gather(*self.senders.values(), return_exceptions=True)
+        self.senders.clear()
+        self.peers.clear()
+        for writer in list(self.readers):
+            writer.close()
+        self.scanned_at = None
+        await super().close()
+
+    def stats(self) -> dict:
+        return {**super().stats(), "peers": len(self.peers)}
+
+def create_broker(kind: str = SESSION_PUBSUB) -> Broker:
+    if kind == "unix":
+        return UnixSocketBroker()
+    if kind == "memory":
+        return MemoryBroker()
+    raise ValueError(f"Unknown SESSION_PUBSUB backend: {kind}")
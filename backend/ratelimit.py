@@ -0,0 +1,53 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# Sessions one client may create by opening unknown ids; 0 disables the limit
+SESSION_CREATE_PER_MINUTE = float(os.getenv("SESSION_CREATE_PER_MINUTE", "20"))
+SESSION_CREATE_BURST = int(os.getenv("SESSION_CREATE_BURST", "10"))
+# Clients tracked at once; the least recently seen are forgotten, i.e. start with a full bucket
+RATE_LIMIT_CLIENTS = int(os.getenv("RATE_LIMIT_CLIENTS", "10000"))
+
+class RateLimiter:
+    """Thread-safe token bucket per key (e.g. client address), in a bounded LRU map."""
+
+    def __init__(self, per_minute: float = SESSION_CREATE_PER_MINUTE, burst: int = SESSION_CREATE_BURST, capacity: int = RATE_LIMIT_CLIENTS):
+        self.rate = per_minute / 60
+        self.burst = max(1, burst)
+        self.capacity = max(1, capacity)
+        # key -> (tokens, monotonic time they were counted at)
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"allowed": 0, "limited": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, key: str) -> Optional[float]:
+        """Takes a token; returns None if one was available, else the seconds until one is."""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self.lock:
+            tokens, counted_at = self.buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - counted_at) * self.rate)
+            if tokens < 1:
+                self.buckets[key] = (tokens, now)
+                self.buckets.move_to_end(key)
+                self.counters["limited"] += 1
+                return (1 - tokens) / self.rate
+            self.buckets[key] = (tokens - 1, now)
+            self.buckets.move_to_end(key)
+            while len(self.buckets) > self.capacity:
+                self.buckets.popitem(last=False)
+            self.counters["allowed"] += 1
+            return None
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.counters, "clients": len(self.buckets), "per_minute": self.rate * 60, "burst": self.burst}
+
+session_creation_limiter = RateLimiter()
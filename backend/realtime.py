@@ -0,0 +1,174 @@
+import asyncio
+import os
+import time
+import weakref
+from typing import Callable, Dict, Optional, Set, Tuple
+from fastapi import WebSocket
+from .models import SessionState
+from .pubsub import Broker, create_broker
+
+# Upper bound for a single push, so one stalled subscriber cannot hold up the rest
+SEND_TIMEOUT = 5.0
+# How often each process re-announces its subscriber counts; counts from a process
+# that stops announcing are dropped after three intervals
+PRESENCE_HEARTBEAT_SECONDS = float(os.getenv("PRESENCE_HEARTBEAT_SECONDS", "5"))
+
+class ConnectionManager:
+    """Tracks live WebSocket subscribers per session and pushes state changes to them.
+
+    Changes and subscriber counts are also sent through `broker`, so subscribers
+    connected to other server processes get the same pushes and presence counts.
+    """
+
+    def __init__(self, broker: Optional[Broker] = None, heartbeat_seconds: float = PRESENCE_HEARTBEAT_SECONDS):
+        self.broker = broker or create_broker()
+        self.heartbeat_seconds = heartbeat_seconds
+        # Called with (session_id, state) for changes made by other processes
+        self.on_remote_state: Optional[Callable[[str, SessionState], None]] = None
+        self.active_connections: Dict[str, Set[WebSocket]] = {}
+        # Subscriber counts of other processes: session -> node -> (count, expiry)
+        self.remote_presence: Dict[str, Dict[str, Tuple[int, float]]] = {}
+        self.heartbeat: Optional[asyncio.Task] = None
+        # Last state and payload pushed per session; identical payloads are never re-sent
+        self.last_state: Dict[str, SessionState] = {}
+        self.last_sent: Dict[str, dict] = {}
+        self.locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def start(self):
+        await self.broker.start(self.receive)
+        self.heartbeat = asyncio.get_running_loop().create_task(self._heartbeat())
+
+    async def close(self):
+        if self.heartbeat is not None:
+            self.heartbeat.cancel()
+            self.heartbeat = None
+        await self.broker.close()
+
+    async def connect(self, session_id: str, websocket: WebSocket):
+        await websocket.accept()
+        self.active_connections.setdefault(session_id, set()).add(websocket)
+        self.announce(session_id)
+
+    def disconnect(self, session_id: str, websocket: WebSocket) -> bool:
+        connections = self.active_connections.get(session_id)
+        if connections is None or websocket not in connections:
+            return False
+        connections.discard(websocket)
+        if not connections:
+            del self.active_connections[session_id]
+            self.last_state.pop(session_id, None)
+            self.last_sent.pop(session_id, None)
+        self.announce(session_id)
+        return True
+
+    def count(self, session_id: str) -> int:
+        """Subscribers connected to this process."""
+        return len(self.active_connections.get(session_id, ()))
+
+    def presence(self, session_id: str) -> int:
+        """Subscribers connected to any process."""
+        remote = self.remote_presence.get(session_id)
+        if not remote:
+            return self.count(session_id)
+        now = time.monotonic()
+        for node in [node for node, (_, expiry) in remote.items() if expiry <= now]:
+            del remote[node]
+        if not remote:
+            del self.remote_presence[session_id]
+        return self.count(session_id) + sum(count for count, _ in remote.values())
+
+    def announce(self, session_id: str):
+        self.broker.publish({"type": "presence", "node": self.broker.node_id, "session": session_id, "count": self.count(session_id)})
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            for session_id in list(self.active_connections):
+                self.announce(session_id)
+
+    def receive(self, message: dict):
+        """Handles an event published by another process."""
+        session_id = message["session"]
+        if message["type"] == "presence":
+            remote = self.remote_presence.setdefault(session_id, {})
+            known = message["node"] in remote
+            if message["count"]:
+                remote[message["node"]] = (message["count"], time.monotonic() + 3 * self.heartbeat_seconds)
+            else:
+                remote.pop(message["node"], None)
+            # A process new to this session learns our count without waiting for a heartbeat
+            if not known and self.count(session_id):
+                self.announce(session_id)
+            self.publish_presence(session_id)
+        elif message["type"] == "state":
+            state = SessionState.model_validate(message["state"])
+            last = self.last_state.get(session_id)
+            # Pushes from different processes can cross; never go back to an older version
+            if last is not None and state.version < last.version:
+                return
+            if self.on_remote_state is not None:
+                self.on_remote_state(session_id, state)
+            self._broadcast_local(session_id, state, None)
+
+    def lock(self, session_id: str) -> asyncio.Lock:
+        """Per-session lock; hold it across write + publish so pushes keep write order."""
+        lock = self.locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self.locks[session_id] = lock
+        return lock
+
+    def with_presence(self, session_id: str, state: SessionState) -> SessionState:
+        return state.model_copy(update={"connectedUsers": self.presence(session_id)})
+
+    def publish(self, session_id: str, state: SessionState, exclude: Optional[WebSocket] = None):
+        """Schedules a push to every process without waiting for it. Must be called from the event loop."""
+        self.broker.publish({"type": "state", "node": self.broker.node_id, "session": session_id, "state": state.model_dump()})
+        self._broadcast_local(session_id, state, exclude)
+
+    def _broadcast_local(self, session_id: str, state: SessionState, exclude: Optional[WebSocket]):
+        if not self.count(session_id):
+            return
+        task = asyncio.get_running_loop().create_task(self.broadcast_state(session_id, state, exclude))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def publish_presence(self, session_id: str):
+        """Re-pushes the last known state with the current subscriber count."""
+        state = self.last_state.get(session_id)
+        if state is not None:
+            self._broadcast_local(session_id, state, None)
+
+    async def broadcast_state(self, session_id: str, state: SessionState, exclude: Optional[WebSocket] = None):
+        connections = self.active_connections.get(session_id)
+        if not connections:
+            return
+
+        payload = self.with_presence(session_id, state).model_dump()
+        self.last_state[session_id] = state
+        if self.last_sent.get(session_id) == payload:
+            return
+        self.last_sent[session_id] = payload
+
+        targets = [ws for ws in connections if ws is not exclude]
+        results = await asyncio.gather(
+            *(asyncio.wait_for(ws.send_json(payload), SEND_TIMEOUT) for ws in targets),
+            return_exceptions=True
+        )
+
+        # Drop sockets that failed or stalled mid-send and tell the rest about it
+        dropped = [ws for ws, result in zip(targets, results) if isinstance(result, Exception)]
+        if any([self.disconnect(session_id, ws) for ws in dropped]):
+            self.publish_presence(session_id)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.active_connections),
+            "subscribers": sum(len(connections) for connections in self.active_connections.values()),
+            "remote_sessions": len(self.remote_presence),
+            "broker": self.broker.stats(),
+        }
+
+# Singleton instance
+manager = ConnectionManager()
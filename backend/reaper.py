@@ -0,0 +1,225 @@
+import logging
+import os
+import threading
+import time
+import zlib
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import and_, delete, func, or_, select, text
+from .database import DBArchivedSession, DBRevision, DBSession, Database, SessionLocal, _insert, db, engine
+
+logger = logging.getLogger(__name__)
+
+# Sessions untouched this long are archived (or deleted); 0 keeps them forever
+SESSION_IDLE_DAYS = float(os.getenv("SESSION_IDLE_DAYS", "30"))
+# "archive" moves idle sessions to session_archive, where opening them restores them; "delete" drops them
+SESSION_IDLE_ACTION = os.getenv("SESSION_IDLE_ACTION", "archive")
+# Archived sessions are deleted after this long; 0 keeps them forever
+SESSION_ARCHIVE_RETENTION_DAYS = float(os.getenv("SESSION_ARCHIVE_RETENTION_DAYS", "365"))
+# Sessions that were opened but never edited (version 0) are deleted outright after this long
+SESSION_UNUSED_HOURS = float(os.getenv("SESSION_UNUSED_HOURS", "24"))
+# Seconds between reaper passes; 0 disables the reaper
+REAPER_INTERVAL_SECONDS = float(os.getenv("REAPER_INTERVAL_SECONDS", "600"))
+# Sessions removed per transaction, so a pass never holds long locks
+REAPER_BATCH_SIZE = int(os.getenv("REAPER_BATCH_SIZE", "500"))
+
+REAPED = (DBSession.id, DBSession.code, DBSession.language, DBSession.version, DBSession.last_active)
+
+def archive_statement(dialect: str, rows: List[dict]):
+    """Upserts archive rows; a session archived, restored and archived again keeps one row."""
+    stmt = _insert(dialect, DBArchivedSession).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[DBArchivedSession.id],
+        set_={column: stmt.excluded[column] for column in ("data", "language", "version", "last_active", "archived_at")},
+    )
+
+def archived_row(row, now: float) -> dict:
+    return {
+        "id": row.id, "data": zlib.compress((row.code or "").encode("utf-8")), "language": row.language,
+        "version": row.version or 0, "last_active": row.last_active, "archived_at": now,
+    }
+
+def table_stats(target=None) -> Dict[str, object]:
+    """Row counts of the session tables, plus their size on disk where the database reports it."""
+    target = target or engine
+    stats: Dict[str, object] = {}
+    with target.connect() as conn:
+        for name, model in (("sessions", DBSession), ("archived_sessions", DBArchivedSession), ("revisions", DBRevision)):
+            stats[name] = conn.execute(select(func.count()).select_from(model)).scalar()
+        if target.dialect.name == "sqlite":
+            page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+            stats["database_bytes"] = conn.exec_driver_sql("PRAGMA page_count").scalar() * page_size
+            # Pages freed by deletes; the file only shrinks on VACUUM
+            stats["free_bytes"] = conn.exec_driver_sql("PRAGMA freelist_count").scalar() * page_size
+        elif target.dialect.name == "postgresql":
+            for table in (DBSession, DBArchivedSession, DBRevision):
+                stats[f"{table.__tablename__}_bytes"] = conn.execute(
+                    text("SELECT pg_total_relation_size(:table)"), {"table": table.__tablename__}
+                ).scalar()
+    return stats
+
+class SessionReaper:
+    """Removes sessions nobody uses any more, in batches, on a background thread.
+
+    Sessions never edited go after SESSION_UNUSED_HOURS; others idle for
+    SESSION_IDLE_DAYS are archived or deleted with their history. `is_active`
+    vetoes sessions that still have subscribers or unsaved changes. A write racing
+    with the reaper upserts the row again, so it is never lost.
+    """
+
+    def __init__(
+        self,
+        database: Database = db,
+        cache=None,
+        is_active: Callable[[str], bool] = lambda session_id: False,
+        idle_days: float = SESSION_IDLE_DAYS,
+        idle_action: str = SESSION_IDLE_ACTION,
+        unused_hours: float = SESSION_UNUSED_HOURS,
+        archive_retention_days: float = SESSION_ARCHIVE_RETENTION_DAYS,
+        interval_seconds: float = REAPER_INTERVAL_SECONDS,
+        batch_size: int = REAPER_BATCH_SIZE,
+    ):
+        if idle_action not in ("archive", "delete"):
+            raise ValueError(f"SESSION_IDLE_ACTION must be 'archive' or 'delete', not {idle_action!r}")
+        self.database = database
+        self.cache = cache
+        self.is_active = is_active
+        self.idle_days = idle_days
+        self.idle_action = idle_action
+        self.unused_hours = unused_hours
+        self.archive_retention_days = archive_retention_days
+        self.interval_seconds = interval_seconds
+        self.batch_size = max(1, batch_size)
+        self.lock = threading.Lock()
+        self.counters = {"passes": 0, "unused_deleted": 0, "idle_archived": 0, "idle_deleted": 0, "skipped_active": 0, "archive_purged": 0, "failures": 0}
+        self.last_pass: Dict[str, Optional[float]] = {"started_at": None, "seconds": None, "rows": None, "rows_per_second": None}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _reap(self, condition, archive: bool, now: float) -> int:
+        """Removes sessions matching `condition` batch by batch; returns how many."""
+        removed = 0
+        # Keyset pagination, so sessions skipped as active are not selected again
+        after = None
+        while not self._stop.is_set():
+            query = select(DBSession.id, DBSession.last_active).where(condition)
+            if after is not None:
+                query = query.where(or_(DBSession.last_active > after[0], and_(DBSession.last_active == after[0], DBSession.id > after[1])))
+            session = SessionLocal()
+            try:
+                candidates = session.execute(query.order_by(DBSession.last_active, DBSession.id).limit(self.batch_size)).all()
+                if not candidates:
+                    break
+                after = (candidates[-1].last_active, candidates[-1].id)
+                ids = [row.id for row in candidates if not self.is_active(row.id)]
+                skipped = len(candidates) - len(ids)
+                rows = []
+                if ids:
+                    # The condition is checked again, in case a session was used since it was selected
+                    rows = session.execute(delete(DBSession).where(DBSession.id.in_(ids), condition).returning(*REAPED)).all()
+                    reaped = [row.id for row in rows]
+                    if archive and rows:
+                        session.execute(archive_statement(session.get_bind().dialect.name, [archived_row(row, now) for row in rows]))
+                    if reaped:
+                        session.execute(delete(DBRevision).where(DBRevision.session_id.in_(reaped)))
+                session.commit()
+            finally:
+                session.close()
+            self._forget([row.id for row in rows])
+            removed += len(rows)
+            with self.lock:
+                self.counters["skipped_active"] += skipped
+            if len(candidates) < self.batch_size:
+                break
+        return removed
+
+    def _forget(self, session_ids: List[str]):
+        if self.cache is not None:
+            self.cache.forget(session_ids)
+        for session_id in session_ids:
+            self.database.history.forget(session_id)
+
+    def _purge_archive(self, cutoff: float) -> int:
+        purged = 0
+        while not self._stop.is_set():
+            session = SessionLocal()
+            try:
+                ids = session.execute(
+                    select(DBArchivedSession.id).where(DBArchivedSession.archived_at < cutoff).limit(self.batch_size)
+                ).scalars().all()
+                if ids:
+                    session.execute(delete(DBArchivedSession).where(DBArchivedSession.id.in_(ids)))
+                session.commit()
+            finally:
+                session.close()
+            purged += len(ids)
+            if len(ids) < self.batch_size:
+                break
+        return purged
+
+    def reap_once(self, now: Optional[float] = None) -> Dict[str, int]:
+        """Runs one pass and returns what it removed."""
+        now = now or time.time()
+        started = time.perf_counter()
+        result = {"unused_deleted": 0, "idle_archived": 0, "idle_deleted": 0, "archive_purged": 0}
+        if self.unused_hours:
+            cutoff = now - self.unused_hours * 3600
+            result["unused_deleted"] = self._reap(and_(DBSession.version == 0, DBSession.last_active < cutoff), False, now)
+        if self.idle_days:
+            cutoff = now - self.idle_days * 86400
+            key = "idle_archived" if self.idle_action == "archive" else "idle_deleted"
+            result[key] = self._reap(DBSession.last_active < cutoff, self.idle_action == "archive", now)
+        if self.archive_retention_days:
+            result["archive_purged"] = self._purge_archive(now - self.archive_retention_days * 86400)
+
+        elapsed = time.perf_counter() - started
+        rows = sum(result.values())
+        with self.lock:
+            self.counters["passes"] += 1
+            for key, count in result.items():
+                self.counters[key] += count
+            self.last_pass = {
+                "started_at": now,
+                "seconds": round(elapsed, 4),
+                "rows": rows,
+                "rows_per_second": round(rows / elapsed, 1) if elapsed else None,
+            }
+        if rows:
+            logger.info("Reaped sessions", extra={"fields": {**result, "duration_ms": round(elapsed * 1000, 2)}})
+        return result
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.reap_once()
+            except Exception:
+                with self.lock:
+                    self.counters["failures"] += 1
+                logger.exception("Session reaper pass failed")
+
+    def start(self):
+        if self.interval_seconds <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="session-reaper", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stops the background passes; a batch in progress finishes first."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                **self.counters,
+                "last_pass": dict(self.last_pass),
+                "running": self._thread is not None and self._thread.is_alive(),
+                "interval_seconds": self.interval_seconds,
+                "batch_size": self.batch_size,
+                "idle_days": self.idle_days,
+                "idle_action": self.idle_action,
+                "unused_hours": self.unused_hours,
+                "archive_retention_days": self.archive_retention_days,
+            }
@@ -0,0 +1,73 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from .models import ExecutionResult
+
+# Result cache configuration; a size of 0 disables the cache
+EXECUTION_CACHE_SIZE = int(os.getenv("EXECUTION_CACHE_SIZE", "0"))
+EXECUTION_CACHE_TTL_SECONDS = float(os.getenv("EXECUTION_CACHE_TTL_SECONDS", "300"))
+
+def result_key(language: str, runtime: str, code: str) -> str:
+    """Content address of a run: the same code on the same runtime maps to the same key."""
+    digest = hashlib.sha256()
+    for part in (language, runtime, code):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+class ResultCache:
+    """LRU cache of finished runs, keyed by result_key(), with a per-entry TTL.
+
+    Only results of runs that finished on their own are stored; timeouts, output
+    cap hits and infrastructure errors always run again.
+    """
+
+    def __init__(self, capacity: int = EXECUTION_CACHE_SIZE, ttl_seconds: float = EXECUTION_CACHE_TTL_SECONDS):
+        self.capacity = max(1, capacity)
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[str, Tuple[float, ExecutionResult]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    def get(self, key: str) -> Optional[ExecutionResult]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            expires, result = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return result
+
+    def put(self, key: str, result: ExecutionResult):
+        if result.exitCode is None or result.truncated:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, result)
+            self.entries.move_to_end(key)
+            self.counters["stores"] += 1
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                **self.counters,
+                "size": len(self.entries),
+                "capacity": self.capacity,
+                "ttl_seconds": self.ttl_seconds,
+            }
@@ -0,0 +1,85 @@
+import os
+import resource
+import signal
+from typing import Dict, Optional, Tuple
+
+# Default per-run limits; 0 disables a limit
+EXECUTOR_CPU_SECONDS = int(os.getenv("EXECUTOR_CPU_SECONDS", "5"))
+EXECUTOR_MEMORY_MB = int(os.getenv("EXECUTOR_MEMORY_MB", "256"))
+# RLIMIT_NPROC counts every process and thread of the user, not just this run's
+EXECUTOR_MAX_PROCESSES = int(os.getenv("EXECUTOR_MAX_PROCESSES", "256"))
+EXECUTOR_MAX_FILE_MB = int(os.getenv("EXECUTOR_MAX_FILE_MB", "10"))
+# Combined stdout+stderr bytes a single run may produce before it is stopped
+EXECUTOR_MAX_OUTPUT_BYTES = int(os.getenv("EXECUTOR_MAX_OUTPUT_BYTES", str(1024 * 1024)))
+
+MB = 1024 * 1024
+
+class ExecutionProfile:
+    """Resource limits applied to every run of a language."""
+
+    def __init__(
+        self,
+        cpu_seconds: int = EXECUTOR_CPU_SECONDS,
+        memory_mb: int = EXECUTOR_MEMORY_MB,
+        processes: int = EXECUTOR_MAX_PROCESSES,
+        file_size_mb: int = EXECUTOR_MAX_FILE_MB,
+        output_bytes: int = EXECUTOR_MAX_OUTPUT_BYTES
+    ):
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.processes = processes
+        self.file_size_mb = file_size_mb
+        self.output_bytes = output_bytes
+
+    def rlimits(self, address_space: bool = True) -> Dict[str, Tuple[int, int]]:
+        """Limits as {RLIMIT name: (soft, hard)}; JSON-safe so workers can apply them too.
+
+        V8 reserves far more address space than it uses, so Node runs pass
+        address_space=False and cap their heap with --max-old-space-size instead.
+        """
+        limits = {}
+        if self.cpu_seconds:
+            # SIGXCPU at the soft limit, SIGKILL a second later if it is ignored
+            limits["RLIMIT_CPU"] = (self.cpu_seconds, self.cpu_seconds + 1)
+        if self.memory_mb and address_space:
+            limits["RLIMIT_AS"] = (self.memory_mb * MB, self.memory_mb * MB)
+        if self.processes:
+            limits["RLIMIT_NPROC"] = (self.processes, self.processes)
+        if self.file_size_mb:
+            limits["RLIMIT_FSIZE"] = (self.file_size_mb * MB, self.file_size_mb * MB)
+        return limits
+
+def apply_rlimits(limits: Dict[str, Tuple[int, int]]):
+    """Applies rlimits to the current process, never raising a hard limit already in place."""
+    for name, (soft, hard) in limits.items():
+        which = getattr(resource, name)
+        _, current_hard = resource.getrlimit(which)
+        if current_hard != resource.RLIM_INFINITY:
+            soft, hard = min(soft, current_hard), min(hard, current_hard)
+        resource.setrlimit(which, (soft, hard))
+
+# Node workers run JavaScript and transpiled TypeScript alike
+PROFILES: Dict[str, ExecutionProfile] = {
+    "python": ExecutionProfile(),
+    "javascript": ExecutionProfile(),
+    "typescript": ExecutionProfile(),
+}
+
+def classify_violation(exit_code: int, stderr: str, cpu_time: Optional[float], profile: ExecutionProfile) -> Optional[str]:
+    """Names the limit a failed run hit, judging by how it died and what it printed."""
+    if exit_code == 0:
+        return None
+    if exit_code == -signal.SIGXCPU:
+        return "cpu-exceeded"
+    if exit_code == -signal.SIGKILL:
+        # The hard CPU limit, unless the run stayed under it (then the OOM killer)
+        if cpu_time is None or not profile.cpu_seconds or cpu_time >= profile.cpu_seconds * 1000:
+            return "cpu-exceeded"
+        return "memory-exceeded"
+    if exit_code == -signal.SIGXFSZ or "File too large" in stderr:
+        return "file-size-exceeded"
+    if "MemoryError" in stderr or "heap out of memory" in stderr or "Cannot allocate memory" in stderr:
+        return "memory-exceeded"
+    if "Resource temporarily unavailable" in stderr or "EAGAIN" in stderr:
+        return "process-limit-exceeded"
+    return None
@@ -0,0 +1,146 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+# The built frontend (frontend/dist); the Docker image copies it here
+STATIC_DIR = os.getenv("STATIC_DIR", "/app/static")
+# Hashed bundle names change with their content, so browsers may keep them for good
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Unhashed files (index.html, the service worker, favicon) are revalidated with their ETag
+REVALIDATE = "no-cache"
+# First path segments that belong to the API; the SPA fallback never answers for them
+API_SEGMENTS = frozenset({"api", "auth", "sessions", "stats", "execute", "health", "metrics", "docs", "redoc", "openapi.json"})
+# Precompressed siblings written by the frontend build, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+class Variant(NamedTuple):
+    path: Path
+    stat: os.stat_result
+    etag: str
+
+class Asset(NamedTuple):
+    media_type: str
+    # Keyed by content coding; "identity" is the file itself
+    variants: Dict[str, Variant]
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Quality per coding in an Accept-Encoding header; 0 means refused."""
+    accepted = {}
+    for part in header.split(","):
+        coding, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            accepted[coding.lower()] = quality
+    return accepted
+
+def choose_encoding(available, header: str) -> str:
+    accepted = accepted_encodings(header)
+    for coding, _ in ENCODINGS:
+        # "*" covers codings the header does not name
+        if coding in available and accepted.get(coding, accepted.get("*", 0)) > 0:
+            return coding
+    return "identity"
+
+def _variant(path: Path, coding: str) -> Variant:
+    stat = path.stat()
+    # Weak validators would be enough, but strong ones let ranges of a variant resume
+    return Variant(path, stat, f'"{stat.st_mtime_ns:x}-{stat.st_size:x}-{coding}"')
+
+def scan(directory: Path) -> Dict[str, Asset]:
+    """Maps every servable file under `directory` to its precompressed variants, once,
+    so requests never touch the filesystem to find them."""
+    assets: Dict[str, Asset] = {}
+    for path in sorted(directory.rglob("*")):
+        if not path.is_file() or path.suffix in (".br", ".gz"):
+            continue
+        variants = {"identity": _variant(path, "identity")}
+        for coding, suffix in ENCODINGS:
+            compressed = path.with_name(path.name + suffix)
+            if compressed.is_file():
+                variants[coding] = _variant(compressed, coding)
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        assets[path.relative_to(directory).as_posix()] = Asset(media_type, variants)
+    return assets
+
+class InMemoryPage(NamedTuple):
+    bodies: Dict[str, bytes]
+    etag: str
+
+def load_page(path: Path) -> InMemoryPage:
+    """index.html and its precompressed forms, held in memory for the SPA fallback."""
+    body = path.read_bytes()
+    bodies = {"identity": body}
+    for coding, suffix in ENCODINGS:
+        compressed = path.with_name(path.name + suffix)
+        if compressed.is_file():
+            bodies[coding] = compressed.read_bytes()
+    # A build without precompression still gets gzip
+    bodies.setdefault("gzip", gzip.compress(body, 9, mtime=0))
+    return InMemoryPage(bodies, hashlib.sha256(body).hexdigest()[:16])
+
+def _not_modified(request: Request, etag: str, cache_control: str) -> Optional[Response]:
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"})
+    return None
+
+class Frontend:
+    """Serves the built frontend: hashed bundles under /assets, top-level public files,
+    and index.html for every other non-API path so client-side routes load the app."""
+
+    def __init__(self, directory: str = STATIC_DIR):
+        self.directory = Path(directory)
+        self.assets = scan(self.directory)
+        self.index = load_page(self.directory / "index.html")
+
+    def file(self, request: Request, name: str, cache_control: str) -> Response:
+        asset = self.assets.get(name)
+        if asset is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+        coding = choose_encoding(asset.variants, request.headers.get("accept-encoding", ""))
+        variant = asset.variants[coding]
+        not_modified = _not_modified(request, variant.etag, cache_control)
+        if not_modified is not None:
+            return not_modified
+        headers = {"ETag": variant.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+        return FileResponse(variant.path, media_type=asset.media_type, headers=headers, stat_result=variant.stat)
+
+    def page(self, request: Request) -> Response:
+        available = self.index.bodies
+        coding = choose_encoding(available, request.headers.get("accept-encoding", ""))
+        etag = f'"{self.index.etag}-{coding}"'
+        not_modified = _not_modified(request, etag, REVALIDATE)
+        if not_modified is not None:
+            return not_modified
+        headers = {"ETag": etag, "Cache-Control": REVALIDATE, "Vary": "Accept-Encoding"}
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+        return Response(available[coding], media_type="text/html", headers=headers)
+
+    def mount(self, app: FastAPI):
+        @app.api_route("/assets/{name:path}", methods=["GET", "HEAD"], include_in_schema=False)
+        async def serve_asset(request: Request, name: str):
+            return self.file(request, f"assets/{name}", IMMUTABLE)
+
+        # Catch-all for SPA client-side routing; registered last, after every API route
+        @app.api_route("/{full_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+        async def serve_spa(request: Request, full_path: str = ""):
+            if full_path.partition("/")[0] in API_SEGMENTS:
+                raise HTTPException(status_code=404, detail="Not Found")
+            # Files from the frontend's public/ directory, such as the service worker
+            if full_path in self.assets:
+                return self.file(request, full_path, REVALIDATE)
+            return self.page(request)
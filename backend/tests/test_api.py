@@ -1,3 +1,4 @@
+import threading
 from fastapi.testclient import TestClient
 from ..main import app, db
 
@@ -68,3 +69,136 @@ def test_execution_unsupported():
     })
     # Should be 422 Unprocessable Entity due to Pydantic validation
     assert response.status_code == 422
+
+def receive_json(websocket, timeout=5):
+    # Receive on a daemon thread so a missing push fails the test instead of hanging it
+    result = {}
+    def target():
+        try:
+            result["data"] = websocket.receive_json()
+        except Exception as e:
+            result["error"] = e
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise AssertionError(f"No WebSocket message within {timeout}s")
+    if "error" in result:
+        raise result["error"]
+    return result["data"]
+
+def test_session_websocket_presence_and_push():
+    session_id = "test-session-ws"
+    # A shared portal keeps REST calls and sockets on the same event loop
+    with TestClient(app) as live_client, live_client.websocket_connect(f"/sessions/{session_id}/ws") as first:
+        data = receive_json(first)
+        assert data["connectedUsers"] == 1
+        assert data["language"] == "javascript"
+
+        with live_client.websocket_connect(f"/sessions/{session_id}/ws") as second:
+            assert receive_json(second)["connectedUsers"] == 2
+            assert receive_json(first)["connectedUsers"] == 2
+
+            # REST updates are pushed to live subscribers
+            response = live_client.post(f"/sessions/{session_id}", json={"code": "print(1)"})
+            assert response.json()["connectedUsers"] == 2
+            assert receive_json(first)["code"] == "print(1)"
+            assert receive_json(second)["code"] == "print(1)"
+
+            # Socket updates reach the other subscribers
+            second.send_json({"code": "print(2)"})
+            assert receive_json(first)["code"] == "print(2)"
+
+        assert receive_json(first)["connectedUsers"] == 1
+
+    response = client.get(f"/sessions/{session_id}")
+    assert response.json()["code"] == "print(2)"
+    assert response.json()["connectedUsers"] == 0
+
+def test_session_websocket_rejects_bad_frames():
+    session_id = "test-session-ws-invalid"
+    with TestClient(app) as live_client, live_client.websocket_connect(f"/sessions/{session_id}/ws") as ws:
+        receive_json(ws)
+
+        ws.send_text("not json")
+        assert "error" in receive_json(ws)
+
+        ws.send_json(["code"])
+        assert "error" in receive_json(ws)
+
+        ws.send_json({"language": "rust"})
+        assert "error" in receive_json(ws)
+
+        # The connection survives and the session is untouched
+        ws.send_json({"language": "python"})
+        response = live_client.get(f"/sessions/{session_id}")
+        assert response.json()["language"] == "python"
+
+def test_unchanged_update_is_not_pushed():
+    session_id = "test-session-ws-dedup"
+    with TestClient(app) as live_client, live_client.websocket_connect(f"/sessions/{session_id}/ws") as ws:
+        code = receive_json(ws)["code"]
+
+        # Same code as already pushed: nothing is sent
+        live_client.post(f"/sessions/{session_id}", json={"code": code})
+        live_client.post(f"/sessions/{session_id}", json={"code": "changed"})
+        assert receive_json(ws)["code"] == "changed"
+
+def test_update_session_rejects_unsupported_language():
+    response = client.post("/sessions/test-session-3", json={"language": "rust"})
+    assert response.status_code == 422
+
+def test_patch_session_applies_edits_and_bumps_version():
+    session_id = "test-session-patch"
+    client.post(f"/sessions/{session_id}", json={"code": "print(1)"})
+    version = client.get(f"/sessions/{session_id}").json()["version"]
+
+    response = client.patch(f"/sessions/{session_id}", json={
+        "baseVersion": version,
+        "edits": [{"offset": 6, "delete": 1, "insert": "42"}]
+    })
+    assert response.status_code == 200
+    assert response.json()["code"] == "print(42)"
+    assert response.json()["version"] == version + 1
+
+def test_patch_session_rebases_stale_patch():
+    session_id = "test-session-patch-rebase"
+    client.post(f"/sessions/{session_id}", json={"code": "x = 1\n"})
+    base = client.get(f"/sessions/{session_id}").json()["version"]
+
+    client.patch(f"/sessions/{session_id}", json={"baseVersion": base, "edits": [{"offset": 0, "insert": "# a\n"}]})
+    response = client.patch(f"/sessions/{session_id}", json={"baseVersion": base, "edits": [{"offset": 4, "delete": 1, "insert": "2"}]})
+    assert response.status_code == 200
+    assert response.json()["code"] == "# a\nx = 2\n"
+    assert response.json()["version"] == base + 2
+
+def test_patch_session_conflicts_and_bad_ranges():
+    session_id = "test-session-patch-conflict"
+    version = client.get(f"/sessions/{session_id}").json()["version"]
+
+    response = client.patch(f"/sessions/{session_id}", json={"baseVersion": version + 5, "edits": []})
+    assert response.status_code == 409
+    assert response.json()["detail"]["version"] == version
+
+    response = client.patch(f"/sessions/{session_id}", json={"baseVersion": version, "edits": [{"offset": 10000, "insert": "x"}]})
+    assert response.status_code == 422
+
+    response = client.patch("/sessions/test-session-missing", json={"baseVersion": 0, "edits": []})
+    assert response.status_code == 404
+
+def test_session_websocket_patch_ack():
+    session_id = "test-session-ws-patch"
+    with TestClient(app) as live_client, live_client.websocket_connect(f"/sessions/{session_id}/ws") as first:
+        state = receive_json(first)
+        with live_client.websocket_connect(f"/sessions/{session_id}/ws") as second:
+            receive_json(second)
+            receive_json(first)
+
+            second.send_json({"baseVersion": state["version"], "edits": [{"offset": 0, "insert": "// hi\n"}]})
+            assert receive_json(second) == {"ack": True, "version": state["version"] + 1}
+            pushed = receive_json(first)
+            assert pushed["code"].startswith("// hi\n")
+            assert pushed["version"] == state["version"] + 1
+
+            second.send_json({"baseVersion": 0, "edits": [{"offset": 1, "delete": 100000}]})
+            assert receive_json(second)["status"] == 422
@@ -0,0 +1,63 @@
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from .. import auth
+from ..main import app
+
+client = TestClient(app)
+
+@pytest.fixture
+def account():
+    email = f"{uuid.uuid4().hex}@example.com"
+    response = client.post("/auth/signup", json={"email": email, "full_name": "Cached User", "password": "secret123"})
+    assert response.status_code == 200
+    token = client.post("/auth/login", json={"email": email, "password": "secret123"}).json()["access_token"]
+    yield email, token
+    auth.token_cache.clear()
+    auth.user_cache.clear()
+
+@pytest.fixture
+def no_database(monkeypatch):
+    def fail():
+        raise AssertionError("the database was queried")
+    monkeypatch.setattr(auth, "AsyncSessionLocal", fail)
+
+def me(token: str):
+    return client.get("/auth/me", headers={"Authorization": f"Bearer {token}"})
+
+def test_embedded_claims_authenticate_without_database(account, no_database):
+    email, token = account
+    response = me(token)
+    assert response.status_code == 200
+    assert response.json()["email"] == email
+    assert response.json()["full_name"] == "Cached User"
+
+def test_verified_token_is_reused(account):
+    _, token = account
+    me(token)
+    hits = auth.token_cache.stats()["hits"]
+    me(token)
+    assert auth.token_cache.stats()["hits"] == hits + 1
+
+def test_invalidated_user_is_reloaded(account, monkeypatch):
+    email, token = account
+    me(token)
+    auth.invalidate_user(email)
+    loads = []
+    original = auth.AsyncSessionLocal
+    monkeypatch.setattr(auth, "AsyncSessionLocal", lambda: loads.append(1) or original())
+    assert me(token).status_code == 200
+    assert me(token).status_code == 200
+    # Older tokens fall back to one lookup, then the token is cached again
+    assert len(loads) == 1
+
+def test_token_without_claims_uses_user_cache(account, monkeypatch):
+    email, _ = account
+    plain = auth.create_access_token({"sub": email})
+    assert me(plain).status_code == 200
+    auth.token_cache.clear()
+    monkeypatch.setattr(auth, "AsyncSessionLocal", lambda: (_ for _ in ()).throw(AssertionError("queried")))
+    assert me(plain).status_code == 200
+
+def test_invalid_token_is_rejected():
+    assert me("not-a-token").status_code == 401
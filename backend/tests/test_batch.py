@@ -0,0 +1,50 @@
+import shutil
+import pytest
+from fastapi.testclient import TestClient
+from ..main import app
+
+client = TestClient(app)
+
+PYTHON_SOLUTION = "print('loading')\ndef solution(a, b):\n    print('adding', a, b)\n    return a + b\n"
+
+def run_batch(**body):
+    response = client.post("/execute/batch", json={"functionName": "solution", **body})
+    assert response.status_code == 200
+    return response.json()
+
+def test_python_batch_reports_each_case():
+    cases = [{"args": [1, 2], "expected": 3}, {"args": [2, 2], "expected": 5}, {"args": [[1], [2]], "expected": [1, 2]}]
+    result = run_batch(code=PYTHON_SOLUTION, language="python", cases=cases)
+    assert result["success"] is False
+    assert (result["passed"], result["failed"], result["skipped"]) == (2, 1, 0)
+    assert result["output"] == "loading\n"
+    first, second, _ = result["results"]
+    assert first["passed"] is True
+    assert first["output"] == "adding 1 2\n"
+    assert second["actual"] == 4
+
+def test_batch_stops_on_first_failure():
+    cases = [{"args": [1, 1], "expected": 0}, {"args": [1, 2], "expected": 3}]
+    result = run_batch(code=PYTHON_SOLUTION, language="python", cases=cases, stopOnFailure=True)
+    assert (result["passed"], result["failed"], result["skipped"]) == (0, 1, 1)
+
+def test_case_errors_do_not_stop_the_batch():
+    code = "def solution(x):\n    return 10 // x\n"
+    result = run_batch(code=code, language="python", cases=[{"args": [0], "expected": 0}, {"args": [5], "expected": 2}])
+    failing, passing = result["results"]
+    assert "ZeroDivisionError" in failing["error"]
+    assert "harness" not in failing["error"]
+    assert passing["passed"] is True
+
+def test_missing_solution_fails_the_batch():
+    result = run_batch(code="x = 1", language="python", cases=[{"args": [], "expected": None}])
+    assert result["success"] is False
+    assert "No function named 'solution'" in result["error"]
+    assert result["skipped"] == 1
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_javascript_batch_supports_async_solutions():
+    code = "async function solution(items) {\n  console.log('sorting');\n  return [...items].sort((a, b) => a - b);\n}"
+    result = run_batch(code=code, language="javascript", cases=[{"args": [[3, 1, 2]], "expected": [1, 2, 3]}])
+    assert result["success"] is True
+    assert result["results"][0]["output"] == "sorting\n"
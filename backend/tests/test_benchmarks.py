@@ -0,0 +1,24 @@
+import asyncio
+import httpx
+from ..benchmarks.load import SCENARIOS, compare, drive
+from ..main import app
+
+def scenario_stats(p99: float, throughput: float, error_rate: float = 0.0) -> dict:
+    return {"latency_ms": {"p99": p99}, "throughput_rps": throughput, "error_rate": error_rate}
+
+def test_load_driver_reports_latency_and_errors():
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            ok = await drive(client, SCENARIOS["sessions_get"], {}, requests=20, concurrency=4)
+            missing = await drive(client, lambda client, i, context: client.get("/auth/me"), {}, requests=5, concurrency=2)
+        return ok, missing
+    ok, missing = asyncio.run(scenario())
+    assert ok["requests"] == 20 and ok["errors"] == 0
+    assert 0 < ok["latency_ms"]["p50"] <= ok["latency_ms"]["p99"] <= ok["latency_ms"]["max"]
+    assert missing["errors_by_kind"] == {"401": 5}
+
+def test_regressions_past_the_threshold_are_reported():
+    baseline = {"scenarios": {"a": scenario_stats(100, 50), "b": scenario_stats(100, 50), "gone": scenario_stats(1, 1)}}
+    results = {"scenarios": {"a": scenario_stats(120, 45), "b": scenario_stats(130, 30, error_rate=0.05)}}
+    regressions = compare(results, baseline, threshold=0.25)
+    assert [regression.split(":")[0] for regression in regressions] == ["b", "b", "b"]
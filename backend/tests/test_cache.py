@@ -0,0 +1,78 @@
+import asyncio
+from ..cache import SessionCache
+from ..database import Base, async_db, engine, db
+
+def teardown_function():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+def test_reads_are_served_from_memory():
+    cache = SessionCache(db, capacity=10, flush_seconds=60)
+    cache.create_session("cache-read", default_code="x = 1")
+
+    assert cache.get_session("cache-read").code == "x = 1"
+    assert cache.get_session("missing") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+def test_writes_are_merged_until_flush():
+    cache = SessionCache(db, capacity=10, flush_seconds=60)
+    cache.create_session("cache-write", default_code="")
+    for i in range(5):
+        cache.update_session("cache-write", code=f"x = {i}")
+
+    assert cache.get_session("cache-write").code == "x = 4"
+    assert db.get_session("cache-write").code == ""
+
+    cache.flush()
+    persisted = db.get_session("cache-write")
+    assert persisted.code == "x = 4"
+    assert persisted.version == 5
+    assert cache.stats()["flushes"] == 1
+    assert cache.stats()["dirty"] == 0
+    cache.close()
+
+def test_eviction_flushes_dirty_sessions():
+    cache = SessionCache(db, capacity=1, flush_seconds=60)
+    cache.create_session("cache-evict-1", default_code="")
+    cache.update_session("cache-evict-1", code="kept")
+    cache.create_session("cache-evict-2", default_code="")
+
+    assert db.get_session("cache-evict-1").code == "kept"
+    assert cache.stats()["evictions"] == 1
+    cache.close()
+
+def test_zero_window_writes_through():
+    cache = SessionCache(db, capacity=10, flush_seconds=0)
+    cache.create_session("cache-through", default_code="")
+    cache.update_session("cache-through", language="python")
+    assert db.get_session("cache-through").language == "python"
+
+def test_async_variants_share_the_cache():
+    cache = SessionCache(db, capacity=10, flush_seconds=60, async_database=async_db)
+
+    async def scenario():
+        await cache.create_session_async("cache-async", default_code="")
+        await cache.update_session_async("cache-async", code="x = 1")
+        assert cache.get_session("cache-async").code == "x = 1"
+        assert (await async_db.get_session("cache-async")).code == ""
+        await cache.flush_async()
+        assert (await async_db.get_session("cache-async")).version == 1
+    asyncio.run(scenario())
+    cache.close()
+
+def test_remote_states_replace_older_entries():
+    cache = SessionCache(db, capacity=10, flush_seconds=60)
+    cache.create_session("cache-remote", default_code="")
+    cache.update_session("cache-remote", code="local")
+    remote = cache.get_session("cache-remote").model_copy(update={"code": "remote", "version": 2})
+
+    cache.adopt("cache-remote", remote)
+    assert cache.get_session("cache-remote").code == "remote"
+    # The writing process persists it; this one has nothing left to flush
+    assert cache.stats()["dirty"] == 0
+
+    cache.adopt("cache-remote", remote.model_copy(update={"code": "stale", "version": 1}))
+    assert cache.get_session("cache-remote").code == "remote"
+    cache.close()
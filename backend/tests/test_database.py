@@ -0,0 +1,121 @@
+import asyncio
+from contextlib import contextmanager
+from sqlalchemy import event, text
+from ..database import DATABASE_URL, Base, async_db, async_engine, async_url, build_engine, check_database, db, engine
+from ..models import SessionState, TextEdit
+
+def test_sqlite_connections_use_configured_pragmas():
+    settings = check_database()
+    assert settings["journal_mode"] == "wal"
+    assert settings["synchronous"] == "NORMAL"
+    assert settings["busy_timeout"] == 5000
+    assert settings["pool"] == "QueuePool"
+
+def test_readers_are_not_blocked_by_an_open_write():
+    engine = build_engine(DATABASE_URL)
+    try:
+        with engine.connect() as writer:
+            writer.execute(text("CREATE TABLE IF NOT EXISTS wal_probe (id INTEGER)"))
+            writer.commit()
+            writer.execute(text("INSERT INTO wal_probe VALUES (1)"))
+            # The write transaction is still open; a reader sees the last committed state
+            with engine.connect() as reader:
+                assert reader.execute(text("SELECT COUNT(*) FROM wal_probe")).scalar() == 0
+            writer.rollback()
+    finally:
+        engine.dispose()
+
+def test_in_memory_sqlite_skips_pool_sizing():
+    engine = build_engine("sqlite://")
+    try:
+        assert check_database(engine)["pool"] == "SingletonThreadPool"
+    finally:
+        engine.dispose()
+
+def run(scenario):
+    async def main():
+        try:
+            await scenario()
+        finally:
+            # Pooled asyncio connections belong to this event loop
+            await async_engine.dispose()
+    asyncio.run(main())
+
+def test_async_url_selects_asyncio_drivers():
+    assert async_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+    assert async_url("postgresql://u:p@host/db") == "postgresql+asyncpg://u:p@host/db"
+
+def test_async_database_matches_sync_interface():
+    async def scenario():
+        await async_db.create_session("async-db", default_code="a = 1", language="python")
+        assert (await async_db.update_session("async-db", code="a = 2")).version == 1
+        patched = await async_db.apply_patch("async-db", 1, [TextEdit(offset=4, delete=1, insert="3")])
+        assert patched.code == "a = 3" and patched.version == 2
+        # Writes from the asyncio engine are visible to the sync one
+        assert db.get_session("async-db").code == "a = 3"
+        assert await async_db.delete_session("async-db") is True
+        assert await async_db.get_session("async-db") is None
+    try:
+        run(scenario)
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+
+def test_async_database_serves_concurrent_requests():
+    async def scenario():
+        ids = [f"async-many-{i}" for i in range(50)]
+        await asyncio.gather(*(async_db.create_session(i, default_code="") for i in ids))
+        await asyncio.gather(*(async_db.update_session(i, code=i) for i in ids))
+        states = await asyncio.gather(*(async_db.get_session(i) for i in ids))
+        assert [state.code for state in states] == ids
+    try:
+        run(scenario)
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+
+@contextmanager
+def count_statements():
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement.split()[0])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+def test_session_writes_are_single_statements():
+    try:
+        with count_statements() as statements:
+            db.create_session("upsert-1", default_code="")
+        assert statements == ["INSERT"]
+
+        with count_statements() as statements:
+            db.save_sessions({
+                "upsert-1": SessionState(code="a", language="python", connectedUsers=0, version=3),
+                "upsert-2": SessionState(code="b", language="javascript", connectedUsers=0, version=1),
+            })
+        assert statements == ["INSERT"]
+        assert db.get_session("upsert-1").code == "a"
+        assert db.get_session("upsert-2").version == 1
+
+        with count_statements() as statements:
+            assert db.update_session("upsert-2", code="c").version == 2
+        # The read the edit is diffed against, then a conditional UPDATE ... RETURNING
+        assert statements == ["SELECT", "UPDATE"]
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+
+def test_concurrent_creates_return_the_same_session():
+    async def scenario():
+        states = await asyncio.gather(*(async_db.create_session("first-join", default_code=str(i)) for i in range(20)))
+        assert len({state.code for state in states}) == 1
+        # Creating an existing session leaves it untouched
+        await async_db.update_session("first-join", code="edited")
+        assert (await async_db.create_session("first-join", default_code="")).code == "edited"
+    try:
+        run(scenario)
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import shutil
+import time
+import pytest
+from fastapi.testclient import TestClient
+from ..executor import TIMEOUTS, ExecutionEngine, QueueFull, WorkerPool, engine, execute_code
+from ..main import app
+from ..sandbox import ExecutionProfile
+
+def pool_stats():
+    return asyncio.run(engine.stats())["pool"]
+
+def test_python_runs_reuse_warm_worker_without_sharing_state():
+    first = execute_code("import builtins\nbuiltins.leaked = True\nprint('one')", "python")
+    recycled = pool_stats()["recycled"]
+    second = execute_code("import builtins\nprint(hasattr(builtins, 'leaked'))", "python")
+
+    assert first.output == "one\n"
+    assert second.output == "False\n"
+    assert pool_stats()["recycled"] == recycled + 1
+
+def test_execution_reports_queue_and_run_time_separately():
+    result = execute_code("print('timed')", "python")
+    assert result.success is True
+    assert result.queueTime >= 0
+    assert result.executionTime > 0
+
+def test_python_errors_hide_worker_frames():
+    result = execute_code("def f():\n    raise ValueError('boom')\nf()", "python")
+    assert result.success is False
+    assert "ValueError: boom" in result.error
+    assert "runpy" not in result.error
+
+def test_worker_is_replaced_after_max_jobs():
+    async def scenario():
+        small_pool = WorkerPool(size=1, max_jobs=1)
+        try:
+            worker = await small_pool.acquire("python")
+            await small_pool.release(worker, healthy=True)
+            assert not worker.alive()
+            assert small_pool.stats()["idle"]["python"] == 1
+        finally:
+            await small_pool.shutdown()
+            shutil.rmtree(small_pool.workdir, ignore_errors=True)
+    asyncio.run(scenario())
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_javascript_waits_for_pending_timers():
+    result = execute_code("setTimeout(() => console.log('later'), 10)", "javascript")
+    assert result.success is True
+    assert result.output == "later\n"
+
+def test_full_queue_is_rejected_with_retry_after():
+    busy = ExecutionEngine(max_concurrency=1, max_per_language=1, max_queue=1)
+    try:
+        async def scenario():
+            slow = "import time\ntime.sleep(0.5)"
+            running = asyncio.ensure_future(busy.execute(slow, "python"))
+            await asyncio.sleep(0.1)
+            queued = asyncio.ensure_future(busy.execute(slow, "python"))
+            await asyncio.sleep(0.1)
+            assert (await busy.stats())["queue_depth"] == 1
+            with pytest.raises(QueueFull) as excinfo:
+                await busy.execute(slow, "python")
+            assert excinfo.value.retry_after >= 1
+            results = await asyncio.gather(running, queued)
+            assert all(result.success for result in results)
+            # The queued run waited for the first one to finish
+            assert results[1].queueTime >= 200
+            stats = await busy.stats()
+            assert stats["rejected"] == 1
+            assert stats["queued_total"] == 1
+        asyncio.run(scenario())
+    finally:
+        busy.close()
+
+def test_execute_endpoint_returns_429_when_queue_is_full(monkeypatch):
+    async def full(code, language, use_cache=True, session_id=None):
+        raise QueueFull(retry_after=3)
+    monkeypatch.setattr(engine, "execute", full)
+    response = TestClient(app).post("/execute", json={"code": "print(1)", "language": "python"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+
+def parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_stream_endpoint_sends_output_then_exit():
+    code = "import sys\nprint('out')\nprint('err', file=sys.stderr)\nsys.exit(3)"
+    with TestClient(app) as client:
+        response = client.post("/execute/stream", json={"code": code, "language": "python"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    assert ("stdout", {"data": "out\n"}) in events
+    assert ("stderr", {"data": "err\n"}) in events
+    name, result = events[-1]
+    assert name == "exit"
+    assert result["success"] is False
+    assert result["exitCode"] == 3
+    assert "output" not in result
+
+def test_runaway_output_is_capped():
+    small = ExecutionEngine(profiles={"python": ExecutionProfile(output_bytes=10_000)})
+    try:
+        result = small.call(small._run("while True:\n    print('x' * 1000)", "python"))
+    finally:
+        small.close()
+    assert result.success is False
+    assert result.truncated is True
+    assert len(result.output) <= 10_000
+    assert "Output limit exceeded" in result.error
+    assert result.violation == "output-exceeded"
+
+def test_repeated_run_is_served_from_result_cache():
+    caching = ExecutionEngine(cache_size=10)
+    try:
+        code = "print('same')"
+        first = caching.call(caching._run(code, "python"))
+        executions = caching.counters["executions"]
+        second = caching.call(caching._run(code, "python"))
+        bypassed = caching.call(caching._run(code, "python", use_cache=False))
+    finally:
+        caching.close()
+    assert first.cached is False
+    assert second.cached is True
+    assert second.output == "same\n"
+    assert bypassed.cached is False
+    # Only the bypassed run started a process
+    assert caching.counters["executions"] == executions + 1
+
+def test_capabilities_report_warm_workers_and_recent_latency():
+    fresh = ExecutionEngine(cache_size=10)
+    try:
+        before = {item.language: item for item in fresh.call(fresh._capabilities()).languages}
+        assert before["python"].available is True
+        # Nothing has run yet, so there is no estimate to offer
+        assert before["python"].estimatedMs is None
+
+        fresh.call(fresh._run("print('hint')", "python"))
+        after = fresh.call(fresh._capabilities())
+    finally:
+        fresh.close()
+    python = next(item for item in after.languages if item.language == "python")
+    assert python.warmWorkers >= 1
+    assert python.estimatedMs > 0
+    assert after.resultCache is True
+
+def test_capabilities_endpoint():
+    response = TestClient(app).get("/execute/capabilities")
+    assert response.status_code == 200
+    assert {item["language"] for item in response.json()["languages"]} == {"python", "javascript", "typescript"}
+
+def test_session_sandbox_keeps_state_between_runs():
+    repl = ExecutionEngine(cache_size=10)
+    try:
+        first = repl.call(repl._run("import math\nradius = 2", "python", session_id="room"))
+        second = repl.call(repl._run("area = math.pi * radius ** 2\nround(area, 2)", "python", session_id="room"))
+        other = repl.call(repl._run("print('radius' in globals())", "python", session_id="other-room"))
+        failed = repl.call(repl._run("radius / 0", "python", session_id="room"))
+        after_error = repl.call(repl._run("print(radius)", "python", session_id="room"))
+        plain = repl.call(repl._run("print('radius' in globals())", "python"))
+        stats = repl.call(repl._stats())["sandboxes"]
+    finally:
+        repl.close()
+    assert (first.sandboxRun, second.sandboxRun) == (1, 2)
+    # A trailing expression is echoed, like in the interactive interpreter
+    assert second.output == "12.57\n"
+    assert other.output == "False\n"
+    assert "ZeroDivisionError" in failed.error and "cell-3.py" in failed.error
+    assert after_error.output == "2\n" and after_error.sandboxRun == 4
+    assert plain.output == "False\n" and plain.sandboxRun is None
+    assert stats["live"] == 2 and stats["created"] == 2
+
+def test_session_sandboxes_evict_least_recently_used_and_reset_after_timeout(monkeypatch):
+    monkeypatch.setitem(TIMEOUTS, "python", 1)
+    repl = ExecutionEngine(sandboxes=2)
+    try:
+        for room in ("a", "b", "a", "c"):
+            repl.call(repl._run(f"seen = '{room}'", "python", session_id=room))
+        stats = repl.call(repl._stats())["sandboxes"]
+        assert stats["evicted"] == 1 and stats["live"] == 2
+        # "b" was least recently used, so it starts over
+        assert repl.call(repl._run("print(seen)", "python", session_id="a")).output == "a\n"
+        assert repl.call(repl._run("seen", "python", session_id="b")).sandboxRun == 1
+
+        timed_out = repl.call(repl._run("while True:\n    pass", "python", session_id="a"))
+        assert timed_out.violation == "timeout"
+        assert repl.call(repl._run("print('seen' in globals())", "python", session_id="a")).output == "False\n"
+
+        repl.call(repl.sandboxes.expire(now=time.monotonic() + 3600))
+        assert repl.call(repl._stats())["sandboxes"]["live"] == 0
+    finally:
+        repl.close()
+
+def test_session_runs_and_reset_endpoint():
+    with TestClient(app) as client:
+        client.post("/execute", json={"code": "total = 40", "language": "python", "sessionId": "endpoint-room"})
+        response = client.post("/execute", json={"code": "total + 2", "language": "python", "sessionId": "endpoint-room"})
+        assert response.json()["output"] == "42\n"
+        assert client.delete("/execute/sessions/endpoint-room").status_code == 204
+        assert client.delete("/execute/sessions/endpoint-room").status_code == 404
+        response = client.post("/execute", json={"code": "total", "language": "python", "sessionId": "endpoint-room"})
+        assert "NameError" in response.json()["error"]
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import time
+from fastapi.testclient import TestClient
+from ..cache import SessionCache
+from ..database import Base, async_db, async_engine, db, engine
+from ..history import HistoryUnavailable, RevisionLog, prune, state_at, summary
+from ..main import app
+from ..models import TextEdit
+from ..patches import apply_edits
+
+client = TestClient(app)
+
+def teardown_function():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+def run(coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(main())
+
+def write_versions(session_id: str, count: int, interval: int = 5) -> list:
+    cache = SessionCache(db, capacity=10, flush_seconds=60, async_database=async_db, revisions=RevisionLog(interval))
+    header = "# " + "-" * 100 + "\n"
+    cache.create_session(session_id, default_code=header)
+    versions = [header]
+    for i in range(1, count + 1):
+        versions.append(versions[-1] + f"line {i}\n")
+        cache.update_session(session_id, code=versions[-1])
+    cache.close()
+    return versions
+
+def test_any_version_is_rebuilt_from_snapshots_and_deltas():
+    versions = write_versions("history-rebuild", 23)
+    for version, code in enumerate(versions):
+        assert run(state_at("history-rebuild", version)).code == code
+
+    stats = run(summary("history-rebuild"))
+    assert (stats.firstVersion, stats.lastVersion, stats.revisions) == (0, 23, 24)
+    # Versions 0, 5, 10, 15, 20 are snapshots, the rest small deltas
+    assert stats.snapshots == 5
+    assert stats.storedBytes < sum(len(code) for code in versions)
+
+def test_large_replacement_is_stored_in_full():
+    cache = SessionCache(db, capacity=10, flush_seconds=60, revisions=RevisionLog(100))
+    header = "# " + "-" * 100 + "\n"
+    cache.create_session("history-paste", default_code=header)
+    cache.update_session("history-paste", code=header + "y = 2\n")
+    cache.update_session("history-paste", code="z = 3\n" * 50)
+    cache.close()
+    # The first version and the paste; the small edit between them is a delta
+    assert run(summary("history-paste")).snapshots == 2
+    assert run(state_at("history-paste", 1)).code == header + "y = 2\n"
+
+def test_missing_versions_are_reported():
+    write_versions("history-missing", 2)
+    try:
+        run(state_at("history-missing", 3))
+    except HistoryUnavailable:
+        pass
+    else:
+        raise AssertionError("version 3 was never written")
+
+def test_pruning_keeps_recent_versions_rebuildable():
+    versions = write_versions("history-prune", 23)
+    assert prune(max_versions=8) > 0
+    stats = run(summary("history-prune"))
+    # Versions 15..23 are kept, which needs the snapshot at 15
+    assert stats.firstVersion == 15
+    assert run(state_at("history-prune", 15)).code == versions[15]
+    assert run(state_at("history-prune", 23)).code == versions[23]
+
+    assert prune(retention_days=1, now=time.time() + 2 * 86400) > 0
+    # The newest snapshot always stays as the base of what follows it
+    assert run(summary("history-prune")).firstVersion == 20
+
+def test_replay_streams_every_version():
+    session_id = "history-replay"
+    client.get(f"/sessions/{session_id}")
+    client.post(f"/sessions/{session_id}", json={"code": "a"})
+    client.patch(f"/sessions/{session_id}", json={"baseVersion": 1, "edits": [{"offset": 1, "insert": "b"}]})
+    client.post(f"/sessions/{session_id}", json={"code": "abc"})
+
+    assert client.get(f"/sessions/{session_id}/history").json()["lastVersion"] == 3
+    assert client.get(f"/sessions/{session_id}/history/2").json()["code"] == "ab"
+
+    response = client.get(f"/sessions/{session_id}/replay", params={"from": 1})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    steps = [json.loads(line) for line in response.text.splitlines()]
+    assert [step["version"] for step in steps] == [1, 2, 3]
+    code = steps[0]["code"]
+    for step in steps[1:]:
+        code = step["code"] if "code" in step else apply_edits(code, [TextEdit(**edit) for edit in step["edits"]])
+    assert code == "abc"
+
+    assert client.get(f"/sessions/{session_id}/replay", params={"from": 3, "to": 1}).status_code == 422
+    assert client.get(f"/sessions/{session_id}/history/9").status_code == 404
@@ -0,0 +1,51 @@
+import io
+import json
+from fastapi.testclient import TestClient
+from .. import observability
+from ..executor import execute_code
+from ..main import app
+from ..observability import Histogram, configure_logging, flush_logs
+
+client = TestClient(app)
+
+def test_metrics_cover_routes_executions_and_queries():
+    client.get("/sessions/metrics-a")
+    client.get("/sessions/metrics-b")
+    execute_code("print('counted')", "python", use_cache=False)
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    # Both sessions share the route template's series
+    assert 'http_requests_total{method="GET",route="/sessions/{session_id}",status="200"}' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/sessions/{session_id}"}' in text
+    assert 'http_requests_in_flight{method="GET"} 1' in text
+    assert 'executions_total{language="python",outcome="success"}' in text
+    assert 'db_query_duration_seconds_bucket{engine="async",operation="SELECT",le="+Inf"}' in text
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("demo_seconds", "Demo.", ("kind",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, "a")
+    assert histogram.samples() == [
+        'demo_seconds_bucket{kind="a",le="0.1"} 1',
+        'demo_seconds_bucket{kind="a",le="1.0"} 2',
+        'demo_seconds_bucket{kind="a",le="+Inf"} 3',
+        'demo_seconds_sum{kind="a"} 5.55',
+        'demo_seconds_count{kind="a"} 3',
+    ]
+
+def test_sampled_requests_are_logged_as_json(monkeypatch):
+    stream = io.StringIO()
+    configure_logging(stream=stream)
+    monkeypatch.setattr(observability, "REQUEST_LOG_SAMPLE_RATE", 1.0)
+    try:
+        client.get("/sessions/logged")
+        flush_logs()
+    finally:
+        configure_logging()
+    entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+    request = next(entry for entry in entries if entry["message"] == "request")
+    assert request["route"] == "/sessions/{session_id}"
+    assert request["status"] == 200
+    assert request["duration_ms"] > 0
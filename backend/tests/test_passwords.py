@@ -0,0 +1,44 @@
+import asyncio
+import uuid
+from fastapi.testclient import TestClient
+from ..auth import find_user
+from ..main import app
+from ..passwords import PasswordHasher, hash_rounds, password_hasher
+
+def test_hashes_on_process_pool_with_configured_cost():
+    hasher = PasswordHasher(rounds=5, workers=1)
+    try:
+        async def scenario():
+            hashed = await hasher.hash("secret")
+            assert hash_rounds(hashed) == 5
+            assert await hasher.verify("secret", hashed) is True
+            assert await hasher.verify("wrong", hashed) is False
+        asyncio.run(scenario())
+        assert hasher.pool is not None
+        assert hasher.stats()["checks"] == 2
+    finally:
+        hasher.close()
+
+def test_login_rehashes_when_cost_changes(monkeypatch):
+    client = TestClient(app)
+    email = f"{uuid.uuid4().hex}@example.com"
+    client.post("/auth/signup", json={"email": email, "full_name": "Rehash", "password": "secret123"})
+    assert hash_rounds(asyncio.run(find_user(email)).hashed_password) == password_hasher.rounds
+
+    monkeypatch.setattr(password_hasher, "rounds", password_hasher.rounds + 1)
+    rehashes = password_hasher.stats()["rehashes"]
+    response = client.post("/auth/login", json={"email": email, "password": "secret123"})
+    assert response.status_code == 200
+    assert hash_rounds(asyncio.run(find_user(email)).hashed_password) == password_hasher.rounds
+    assert password_hasher.stats()["rehashes"] == rehashes + 1
+    # The new hash still accepts the password, and is not rehashed again
+    assert client.post("/auth/login", json={"email": email, "password": "secret123"}).status_code == 200
+    assert password_hasher.stats()["rehashes"] == rehashes + 1
+
+def test_login_metrics_count_failures():
+    client = TestClient(app)
+    failed = password_hasher.stats()["failed_logins"]
+    client.post("/auth/login", json={"email": "nobody@example.com", "password": "x"})
+    stats = client.get("/stats/auth").json()["passwords"]
+    assert stats["failed_logins"] == failed + 1
+    assert stats["logins_per_minute"] >= 1
@@ -0,0 +1,36 @@
+import pytest
+from ..models import TextEdit
+from ..patches import PatchHistory, apply_edits, diff_edit, rebase
+
+def test_apply_edits_in_order():
+    edits = [TextEdit(offset=0, delete=5, insert="Goodbye"), TextEdit(offset=7, insert="!")]
+    assert apply_edits("Hello world", edits) == "Goodbye! world"
+
+def test_apply_edits_rejects_out_of_range():
+    with pytest.raises(ValueError):
+        apply_edits("abc", [TextEdit(offset=2, delete=5)])
+
+def test_diff_edit_is_minimal():
+    assert diff_edit("same", "same") is None
+    assert diff_edit("print(1)", "print(42)") == TextEdit(offset=6, delete=1, insert="42")
+
+def test_rebase_over_concurrent_edit():
+    base = "a = 1\nb = 2\n"
+    theirs = [TextEdit(offset=0, insert="# header\n")]
+    mine = [TextEdit(offset=10, delete=1, insert="3")]
+    merged = apply_edits(apply_edits(base, theirs), rebase(mine, theirs))
+    assert merged == "# header\na = 1\nb = 3\n"
+
+def test_rebase_does_not_delete_concurrent_insert():
+    base = "abcdef"
+    theirs = [TextEdit(offset=2, delete=2, insert="XY")]
+    mine = [TextEdit(offset=1, delete=4)]
+    assert apply_edits(apply_edits(base, theirs), rebase(mine, theirs)) == "aXYf"
+
+def test_history_requires_contiguous_versions():
+    history = PatchHistory(depth=2)
+    for version in range(1, 4):
+        history.record("s", version, [TextEdit(offset=0, insert=str(version))])
+    assert len(history.edits_since("s", 1, 3)) == 2
+    # Version 1 has been dropped from the bounded log
+    assert history.edits_since("s", 0, 3) is None
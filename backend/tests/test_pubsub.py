@@ -0,0 +1,141 @@
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from ..models import SessionState
+from ..pubsub import MemoryBroker, MemoryHub, UnixSocketBroker
+from ..realtime import ConnectionManager
+
+PACKAGE_ROOT = Path(__file__).resolve().parents[2]
+
+class FakeSocket:
+    def __init__(self):
+        self.received = []
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, payload):
+        self.received.append(payload)
+
+def state(code: str, version: int) -> SessionState:
+    return SessionState(code=code, language="python", connectedUsers=0, version=version)
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_changes_and_presence_reach_other_processes():
+    async def scenario():
+        hub = MemoryHub()
+        first, second = ConnectionManager(MemoryBroker(hub)), ConnectionManager(MemoryBroker(hub))
+        adopted = []
+        second.on_remote_state = lambda session_id, new_state: adopted.append((session_id, new_state.code))
+        await first.start()
+        await second.start()
+        try:
+            alice, bob = FakeSocket(), FakeSocket()
+            await first.connect("shared", alice)
+            await second.connect("shared", bob)
+            await settle()
+            assert first.presence("shared") == second.presence("shared") == 2
+
+            first.publish("shared", state("x = 1", 1), exclude=alice)
+            await settle()
+            assert alice.received == []
+            assert bob.received[-1]["code"] == "x = 1"
+            assert bob.received[-1]["connectedUsers"] == 2
+            assert adopted == [("shared", "x = 1")]
+
+            # An older version crossing a newer one is not pushed
+            first.publish("shared", state("x = 0", 0))
+            await settle()
+            assert bob.received[-1]["code"] == "x = 1"
+
+            second.disconnect("shared", bob)
+            await settle()
+            assert first.presence("shared") == 1
+        finally:
+            await first.close()
+            await second.close()
+    asyncio.run(scenario())
+
+def test_silent_process_presence_expires():
+    async def scenario():
+        hub = MemoryHub()
+        first, second = ConnectionManager(MemoryBroker(hub), heartbeat_seconds=0.05), ConnectionManager(MemoryBroker(hub), heartbeat_seconds=0.05)
+        await first.start()
+        await second.start()
+        await second.connect("crashing", FakeSocket())
+        await settle()
+        assert first.presence("crashing") == 1
+        # Stops heartbeats without announcing the disconnect, like a killed worker
+        await second.close()
+        await asyncio.sleep(0.2)
+        assert first.presence("crashing") == 0
+        await first.close()
+    asyncio.run(scenario())
+
+def test_unix_socket_broker_delivers_in_order(tmp_path):
+    async def scenario():
+        received = []
+        first, second = UnixSocketBroker(str(tmp_path)), UnixSocketBroker(str(tmp_path))
+        await first.start(lambda message: None)
+        await second.start(received.append)
+        try:
+            for i in range(100):
+                first.publish({"session": "s", "n": i})
+            deadline = time.monotonic() + 5
+            while len(received) < 100 and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            assert [message["n"] for message in received] == list(range(100))
+        finally:
+            await first.close()
+            await second.close()
+        assert list(tmp_path.glob("*.sock")) == []
+    asyncio.run(scenario())
+
+PEER = r'''
+import asyncio, sys
+from backend.pubsub import UnixSocketBroker
+
+async def main():
+    broker = UnixSocketBroker(sys.argv[1])
+    done = asyncio.Event()
+    def echo(message):
+        broker.publish({**message, "echo": True})
+        done.set()
+    await broker.start(echo)
+    print("ready", flush=True)
+    await asyncio.wait_for(done.wait(), 10)
+    await asyncio.sleep(0.2)
+    await broker.close()
+
+asyncio.run(main())
+'''
+
+def test_unix_socket_broker_reaches_another_process(tmp_path):
+    peer = subprocess.Popen([sys.executable, "-c", PEER, str(tmp_path)], cwd=PACKAGE_ROOT, stdout=subprocess.PIPE, text=True)
+    try:
+        assert peer.stdout.readline().strip() == "ready"
+
+        async def scenario():
+            echoed = asyncio.Event()
+            replies = []
+            broker = UnixSocketBroker(str(tmp_path))
+            await broker.start(lambda message: replies.append(message) or echoed.set())
+            try:
+                start = time.monotonic()
+                broker.publish({"session": "s", "state": {"code": "x"}})
+                await asyncio.wait_for(echoed.wait(), 5)
+                assert replies[0]["echo"] is True
+                # Well under the polling interval the frontend used to fall back on
+                assert time.monotonic() - start < 0.5
+            finally:
+                await broker.close()
+        asyncio.run(scenario())
+        assert peer.wait(10) == 0
+    finally:
+        peer.kill()
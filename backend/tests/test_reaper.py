@@ -0,0 +1,101 @@
+import time
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+from .. import main
+from ..cache import SessionCache
+from ..database import Base, DBArchivedSession, DBSession, SessionLocal, db, engine
+from ..history import RevisionLog
+from ..main import app
+from ..ratelimit import RateLimiter
+from ..reaper import SessionReaper, table_stats
+
+client = TestClient(app)
+
+def teardown_function():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+def last_active(session_id: str) -> float:
+    with SessionLocal() as session:
+        return session.execute(select(DBSession.last_active).where(DBSession.id == session_id)).scalar_one()
+
+def age(session_id: str, seconds: float):
+    with SessionLocal() as session:
+        session.execute(update(DBSession).where(DBSession.id == session_id).values(last_active=time.time() - seconds))
+        session.commit()
+
+def test_unused_and_idle_sessions_are_reaped_in_batches():
+    before = table_stats()["sessions"]
+    for i in range(5):
+        db.create_session(f"reap-unused-{i}", default_code="")
+        age(f"reap-unused-{i}", 2 * 3600)
+    db.create_session("reap-fresh", default_code="")
+    db.create_session("reap-idle", default_code="")
+    db.update_session("reap-idle", code="kept")
+    age("reap-idle", 3 * 86400)
+
+    reaper = SessionReaper(idle_days=2, idle_action="delete", unused_hours=1, batch_size=2)
+    assert reaper.reap_once() == {"unused_deleted": 5, "idle_archived": 0, "idle_deleted": 1, "archive_purged": 0}
+    assert db.get_session("reap-fresh") is not None
+    assert db.get_session("reap-idle") is None
+    stats = reaper.stats()
+    assert stats["passes"] == 1 and stats["last_pass"]["rows"] == 6
+    assert table_stats()["sessions"] == before + 1
+
+def test_archived_session_is_restored_with_its_history():
+    cache = SessionCache(db, capacity=10, flush_seconds=60, revisions=RevisionLog(5))
+    cache.create_session("reap-archive", default_code="a = 1\n")
+    cache.update_session("reap-archive", code="a = 2\n")
+    cache.close()
+    age("reap-archive", 3 * 86400)
+
+    assert SessionReaper(idle_days=1, unused_hours=0).reap_once()["idle_archived"] == 1
+    assert table_stats()["archived_sessions"] == 1
+    assert table_stats()["revisions"] == 0
+
+    restored = client.get("/sessions/reap-archive").json()
+    assert (restored["code"], restored["version"]) == ("a = 2\n", 1)
+    assert client.get("/sessions/reap-archive/history/1").json()["code"] == "a = 2\n"
+    with SessionLocal() as session:
+        assert session.get(DBArchivedSession, "reap-archive") is None
+
+    # Archives past their retention go for good
+    age("reap-archive", 3 * 86400)
+    reaper = SessionReaper(idle_days=1, unused_hours=0, archive_retention_days=1)
+    reaper.reap_once()
+    assert reaper.reap_once(now=time.time() + 2 * 86400)["archive_purged"] == 1
+    assert table_stats()["archived_sessions"] == 0
+
+def test_active_sessions_are_skipped():
+    for session_id in ("reap-open", "reap-dirty", "reap-closed"):
+        db.create_session(session_id, default_code="")
+        age(session_id, 2 * 3600)
+    reaper = SessionReaper(is_active=lambda session_id: session_id != "reap-closed", unused_hours=1, batch_size=1)
+    assert reaper.reap_once()["unused_deleted"] == 1
+    assert reaper.stats()["skipped_active"] == 2
+    assert db.get_session("reap-open") is not None
+
+def test_reads_through_the_cache_record_activity():
+    db.create_session("reap-read", default_code="")
+    age("reap-read", 3600)
+    cache = SessionCache(db, capacity=10, flush_seconds=60)
+    cache.get_session("reap-read")
+    assert cache.has_unsaved("reap-read")
+    cache.flush()
+    assert not cache.has_unsaved("reap-read")
+    assert last_active("reap-read") > time.time() - 60
+    cache.close()
+
+def test_session_creation_is_rate_limited(monkeypatch):
+    monkeypatch.setattr(main, "session_creation_limiter", RateLimiter(per_minute=60, burst=2))
+    assert client.get("/sessions/limit-1").status_code == 200
+    assert client.get("/sessions/limit-2").status_code == 200
+    response = client.get("/sessions/limit-3")
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+    # Existing sessions stay reachable
+    assert client.get("/sessions/limit-1").status_code == 200
+    assert client.post("/sessions/limit-4", json={"code": "x"}).status_code == 429
+
+    with client.websocket_connect("/sessions/limit-5/ws") as socket:
+        assert socket.receive_json()["status"] == 429
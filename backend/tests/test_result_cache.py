@@ -0,0 +1,40 @@
+import time
+from ..models import ExecutionResult
+from ..result_cache import ResultCache, result_key
+
+def finished(output: str, exit_code: int = 0) -> ExecutionResult:
+    return ExecutionResult(success=exit_code == 0, output=output, executionTime=1, exitCode=exit_code)
+
+def test_key_depends_on_language_runtime_and_code():
+    key = result_key("python", "3.12", "print(1)")
+    assert key == result_key("python", "3.12", "print(1)")
+    assert key != result_key("python", "3.13", "print(1)")
+    assert key != result_key("javascript", "3.12", "print(1)")
+    assert key != result_key("python", "3.12", "print(2)")
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(capacity=2)
+    cache.put("a", finished("a"))
+    cache.put("b", finished("b"))
+    cache.get("a")
+    cache.put("c", finished("c"))
+    assert cache.get("b") is None
+    assert cache.get("a").output == "a"
+    assert cache.stats()["evictions"] == 1
+
+def test_entries_expire_after_ttl():
+    cache = ResultCache(capacity=2, ttl_seconds=0.05)
+    cache.put("a", finished("a"))
+    assert cache.get("a") is not None
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.stats()["expired"] == 1
+
+def test_unfinished_runs_are_not_stored():
+    cache = ResultCache(capacity=2)
+    cache.put("timeout", ExecutionResult(success=False, output="", error="timed out", executionTime=5000))
+    cache.put("capped", finished("x").model_copy(update={"truncated": True}))
+    cache.put("failed", finished("", exit_code=1))
+    assert cache.get("timeout") is None
+    assert cache.get("capped") is None
+    assert cache.get("failed") is not None
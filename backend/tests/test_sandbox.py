@@ -0,0 +1,50 @@
+import os
+import shutil
+import pytest
+from ..executor import ExecutionEngine
+from ..sandbox import ExecutionProfile
+
+def run_limited(code: str, language: str = "python", **limits):
+    limited = ExecutionEngine(profiles={language: ExecutionProfile(**limits)})
+    try:
+        return limited.call(limited._run(code, language))
+    finally:
+        limited.close()
+
+def test_runs_report_peak_memory_and_cpu_time():
+    result = run_limited("sum(range(100000))\nprint('ok')")
+    assert result.success is True
+    assert result.violation is None
+    assert result.peakRssKb > 0
+    assert result.cpuTime >= 0
+
+def test_memory_limit_is_reported():
+    result = run_limited("block = bytearray(512 * 1024 * 1024)", memory_mb=128)
+    assert result.success is False
+    assert result.violation == "memory-exceeded"
+
+def test_cpu_limit_is_reported():
+    result = run_limited("while True:\n    pass", cpu_seconds=1)
+    assert result.success is False
+    assert result.violation == "cpu-exceeded"
+    assert result.executionTime < 4000
+
+def test_file_size_limit_is_reported():
+    result = run_limited("open('big', 'wb').write(b'x' * 2 * 1024 * 1024)", file_size_mb=1)
+    assert result.success is False
+    assert result.violation == "file-size-exceeded"
+
+@pytest.mark.skipif(os.geteuid() == 0, reason="RLIMIT_NPROC is not enforced for root")
+def test_process_limit_is_reported():
+    code = "import os\nfor _ in range(10000):\n    if os.fork() == 0:\n        import time; time.sleep(2); os._exit(0)"
+    result = run_limited(code, processes=1)
+    assert result.success is False
+    assert result.violation == "process-limit-exceeded"
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_javascript_heap_limit_is_reported():
+    code = "const hoard = [];\nwhile (true) hoard.push(new Array(1e6).fill(1));"
+    result = run_limited(code, "javascript", memory_mb=64)
+    assert result.success is False
+    assert result.violation == "memory-exceeded"
+    assert result.peakRssKb is None
@@ -0,0 +1,18 @@
+import os
+import sys
+from ..benchmarks.startup import LAZY_MODULES, measure_import, over_budget
+
+def test_importing_the_app_skips_the_database_and_lazy_modules(tmp_path):
+    path = tmp_path / "startup.db"
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{path}", "PYTHONPATH": os.pathsep.join(sys.path)}
+    measured = measure_import(env)
+    assert measured["loaded"] == []
+    assert measured["seconds"] > 0
+    assert not path.exists()
+
+def test_medians_over_budget_are_reported():
+    results = {"import": {"median_ms": 900.0}, "first_healthy": {"median_ms": 3500.0}, "eagerly_loaded": [LAZY_MODULES[0]]}
+    problems = over_budget(results, import_budget_ms=1000, healthy_budget_ms=3000)
+    assert [problem.split(":")[0] for problem in problems] == ["first_healthy", "import"]
+    assert LAZY_MODULES[0] in problems[1]
+    assert over_budget({**results, "eagerly_loaded": []}, import_budget_ms=0, healthy_budget_ms=0) == []
@@ -0,0 +1,67 @@
+import gzip
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from ..static import Frontend, IMMUTABLE, choose_encoding
+
+def build(tmp_path):
+    (tmp_path / "assets").mkdir()
+    bundle = b"console.log('bundle');\n" * 200
+    (tmp_path / "assets" / "index-abc123.js").write_bytes(bundle)
+    (tmp_path / "assets" / "index-abc123.js.gz").write_bytes(gzip.compress(bundle))
+    (tmp_path / "assets" / "index-abc123.js.br").write_bytes(b"brotli bytes")
+    (tmp_path / "index.html").write_text("<!doctype html><div id=root></div>")
+    (tmp_path / "pyodide-sw.js").write_text("self.addEventListener('fetch', () => {});")
+    app = FastAPI()
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    Frontend(str(tmp_path)).mount(app)
+    return TestClient(app), bundle
+
+def test_assets_are_served_precompressed_and_immutable(tmp_path):
+    client, bundle = build(tmp_path)
+    brotli = client.get("/assets/index-abc123.js", headers={"Accept-Encoding": "gzip, br"})
+    assert brotli.headers["content-encoding"] == "br"
+    assert brotli.headers["cache-control"] == IMMUTABLE
+    assert brotli.headers["vary"] == "Accept-Encoding"
+    assert brotli.headers["content-type"].startswith("text/javascript")
+
+    gzipped = client.get("/assets/index-abc123.js", headers={"Accept-Encoding": "gzip, br;q=0"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.content == bundle
+
+    plain = client.get("/assets/index-abc123.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.content == bundle
+
+    revalidated = client.get("/assets/index-abc123.js", headers={"Accept-Encoding": "identity", "If-None-Match": plain.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert client.get("/assets/missing.js").status_code == 404
+
+def test_spa_routes_get_index_from_memory(tmp_path):
+    client, _ = build(tmp_path)
+    first = client.get("/interview/abc", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.headers["cache-control"] == "no-cache"
+    # Served from memory: deleting the file does not change the response
+    (tmp_path / "index.html").unlink()
+    assert client.get("/").text == first.text
+    assert client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]}).status_code == 304
+
+    worker = client.get("/pyodide-sw.js")
+    assert worker.headers["cache-control"] == "no-cache"
+    assert "addEventListener" in worker.text
+
+    # API paths never fall back to the app
+    assert client.get("/health").json() == {"status": "ok"}
+    assert client.get("/sessions").status_code == 404
+    assert client.get("/execute").status_code == 404
+
+def test_accept_encoding_negotiation():
+    available = {"identity", "br", "gzip"}
+    assert choose_encoding(available, "gzip;q=1.0, br; q=0, *;q=0.1") == "gzip"
+    assert choose_encoding(available, "*") == "br"
+    assert choose_encoding({"identity", "gzip"}, "br") == "identity"
+    assert choose_encoding(available, "") == "identity"
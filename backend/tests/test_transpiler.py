@@ -0,0 +1,71 @@
+import asyncio
+import shutil
+import pytest
+from ..executor import ExecutionEngine
+from ..transpiler import TranspileError, Transpiler
+
+pytestmark = pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+
+# Stand-in for the typescript package: strips `: number` annotations, rejects "SYNTAX ERROR"
+FAKE_TYPESCRIPT = r'''
+exports.version = '0.0.0-fake';
+exports.ModuleKind = { CommonJS: 1 };
+exports.ScriptTarget = { ES2020: 7 };
+exports.DiagnosticCategory = { Error: 1 };
+exports.formatDiagnostic = (d) => d.messageText;
+exports.transpileModule = (source) => source.includes('SYNTAX ERROR')
+  ? { outputText: '', diagnostics: [{ category: 1, messageText: 'bad syntax' }] }
+  : { outputText: source.replace(/: number/g, ''), diagnostics: [] };
+'''
+
+@pytest.fixture
+def fake_typescript(tmp_path):
+    module = tmp_path / "fake_typescript.js"
+    module.write_text(FAKE_TYPESCRIPT)
+    return str(module)
+
+def test_transpiled_output_is_cached_by_source(fake_typescript):
+    async def scenario():
+        transpiler = Transpiler(fake_typescript)
+        try:
+            first = await transpiler.transpile("let n: number = 1")
+            second = await transpiler.transpile("let n: number = 1")
+            assert first == second == "let n = 1"
+            assert transpiler.stats()["starts"] == 1
+            assert transpiler.stats()["hits"] == 1
+            assert transpiler.stats()["compiler_version"] == "0.0.0-fake"
+        finally:
+            await transpiler.close()
+    asyncio.run(scenario())
+
+def test_syntax_errors_raise(fake_typescript):
+    async def scenario():
+        transpiler = Transpiler(fake_typescript)
+        try:
+            with pytest.raises(TranspileError, match="bad syntax"):
+                await transpiler.transpile("SYNTAX ERROR")
+            # The compiler keeps serving after a failed source
+            assert await transpiler.transpile("1") == "1"
+        finally:
+            await transpiler.close()
+    asyncio.run(scenario())
+
+def test_missing_compiler_is_reported():
+    async def scenario():
+        with pytest.raises(TranspileError, match="not available"):
+            await Transpiler("no-such-typescript-module").transpile("1")
+    asyncio.run(scenario())
+
+def test_typescript_runs_on_javascript_workers(fake_typescript):
+    ts_engine = ExecutionEngine(typescript_module=fake_typescript)
+    try:
+        result = ts_engine.call(ts_engine._run("const n: number = 2\nconsole.log(n)", "typescript"))
+        failed = ts_engine.call(ts_engine._run("SYNTAX ERROR", "typescript"))
+        pool = ts_engine.pool.stats()
+    finally:
+        ts_engine.close()
+    assert result.success is True
+    assert result.output == "2\n"
+    assert "typescript" not in pool["idle"]
+    assert failed.success is False
+    assert "bad syntax" in failed.error
@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import json
+import os
+import subprocess
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# TypeScript compiler module, resolved from the working directory or the frontend's
+# node_modules (where the repo already installs it)
+EXECUTOR_TYPESCRIPT_MODULE = os.getenv("EXECUTOR_TYPESCRIPT_MODULE", "typescript")
+# Transpiled sources kept in memory, keyed by source hash
+TRANSPILE_CACHE_SIZE = int(os.getenv("TRANSPILE_CACHE_SIZE", "500"))
+
+# Long-lived compiler process: one JSON request per stdin line, one JSON reply per stdout line
+TRANSPILER = r'''
+const readline = require('readline');
+let ts;
+try {
+  ts = require(require.resolve(process.argv[1], { paths: JSON.parse(process.argv[2]) }));
+} catch (e) {
+  process.stdout.write(JSON.stringify({ fatal: String(e && e.message || e) }) + '\n');
+  process.exit(1);
+}
+const compilerOptions = { module: ts.ModuleKind.CommonJS, target: ts.ScriptTarget.ES2020, esModuleInterop: true };
+const formatHost = { getCanonicalFileName: (f) => f, getCurrentDirectory: () => '', getNewLine: () => '\n' };
+const format = (diagnostics) => diagnostics.map((d) => ts.formatDiagnostic(d, formatHost).trim());
+
+const transpile = (source) => {
+  const out = ts.transpileModule(source, { compilerOptions, fileName: 'script.ts', reportDiagnostics: true });
+  const errors = (out.diagnostics || []).filter((d) => d.category === ts.DiagnosticCategory.Error);
+  return errors.length ? { error: format(errors).join('\n') } : { code: out.outputText };
+};
+
+const check = (source) => {
+  const options = { ...compilerOptions, noEmit: true, strict: true, types: [] };
+  const host = ts.createCompilerHost(options);
+  const getSourceFile = host.getSourceFile;
+  host.getSourceFile = (name, target, ...rest) => name === 'script.ts'
+    ? ts.createSourceFile(name, source, target)
+    : getSourceFile.call(host, name, target, ...rest);
+  const program = ts.createProgram(['script.ts'], options, host);
+  return { diagnostics: format(ts.getPreEmitDiagnostics(program)) };
+};
+
+process.stdout.write(JSON.stringify({ version: ts.version }) + '\n');
+readline.createInterface({ input: process.stdin }).on('line', (line) => {
+  const request = JSON.parse(line);
+  let reply;
+  try {
+    reply = request.op === 'check' ? check(request.source) : transpile(request.source);
+  } catch (e) {
+    reply = { error: String(e && e.message || e) };
+  }
+  process.stdout.write(JSON.stringify({ id: request.id, ...reply }) + '\n');
+});
+'''
+
+class TranspileError(Exception):
+    """Raised for TypeScript that does not compile, or when the compiler is unavailable."""
+
+class Transpiler:
+    """Resident TypeScript compiler that turns TS into JS without type-checking.
+
+    Output is cached by source hash, so unchanged code is never compiled twice.
+    Only used from the engine's event loop.
+    """
+
+    def __init__(self, module: str = EXECUTOR_TYPESCRIPT_MODULE, capacity: int = TRANSPILE_CACHE_SIZE):
+        self.module = module
+        self.capacity = max(1, capacity)
+        self.cache: "OrderedDict[str, str]" = OrderedDict()
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.version: Optional[str] = None
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.next_id = 0
+        self.start_lock: Optional[asyncio.Lock] = None
+        self.reader: Optional[asyncio.Task] = None
+        self.counters = {"starts": 0, "hits": 0, "misses": 0, "errors": 0}
+
+    async def start(self):
+        if self.start_lock is None:
+            self.start_lock = asyncio.Lock()
+        async with self.start_lock:
+            if self.process is not None and self.process.returncode is None:
+                return
+            search_paths = [os.getcwd(), str(Path.cwd() / "frontend")]
+            try:
+                self.process = await asyncio.create_subprocess_exec(
+                    "node", "-e", TRANSPILER, self.module, json.dumps(search_paths),
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    # Large sources come back on one line
+                    limit=64 * 1024 * 1024
+                )
+            except OSError as e:
+                raise TranspileError(f"TypeScript compiler is not available: {e}")
+            self.counters["starts"] += 1
+            hello = json.loads(await self.process.stdout.readline() or b'{"fatal": "compiler exited"}')
+            if "fatal" in hello:
+                await self.process.wait()
+                raise TranspileError(f"TypeScript compiler is not available: {hello['fatal']}")
+            self.version = hello["version"]
+            self.reader = asyncio.get_running_loop().create_task(self._read_replies(self.process))
+
+    async def _read_replies(self, process: asyncio.subprocess.Process):
+        while True:
+            line = await process.stdout.readline()
+            if not line:
+                break
+            reply = json.loads(line)
+            future = self.pending.pop(reply.pop("id"), None)
+            if future is not None and not future.done():
+                future.set_result(reply)
+        # The compiler died; fail whatever was waiting, the next request restarts it
+        pending, self.pending = self.pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(TranspileError("TypeScript compiler exited"))
+
+    async def _request(self, op: str, source: str) -> dict:
+        await self.start()
+        self.next_id += 1
+        request_id = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.process.stdin.write(json.dumps({"id": request_id, "op": op, "source": source}).encode() + b"\n")
+        await self.process.stdin.drain()
+        return await future
+
+    async def transpile(self, source: str) -> str:
+        """Returns the JavaScript for `source`. Raises TranspileError on syntax errors."""
+        key = hashlib.sha256(source.encode()).hexdigest()
+        code = self.cache.get(key)
+        if code is not None:
+            self.cache.move_to_end(key)
+            self.counters["hits"] += 1
+            return code
+
+        self.counters["misses"] += 1
+        reply = await self._request("transpile", source)
+        if "error" in reply:
+            self.counters["errors"] += 1
+            raise TranspileError(reply["error"])
+        code = reply["code"]
+        self.cache[key] = code
+        while len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+        return code
+
+    async def check(self, source: str) -> List[str]:
+        """Type-checks `source` and returns the formatted diagnostics (empty when clean)."""
+        reply = await self._request("check", source)
+        if "error" in reply:
+            raise TranspileError(reply["error"])
+        return reply["diagnostics"]
+
+    async def compiler_version(self) -> str:
+        await self.start()
+        return self.version
+
+    async def close(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.kill()
+            await self.process.wait()
+        if self.reader is not None:
+            await self.reader
+            self.reader = None
+        self.process = None
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "cached": len(self.cache),
+            "capacity": self.capacity,
+            "compiler_version": self.version,
+        }
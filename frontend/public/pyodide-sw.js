@@ -0,0 +1,27 @@
+// Serves the Pyodide runtime from Cache Storage after the first download. Its CDN URLs
+// carry the version, so cached files never go stale; a new version gets a new cache.
+const CACHE = "pyodide-v0.25.0";
+const PREFIX = "https://cdn.jsdelivr.net/pyodide/v0.25.0/";
+
+self.addEventListener("install", () => self.skipWaiting());
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil((async () => {
+    for (const key of await caches.keys()) {
+      if (key.startsWith("pyodide-") && key !== CACHE) await caches.delete(key);
+    }
+    await self.clients.claim();
+  })());
+});
+
+self.addEventListener("fetch", (event) => {
+  if (event.request.method !== "GET" || !event.request.url.startsWith(PREFIX)) return;
+  event.respondWith((async () => {
+    const cache = await caches.open(CACHE);
+    const cached = await cache.match(event.request);
+    if (cached) return cached;
+    const response = await fetch(event.request);
+    if (response.ok) await cache.put(event.request, response.clone());
+    return response;
+  })());
+});
@@ -4,9 +4,11 @@ import { CheckCircle, XCircle, Terminal, Clock } from 'lucide-react';
 interface OutputPanelProps {
   result: ExecutionResult | null;
   isExecuting: boolean;
+  // Output streamed so far by a backend run
+  liveOutput?: string;
 }
 
-const OutputPanel = ({ result, isExecuting }: OutputPanelProps) => {
+const OutputPanel = ({ result, isExecuting, liveOutput }: OutputPanelProps) => {
   return (
     <div className="h-full flex flex-col bg-card rounded-lg border border-border overflow-hidden">
       <div className="flex items-center gap-2 px-4 py-3 border-b border-border bg-secondary/50">
@@ -16,15 +18,19 @@ const OutputPanel = ({ result, isExecuting }: OutputPanelProps) => {
           <div className="ml-auto flex items-center gap-2 text-xs text-muted-foreground">
             <Clock className="w-3 h-3" />
             <span>{result.executionTime}ms</span>
+            {result.ranOn && <span>· {result.ranOn}</span>}
           </div>
         )}
       </div>
       
       <div className="flex-1 overflow-auto p-4 font-mono text-sm">
         {isExecuting ? (
-          <div className="flex items-center gap-2 text-muted-foreground">
-            <div className="w-4 h-4 border-2 border-primary border-t-transparent rounded-full animate-spin" />
-            <span>Executing...</span>
+          <div className="space-y-2">
+            <div className="flex items-center gap-2 text-muted-foreground">
+              <div className="w-4 h-4 border-2 border-primary border-t-transparent rounded-full animate-spin" />
+              <span>Executing...</span>
+            </div>
+            {liveOutput && <pre className="whitespace-pre-wrap text-foreground/90">{liveOutput}</pre>}
           </div>
         ) : result ? (
           <div className="space-y-2">
@@ -42,6 +48,7 @@ const OutputPanel = ({ result, isExecuting }: OutputPanelProps) => {
                   <XCircle className="w-4 h-4" />
                   <span className="font-medium">Error</span>
                 </div>
+                {result.output && <pre className="whitespace-pre-wrap text-foreground/90">{result.output}</pre>}
                 <pre className="whitespace-pre-wrap text-destructive/90">{result.error}</pre>
               </>
             )}
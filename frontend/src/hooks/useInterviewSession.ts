@@ -1,4 +1,4 @@
-import { useState, useRef } from 'react';
+import { useState, useRef, useEffect } from 'react';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { SupportedLanguage, DEFAULT_CODE } from '@/types/interview';
 
@@ -6,18 +6,151 @@ interface SessionState {
   code: string;
   language: SupportedLanguage;
   connectedUsers: number;
+  version: number;
 }
 
+interface TextEdit {
+  offset: number;
+  delete: number;
+  insert: string;
+}
+
+// Smallest single edit turning `oldText` into `newText`. The backend counts
+// offsets in code points, so diff over code points rather than UTF-16 units.
+const diffText = (oldText: string, newText: string): TextEdit | null => {
+  if (oldText === newText) return null;
+  const oldChars = Array.from(oldText);
+  const newChars = Array.from(newText);
+  const limit = Math.min(oldChars.length, newChars.length);
+  let prefix = 0;
+  while (prefix < limit && oldChars[prefix] === newChars[prefix]) prefix++;
+  let suffix = 0;
+  while (
+    suffix < limit - prefix &&
+    oldChars[oldChars.length - 1 - suffix] === newChars[newChars.length - 1 - suffix]
+  ) suffix++;
+  return {
+    offset: prefix,
+    delete: oldChars.length - prefix - suffix,
+    insert: newChars.slice(prefix, newChars.length - suffix).join(''),
+  };
+};
+
 const API_Base = 'http://127.0.0.1:8000';
+const WS_Base = API_Base.replace(/^http/, 'ws');
+
+// Polling is only a fallback while the push socket is down
+const FALLBACK_POLL_INTERVAL = 2000;
+const MAX_RECONNECT_DELAY = 10000;
 
 export const useInterviewSession = (sessionId: string) => {
   const queryClient = useQueryClient();
   const userIdRef = useRef<string>(Math.random().toString(36).substring(7));
+  const socketRef = useRef<WebSocket | null>(null);
+  // Last code/version the server confirmed, the code awaiting an ack, and the newest local code
+  const shadowRef = useRef<{ code: string; version: number } | null>(null);
+  const inFlightRef = useRef<string | null>(null);
+  const pendingCodeRef = useRef<string | null>(null);
+  const pendingLanguageRef = useRef<SupportedLanguage | null>(null);
+  const [isSocketOpen, setIsSocketOpen] = useState(false);
+  const flushRef = useRef<() => void>(() => {});
 
   // Local state for optimistic UI and to prevent flickers during polling
   const [localCode, setLocalCode] = useState<string | null>(null);
   const [localLanguage, setLocalLanguage] = useState<SupportedLanguage | null>(null);
 
+  // Subscribe to pushed session updates, reconnecting with backoff
+  useEffect(() => {
+    if (!sessionId) return;
+
+    let closed = false;
+    let retryDelay = 500;
+    let retryTimer: ReturnType<typeof setTimeout> | undefined;
+
+    const send = (socket: WebSocket, payload: object, code: string) => {
+      inFlightRef.current = code;
+      socket.send(JSON.stringify(payload));
+    };
+
+    // Send local changes as a diff against the confirmed shadow, one at a time
+    const flush = (socket: WebSocket) => {
+      const shadow = shadowRef.current;
+      const pending = pendingCodeRef.current;
+      if (inFlightRef.current !== null || pending === null || socket.readyState !== WebSocket.OPEN) return;
+      const language = pendingLanguageRef.current;
+      if (language) {
+        pendingLanguageRef.current = null;
+        send(socket, { language, code: pending }, pending);
+        return;
+      }
+      if (!shadow) {
+        send(socket, { code: pending }, pending);
+        return;
+      }
+      const edit = diffText(shadow.code, pending);
+      if (edit) send(socket, { baseVersion: shadow.version, edits: [edit] }, pending);
+    };
+    flushRef.current = () => socketRef.current && flush(socketRef.current);
+
+    const connect = () => {
+      const socket = new WebSocket(`${WS_Base}/sessions/${sessionId}/ws`);
+      socketRef.current = socket;
+
+      socket.onopen = () => {
+        retryDelay = 500;
+        setIsSocketOpen(true);
+      };
+      socket.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        if (message.error) {
+          console.error('Session update rejected:', message.detail);
+          // Resync by sending the whole document
+          const pending = inFlightRef.current;
+          inFlightRef.current = null;
+          shadowRef.current = null;
+          if (pending !== null && pendingCodeRef.current === null) pendingCodeRef.current = pending;
+          flush(socket);
+          return;
+        }
+        if (message.ack) {
+          // `code` is only present when the server rebased our patch
+          shadowRef.current = { code: message.code ?? inFlightRef.current ?? '', version: message.version };
+          inFlightRef.current = null;
+          flush(socket);
+          return;
+        }
+        // Full state pushed by the server. While our own edit is in flight its ack
+        // will carry the authoritative version, so leave the shadow alone until then.
+        const state = message as SessionState;
+        queryClient.setQueryData(['session', sessionId], state);
+        const shadow = shadowRef.current;
+        if (inFlightRef.current === null && (!shadow || state.version >= shadow.version)) {
+          shadowRef.current = { code: state.code, version: state.version };
+          flush(socket);
+        }
+      };
+      socket.onclose = () => {
+        socketRef.current = null;
+        shadowRef.current = null;
+        inFlightRef.current = null;
+        setIsSocketOpen(false);
+        if (!closed) {
+          retryTimer = setTimeout(connect, retryDelay);
+          retryDelay = Math.min(retryDelay * 2, MAX_RECONNECT_DELAY);
+        }
+      };
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      socketRef.current?.close();
+      socketRef.current = null;
+    };
+  }, [sessionId, queryClient]);
+
   // Fetch session state from backend
   const { data: session, isLoading, isError } = useQuery({
     queryKey: ['session', sessionId],
@@ -26,10 +159,10 @@ export const useInterviewSession = (sessionId: string) => {
       if (!response.ok) throw new Error('Failed to fetch session');
       return response.json();
     },
-    refetchInterval: 2000,
+    refetchInterval: isSocketOpen ? false : FALLBACK_POLL_INTERVAL,
   });
 
-  // Mutation for updating session
+  // Mutation for updating session (used while the socket is down)
   const updateSessionMutation = useMutation({
     mutationFn: async (update: Partial<SessionState>) => {
       const response = await fetch(`${API_Base}/sessions/${sessionId}`, {
@@ -45,19 +178,29 @@ export const useInterviewSession = (sessionId: string) => {
     },
   });
 
+  const isSocketReady = () => socketRef.current?.readyState === WebSocket.OPEN;
+
   const updateCode = (newCode: string) => {
     setLocalCode(newCode); // Update UI immediately
-    updateSessionMutation.mutate({ code: newCode });
+    if (isSocketReady()) {
+      pendingCodeRef.current = newCode;
+      flushRef.current();
+    } else {
+      updateSessionMutation.mutate({ code: newCode });
+    }
   };
 
   const updateLanguage = (newLanguage: SupportedLanguage) => {
     const defaultCode = DEFAULT_CODE[newLanguage];
     setLocalLanguage(newLanguage); // Update UI immediately
     setLocalCode(defaultCode);
-    updateSessionMutation.mutate({
-      language: newLanguage,
-      code: defaultCode
-    });
+    if (isSocketReady()) {
+      pendingCodeRef.current = defaultCode;
+      pendingLanguageRef.current = newLanguage;
+      flushRef.current();
+    } else {
+      updateSessionMutation.mutate({ language: newLanguage, code: defaultCode });
+    }
   };
 
   // Determine which values to show
@@ -68,7 +211,7 @@ export const useInterviewSession = (sessionId: string) => {
     code,
     language,
     connectedUsers: session?.connectedUsers || 0,
-    isConnected: !isLoading && !isError,
+    isConnected: isSocketOpen || (!isLoading && !isError),
     updateCode,
     updateLanguage,
     userId: userIdRef.current,
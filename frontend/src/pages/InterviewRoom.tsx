@@ -1,7 +1,8 @@
-import { useState, useCallback } from 'react';
+import { useState, useCallback, useEffect } from 'react';
 import { useParams, Navigate } from 'react-router-dom';
 import { useInterviewSession } from '@/hooks/useInterviewSession';
-import { executeCode, ExecutionResult } from '@/utils/codeExecutor';
+import { ExecutionResult } from '@/utils/codeExecutor';
+import { prepareExecution, runCode } from '@/utils/executionRouter';
 import CodeEditor from '@/components/CodeEditor';
 import OutputPanel from '@/components/OutputPanel';
 import InterviewHeader from '@/components/InterviewHeader';
@@ -11,6 +12,7 @@ const InterviewRoom = () => {
   const { sessionId } = useParams<{ sessionId: string }>();
   const [executionResult, setExecutionResult] = useState<ExecutionResult | null>(null);
   const [isExecuting, setIsExecuting] = useState(false);
+  const [liveOutput, setLiveOutput] = useState('');
 
   const {
     code,
@@ -20,9 +22,15 @@ const InterviewRoom = () => {
     updateLanguage,
   } = useInterviewSession(sessionId || '');
 
+  useEffect(() => {
+    prepareExecution(language);
+  }, [language]);
+
   const handleRunCode = useCallback(async () => {
     setIsExecuting(true);
-    const result = await executeCode(code, language);
+    setLiveOutput('');
+    // Runs in the browser or on the backend, whichever is cheaper; backend output is streamed
+    const result = await runCode(code, language, (text) => setLiveOutput((prev) => prev + text));
     setExecutionResult(result);
     setIsExecuting(false);
   }, [code, language]);
@@ -69,7 +77,7 @@ const InterviewRoom = () => {
 
           {/* Output Panel */}
           <div className="w-[400px] p-4 pl-0">
-            <OutputPanel result={executionResult} isExecuting={isExecuting} />
+            <OutputPanel result={executionResult} isExecuting={isExecuting} liveOutput={liveOutput} />
           </div>
         </div>
       </div>
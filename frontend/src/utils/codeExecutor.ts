@@ -3,8 +3,79 @@ export interface ExecutionResult {
   output: string;
   error?: string;
   executionTime: number;
+  // Backend runs only: time spent waiting for a worker, excluded from executionTime
+  queueTime?: number;
+  exitCode?: number | null;
+  // Backend runs only: stopped for exceeding the output byte cap
+  truncated?: boolean;
+  // Backend runs only: served from the result cache
+  cached?: boolean;
+  // Backend runs only: which execution limit stopped the run, and what it used
+  violation?: string | null;
+  peakRssKb?: number | null;
+  cpuTime?: number | null;
+  // Where the run happened, when it was routed by runCode()
+  ranOn?: 'browser' | 'server';
 }
 
+export const API_Base = 'http://127.0.0.1:8000';
+
+// Runs code on the backend, calling `onOutput` with stdout/stderr text as it is produced
+export const executeOnServerStream = async (
+  code: string,
+  language: string,
+  onOutput: (text: string, stream: 'stdout' | 'stderr') => void,
+): Promise<ExecutionResult> => {
+  const startTime = performance.now();
+  let output = '';
+  let stderr = '';
+
+  try {
+    const response = await fetch(`${API_Base}/execute/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ code, language }),
+    });
+    if (!response.ok || !response.body) {
+      const retryAfter = response.headers.get('Retry-After');
+      throw new Error(response.status === 429
+        ? `Server is busy, retry in ${retryAfter ?? 'a few'}s`
+        : `Execution failed (${response.status})`);
+    }
+
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += value;
+      // Server-Sent Events are separated by a blank line
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        const event = block.match(/^event: (.*)$/m)?.[1];
+        const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] ?? 'null');
+        if (event === 'stdout' || event === 'stderr') {
+          if (event === 'stdout') output += data.data;
+          else stderr += data.data;
+          onOutput(data.data, event);
+        } else if (event === 'exit') {
+          return { ...data, output, error: data.error ?? (data.success ? undefined : stderr) };
+        }
+      }
+    }
+    throw new Error('Connection closed before the run finished');
+  } catch (error) {
+    return {
+      success: false,
+      output,
+      error: error instanceof Error ? error.message : 'Unknown error occurred',
+      executionTime: Math.round(performance.now() - startTime),
+    };
+  }
+};
+
 declare global {
   interface Window {
     loadPyodide: (config: { indexURL: string }) => Promise<any>;
@@ -12,17 +83,48 @@ declare global {
   }
 }
 
+// Versioned, so a cached copy never goes stale; public/pyodide-sw.js caches everything under it
+export const PYODIDE_INDEX_URL = "https://cdn.jsdelivr.net/pyodide/v0.25.0/full/";
+
 let pyodideReadyPromise: Promise<any> | null = null;
+let pyodideReady = false;
+
+const loadPyodideScript = () => new Promise<void>((resolve, reject) => {
+  if (window.loadPyodide) {
+    resolve();
+    return;
+  }
+  const script = document.createElement('script');
+  script.src = `${PYODIDE_INDEX_URL}pyodide.js`;
+  // A CORS response, unlike an opaque one, can be stored by the service worker
+  script.crossOrigin = 'anonymous';
+  script.onload = () => resolve();
+  script.onerror = () => reject(new Error('Could not load the Python runtime'));
+  document.head.appendChild(script);
+});
 
 const getPyodide = async () => {
   if (!pyodideReadyPromise) {
-    pyodideReadyPromise = window.loadPyodide({
-      indexURL: "https://cdn.jsdelivr.net/pyodide/v0.25.0/full/"
-    });
+    pyodideReadyPromise = loadPyodideScript().then(() => window.loadPyodide({ indexURL: PYODIDE_INDEX_URL }));
+    // A failed load is retried by the next run instead of failing every run after it
+    pyodideReadyPromise.then(() => { pyodideReady = true; }, () => { pyodideReadyPromise = null; });
   }
   return pyodideReadyPromise;
 };
 
+export const isPyodideReady = () => pyodideReady;
+
+// Loads Pyodide while the browser is idle, so the first Python run does not wait for it
+export const preloadPyodide = () => {
+  if (pyodideReadyPromise) return;
+  const load = () => { getPyodide().catch(() => undefined); };
+  if ('requestIdleCallback' in window) {
+    window.requestIdleCallback(load, { timeout: 2000 });
+  } else {
+    setTimeout(load, 0);
+  }
+};
+
 export const executeCode = async (code: string, language: string): Promise<ExecutionResult> => {
   const startTime = performance.now();
 
@@ -0,0 +1,142 @@
+import {
+  API_Base,
+  ExecutionResult,
+  executeCode,
+  executeOnServerStream,
+  isPyodideReady,
+  preloadPyodide,
+} from './codeExecutor';
+
+export type ExecutionMode = 'auto' | 'browser' | 'server';
+
+// `auto` sends each run to whichever side should answer first; VITE_EXECUTION_MODE pins one side
+export const EXECUTION_MODE: ExecutionMode =
+  (import.meta.env.VITE_EXECUTION_MODE as ExecutionMode | undefined) ?? 'auto';
+
+interface LanguageCapability {
+  language: string;
+  available: boolean;
+  warmWorkers: number;
+  estimatedMs: number | null;
+}
+
+interface ExecutionCapabilities {
+  languages: LanguageCapability[];
+  queueDepth: number;
+  resultCache: boolean;
+  resultCacheTtlSeconds: number | null;
+}
+
+// Rough first-run cost of Pyodide: fetching (or reading from cache), compiling and starting it
+const PYODIDE_COLD_MS = 3000;
+// Server cost assumed before a language has run there, or when its workers are all busy starting
+const SERVER_UNKNOWN_MS = 200;
+// Below this size, code without imports finishes almost instantly on either side,
+// so a warm browser wins by skipping the network
+const TRIVIAL_CODE_CHARS = 400;
+const CAPABILITIES_MAX_AGE_MS = 30_000;
+const REMEMBERED_SERVER_RUNS = 100;
+const SMOOTHING = 0.2;
+
+let capabilities: ExecutionCapabilities | null = null;
+let capabilitiesFetchedAt = 0;
+let capabilitiesRequest: Promise<void> | null = null;
+// Time a server run takes on top of the server's own estimate, i.e. the network
+let roundTripMs: number | null = null;
+// Warm browser run time per language
+const browserMs: Record<string, number> = {};
+// When each code/language pair last ran on the server, for routing repeats to its result cache
+const serverRuns = new Map<string, number>();
+
+const smooth = (previous: number | null | undefined, sample: number) =>
+  previous == null ? sample : previous + SMOOTHING * (sample - previous);
+
+const refreshCapabilities = () => {
+  if (capabilitiesRequest || Date.now() - capabilitiesFetchedAt < CAPABILITIES_MAX_AGE_MS) return;
+  capabilitiesRequest = fetch(`${API_Base}/execute/capabilities`)
+    .then((response) => (response.ok ? response.json() : null))
+    .then((body: ExecutionCapabilities | null) => { capabilities = body; })
+    .catch(() => { capabilities = null; })
+    .finally(() => {
+      capabilitiesFetchedAt = Date.now();
+      capabilitiesRequest = null;
+    });
+};
+
+// Call when a room opens: loads the cost hints and starts the browser runtime in the background
+export const prepareExecution = (language: string) => {
+  refreshCapabilities();
+  if (language === 'python' && EXECUTION_MODE !== 'server') {
+    preloadPyodide();
+  }
+};
+
+const isTrivial = (code: string) =>
+  code.length <= TRIVIAL_CODE_CHARS && !/^\s*(import|from)\s/m.test(code) && !/\brequire\(/.test(code);
+
+const runKey = (code: string, language: string) => `${language}\0${code}`;
+
+export const chooseTarget = (code: string, language: string): 'browser' | 'server' => {
+  // The browser cannot run TypeScript syntax
+  if (language === 'typescript') return 'server';
+  if (EXECUTION_MODE !== 'auto') return EXECUTION_MODE;
+
+  const server = capabilities?.languages.find((item) => item.language === language);
+  if (!server?.available) return 'browser';
+
+  // A repeat is answered from the result cache without running anything
+  const lastServerRun = serverRuns.get(runKey(code, language));
+  const ttlMs = (capabilities?.resultCacheTtlSeconds ?? 0) * 1000;
+  if (capabilities?.resultCache && lastServerRun !== undefined && Date.now() - lastServerRun < ttlMs) {
+    return 'server';
+  }
+
+  const browserWarm = language === 'javascript' || isPyodideReady();
+  if (browserWarm && isTrivial(code)) return 'browser';
+
+  const browserCost = browserWarm ? browserMs[language] ?? 0 : PYODIDE_COLD_MS;
+  const serverEstimate = server.warmWorkers > 0 ? server.estimatedMs ?? SERVER_UNKNOWN_MS : SERVER_UNKNOWN_MS;
+  return serverEstimate + (roundTripMs ?? 0) < browserCost ? 'server' : 'browser';
+};
+
+const rememberServerRun = (key: string) => {
+  serverRuns.delete(key);
+  serverRuns.set(key, Date.now());
+  if (serverRuns.size > REMEMBERED_SERVER_RUNS) {
+    serverRuns.delete(serverRuns.keys().next().value as string);
+  }
+};
+
+const runInBrowser = async (code: string, language: string): Promise<ExecutionResult> => {
+  const warm = language !== 'python' || isPyodideReady();
+  const result = await executeCode(code, language);
+  if (warm) {
+    browserMs[language] = smooth(browserMs[language], result.executionTime);
+  }
+  return { ...result, ranOn: 'browser' };
+};
+
+// Runs code where chooseTarget() says; `onOutput` receives streamed output from server runs
+export const runCode = async (
+  code: string,
+  language: string,
+  onOutput: (text: string, stream: 'stdout' | 'stderr') => void,
+): Promise<ExecutionResult> => {
+  refreshCapabilities();
+  const target = chooseTarget(code, language);
+
+  if (target === 'server') {
+    const started = performance.now();
+    const result = await executeOnServerStream(code, language, onOutput);
+    if (result.exitCode === undefined && language !== 'typescript' && EXECUTION_MODE === 'auto') {
+      // The server could not be reached or turned the run away; the browser can still run it
+      capabilities = null;
+      return runInBrowser(code, language);
+    }
+    const serverMs = (result.queueTime ?? 0) + (result.cached ? 0 : result.executionTime);
+    roundTripMs = smooth(roundTripMs, Math.max(0, performance.now() - started - serverMs));
+    rememberServerRun(runKey(code, language));
+    return { ...result, ranOn: 'server' };
+  }
+  return runInBrowser(code, language);
+};
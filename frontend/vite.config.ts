@@ -1,15 +1,49 @@
-import { defineConfig } from "vite";
+import { defineConfig, type Plugin, type ResolvedConfig } from "vite";
 import react from "@vitejs/plugin-react-swc";
+import fs from "fs";
 import path from "path";
+import zlib from "zlib";
 import { componentTagger } from "lovable-tagger";
 
+const COMPRESSIBLE = /\.(js|mjs|css|html|svg|json|txt|map|wasm)$/;
+
+// Writes .br and .gz copies of every compressible build output; the backend picks one
+// by Accept-Encoding instead of compressing on each request
+const precompress = (): Plugin => {
+  let outDir = "";
+  return {
+    name: "precompress",
+    apply: "build",
+    configResolved(config: ResolvedConfig) {
+      outDir = path.resolve(config.root, config.build.outDir);
+    },
+    closeBundle() {
+      const walk = (dir: string): string[] =>
+        fs.readdirSync(dir, { withFileTypes: true }).flatMap((entry) =>
+          entry.isDirectory() ? walk(path.join(dir, entry.name)) : [path.join(dir, entry.name)]);
+      for (const file of walk(outDir)) {
+        if (!COMPRESSIBLE.test(file)) continue;
+        const source = fs.readFileSync(file);
+        const variants: [string, Buffer][] = [
+          [".br", zlib.brotliCompressSync(source, { params: { [zlib.constants.BROTLI_PARAM_QUALITY]: 11 } })],
+          [".gz", zlib.gzipSync(source, { level: 9 })],
+        ];
+        for (const [suffix, compressed] of variants) {
+          // Tiny files can grow; those are only served as they are
+          if (compressed.length < source.length) fs.writeFileSync(file + suffix, compressed);
+        }
+      }
+    },
+  };
+};
+
 // https://vitejs.dev/config/
 export default defineConfig(({ mode }) => ({
   server: {
     host: "::",
     port: 8080,
   },
-  plugins: [react(), mode === "development" && componentTagger()].filter(Boolean),
+  plugins: [react(), mode === "development" && componentTagger(), precompress()].filter(Boolean),
   resolve: {
     alias: {
       "@": path.resolve(__dirname, "./src"),